@@ -0,0 +1,243 @@
+# benchmarks/bench_agent.py
+"""
+Offline end-to-end benchmark for the agent loop.
+
+Every scenario drives the real `run_session` (tools, memory, context
+budgeting) against a ReplayProvider, so no network access or API key is
+needed. For each scenario it reports medians over several iterations of:
+
+- wall:      total session time
+- provider:  time spent inside the (replayed) model calls
+- tools:     wall time during which at least one tool was running
+- memory:    load_memory + save_memory
+- overhead:  everything else, per agent step — the local cost we own
+
+Usage:
+    python benchmarks/bench_agent.py [--iterations N] [--latency-ms MS]
+                                     [--scenario NAME ...] [--json]
+                                     [--max-overhead-ms MS]
+
+With --max-overhead-ms the script exits non-zero if any scenario's median
+per-step overhead exceeds the limit, so it can gate merges.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from google.genai import types  # noqa: E402
+
+import claii.agent as agent  # noqa: E402
+from claii.memory import save_memory  # noqa: E402
+from claii.providers.replay import ReplayProvider  # noqa: E402
+
+TRANSCRIPTS = Path(__file__).resolve().parent / "transcripts"
+CALCULATOR = REPO_ROOT / "calculator"
+
+
+# ─── Instrumentation ──────────────────────────────────────────────────────────
+
+class Timings:
+    """Collects (start, end) intervals per category during one session."""
+
+    def __init__(self) -> None:
+        self.intervals: dict[str, list[tuple[float, float]]] = {"tools": [], "memory": []}
+
+    def wrap_sync(self, category: str, fn: Callable) -> Callable:
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.intervals[category].append((start, time.perf_counter()))
+        return timed
+
+    def wrap_async(self, category: str, fn: Callable) -> Callable:
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.intervals[category].append((start, time.perf_counter()))
+        return timed
+
+
+def _union(intervals: list[tuple[float, float]]) -> float:
+    """Total length covered by possibly overlapping intervals."""
+    total = 0.0
+    end = float("-inf")
+    for s, e in sorted(intervals):
+        if s > end:
+            total += e - s
+            end = e
+        elif e > end:
+            total += e - end
+            end = e
+    return total
+
+
+@contextlib.contextmanager
+def instrumented(timings: Timings):
+    originals = (agent._call_function, agent.load_memory, agent.save_memory)
+    agent._call_function = timings.wrap_async("tools", agent._call_function)
+    agent.load_memory = timings.wrap_sync("memory", agent.load_memory)
+    agent.save_memory = timings.wrap_sync("memory", agent.save_memory)
+    try:
+        yield
+    finally:
+        agent._call_function, agent.load_memory, agent.save_memory = originals
+
+
+# ─── Scenarios ────────────────────────────────────────────────────────────────
+#
+# A scenario prepares a fresh sandbox and returns (prompt, steps).
+
+def _sandbox(tmp: Path) -> Path:
+    workdir = tmp / "calculator"
+    shutil.copytree(CALCULATOR, workdir, ignore=shutil.ignore_patterns("__pycache__"))
+    return workdir
+
+
+def scenario_calculator_fix(tmp: Path) -> tuple[str, list[dict]]:
+    _sandbox(tmp)
+    data = json.loads((TRANSCRIPTS / "calculator_fix.json").read_text(encoding="utf-8"))
+    return "check that 3 + 7 * 2 evaluates to 17 and write notes", data["steps"]
+
+
+def scenario_history_200(tmp: Path) -> tuple[str, list[dict]]:
+    """A 200-message remembered history with tool calls, one-step answer."""
+    _sandbox(tmp)
+    history: list[types.Content] = []
+    for i in range(50):
+        history += [
+            types.Content(role="user", parts=[types.Part(text=f"question {i}: what does pkg/calculator.py do?")]),
+            types.Content(role="model", parts=[types.Part.from_function_call(
+                name="get_file_content", args={"file_path": "pkg/calculator.py"})]),
+            types.Content(role="user", parts=[types.Part.from_function_response(
+                name="get_file_content", response={"result": "x" * 1500})]),
+            types.Content(role="model", parts=[types.Part(text=f"answer {i}: it evaluates infix expressions. " * 4)]),
+        ]
+    save_memory(tmp, history)
+    return "summarise what we discussed", [{"parts": [{"text": "We discussed the calculator."}]}]
+
+
+def scenario_fanout_20(tmp: Path) -> tuple[str, list[dict]]:
+    """One model turn asking for 20 tool calls at once."""
+    _sandbox(tmp)
+    files = ["main.py", "tests.py", "pkg/calculator.py", "pkg/render.py", "README.md"]
+    calls = [
+        {"function_call": {"name": "get_file_content", "args": {"file_path": files[i % len(files)]}}}
+        for i in range(16)
+    ] + [
+        {"function_call": {"name": "get_files_info", "args": {"directory": d}}}
+        for d in (".", "pkg", ".", "pkg")
+    ]
+    return "read everything", [{"parts": calls}, {"parts": [{"text": "Read all 20."}]}]
+
+
+SCENARIOS: dict[str, Callable[[Path], tuple[str, list[dict]]]] = {
+    "calculator_fix": scenario_calculator_fix,
+    "history_200": scenario_history_200,
+    "fanout_20": scenario_fanout_20,
+}
+
+
+# ─── Runner ───────────────────────────────────────────────────────────────────
+
+def run_once(name: str, latency_s: float, stream: bool) -> dict[str, float]:
+    with tempfile.TemporaryDirectory(prefix=f"claii-bench-{name}-") as tmp_name:
+        tmp = Path(tmp_name)
+        prompt, steps = SCENARIOS[name](tmp)
+        provider = ReplayProvider(steps, latency_s=latency_s)
+        args = agent.AgentArgs(user_prompt=prompt, stream=stream)
+        timings = Timings()
+
+        with instrumented(timings), contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            asyncio.run(agent.run_session(
+                args,
+                provider=provider,
+                project_root=tmp,
+                working_directory=str(tmp / "calculator"),
+            ))
+            wall = time.perf_counter() - start
+
+    provider_s = _union(provider.call_intervals)
+    tools_s = _union(timings.intervals["tools"])
+    memory_s = _union(timings.intervals["memory"])
+    accounted = _union(provider.call_intervals + timings.intervals["tools"] + timings.intervals["memory"])
+    n_steps = max(1, len(provider.call_intervals))
+    return {
+        "wall_ms": wall * 1000,
+        "steps": n_steps,
+        "tool_calls": len(timings.intervals["tools"]),
+        "provider_ms": provider_s * 1000,
+        "tools_ms": tools_s * 1000,
+        "memory_ms": memory_s * 1000,
+        "overhead_per_step_ms": (wall - accounted) * 1000 / n_steps,
+    }
+
+
+def run_scenario(name: str, iterations: int, latency_s: float, stream: bool) -> dict[str, float]:
+    runs = [run_once(name, latency_s, stream) for _ in range(iterations)]
+    return {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="synthetic model latency per call")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("--stream", action="store_true",
+                        help="use the streaming path (overhead then overlaps provider time)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-overhead-ms", type=float,
+                        help="fail if any scenario's per-step overhead exceeds this")
+    opts = parser.parse_args(argv)
+
+    results = {
+        name: run_scenario(name, opts.iterations, opts.latency_ms / 1000, opts.stream)
+        for name in (opts.scenario or SCENARIOS)
+    }
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+    else:
+        header = f"{'scenario':<16}{'steps':>6}{'calls':>6}{'wall':>10}{'provider':>10}{'tools':>10}{'memory':>10}{'ovh/step':>10}"
+        print(header)
+        print("-" * len(header))
+        for name, r in results.items():
+            print(
+                f"{name:<16}{r['steps']:>6.0f}{r['tool_calls']:>6.0f}{r['wall_ms']:>10.1f}"
+                f"{r['provider_ms']:>10.1f}{r['tools_ms']:>10.1f}{r['memory_ms']:>10.1f}"
+                f"{r['overhead_per_step_ms']:>10.2f}"
+            )
+        print("(all times in ms, medians over", opts.iterations, "iterations)")
+
+    if opts.max_overhead_ms is not None:
+        over = {n: r["overhead_per_step_ms"] for n, r in results.items()
+                if r["overhead_per_step_ms"] > opts.max_overhead_ms}
+        if over:
+            for n, v in over.items():
+                print(f"FAIL {n}: {v:.2f} ms/step overhead > {opts.max_overhead_ms} ms", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
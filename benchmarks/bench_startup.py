@@ -0,0 +1,132 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark for the claii entry point.
+
+Each case runs in a fresh interpreter (as a script invoking `claii`
+would) and reports the median wall time over several runs, both in
+absolute terms and above a bare `python -c pass`. Cases:
+
+- help:    claii --help
+- usage:   claii with no arguments (usage error)
+- memory:  claii --memory in an empty directory
+- agent:   import claii.agent and build the tool declarations (what a
+           real prompt pays before its first model call)
+
+The first three are the fast paths: they must not import google.genai,
+and the script fails if one does.
+
+Usage:
+    python benchmarks/bench_startup.py [--iterations N] [--json]
+                                       [--max-fast-ms MS]
+
+With --max-fast-ms the script exits non-zero if any fast path's median
+time above the bare interpreter exceeds the limit, so it can gate merges.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs one case in the child and prints, as its last line, whether the
+# SDK got imported along the way.
+_PROBE = """
+import sys
+sys.path.insert(0, {root!r})
+{body}
+print()
+print("SDK_LOADED=" + str("google.genai" in sys.modules))
+"""
+
+_CLI = """
+from claii.cli import main
+sys.argv = ["claii", *{argv!r}]
+try:
+    main()
+except SystemExit:
+    pass
+"""
+
+CASES: dict[str, tuple[str, bool]] = {
+    # name: (child code, is a fast path)
+    "baseline": ("", True),
+    "help": (_CLI.format(argv=["--help"]), True),
+    "usage": (_CLI.format(argv=[]), True),
+    "memory": (_CLI.format(argv=["--memory"]), True),
+    "agent": ("import claii.agent as agent\nagent._build_tools()", False),
+}
+
+
+def run_case(code: str, cwd: str) -> tuple[float, bool]:
+    script = _PROBE.format(root=str(REPO_ROOT), body=code)
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    loaded = proc.stdout.strip().splitlines()[-1] == "SDK_LOADED=True"
+    return elapsed, loaded
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-fast-ms", type=float,
+                        help="fail if a fast path takes longer than this above the baseline")
+    opts = parser.parse_args(argv)
+
+    results: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory(prefix="claii-bench-") as tmp:
+        # warm the OS file cache and the .pyc files once
+        for code, _ in CASES.values():
+            run_case(code, tmp)
+        for name, (code, fast) in CASES.items():
+            samples = []
+            loaded = False
+            for _ in range(opts.iterations):
+                ms, loaded = run_case(code, tmp)
+                samples.append(ms)
+            results[name] = {"median_ms": statistics.median(samples), "fast": fast, "sdk_loaded": loaded}
+
+    baseline = results["baseline"]["median_ms"]
+    for r in results.values():
+        r["over_baseline_ms"] = r["median_ms"] - baseline
+
+    if opts.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':<10}{'median':>10}{'+python':>10}  sdk")
+        print("-" * 36)
+        for name, r in results.items():
+            print(f"{name:<10}{r['median_ms']:>10.1f}{r['over_baseline_ms']:>10.1f}  "
+                  f"{'yes' if r['sdk_loaded'] else 'no'}")
+        print(f"(ms, medians over {opts.iterations} runs; +python = above a bare interpreter)")
+
+    failed = False
+    for name, r in results.items():
+        if not r["fast"] or name == "baseline":
+            continue
+        if r["sdk_loaded"]:
+            print(f"FAIL: {name} imported google.genai", file=sys.stderr)
+            failed = True
+        if opts.max_fast_ms is not None and r["over_baseline_ms"] > opts.max_fast_ms:
+            print(f"FAIL: {name} took {r['over_baseline_ms']:.1f} ms above baseline "
+                  f"(limit {opts.max_fast_ms:g} ms)", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
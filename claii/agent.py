@@ -2,96 +2,189 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
+import json
+import os
 import re
 import sys
+import time
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List
 
 from google.genai import types
 
 from .providers import get_provider
-from .memory import load_memory, save_memory
+from .providers.base import rooted_at
+from .providers.context_cache import prefix_session
+from .context import CHARS_PER_TOKEN, ContextManager, message_chars, part_chars
+from .memory import RETAIN_RECORDS, load_memory, save_memory
+from .tracing import Tracer, span, tracing
+from .usage import UsageMeter, metering
 
-from functions.get_files_info import schema_get_files_info, get_files_info
-from functions.get_file_content import schema_get_file_content, get_file_content
-from functions.run_python import schema_run_python_file, run_python_file
-from functions.write_file import schema_write_file, write_file
-from functions.get_kb_file import schema_get_kb_file, get_kb_file
+from functions.get_kb_file import get_kb_file
+from functions.search_kb import retrieve_kb
+from functions.read_cache import READ_CACHE
+from functions.registry import ToolArgumentError, load_tools
 
 
 # ─── Agent config ──────────────────────────────────────────────────────────────
 
 MAX_AGENT_STEPS = 20          # max reasoning/tool-use iterations per run
-MAX_MEMORY_MESSAGES = 200     # how many messages to keep when pruning history
+MAX_MEMORY_MESSAGES = 200     # how many remembered messages to load into a run
 DEFAULT_WORKING_DIR = "."     # current directory. 
 # You can change DEFAULT_WORKING_DIR to sub-dirs in your project to tighten agent scope, but this will limit what the agent can "see".
+MAX_TOOL_WORKERS = int(os.getenv("CLAII_TOOL_WORKERS", "4"))  # how many read-only tools may run at once
+STEP_TIMEOUT_S = float(os.getenv("CLAII_STEP_TIMEOUT", "300"))  # wall-clock cap per agent step
+MAX_CONTEXT_TOKENS = int(os.getenv("CLAII_MAX_CONTEXT_TOKENS", "32000"))  # estimated tokens per request
+# Per-run budgets (0 = unlimited); --max-tokens / --max-seconds override them.
+# A run that reaches one stops cleanly with whatever answer it has so far.
+MAX_RUN_TOKENS = int(os.getenv("CLAII_MAX_TOKENS", "0"))  # prompt + output tokens, all model calls
+MAX_RUN_SECONDS = float(os.getenv("CLAII_MAX_SECONDS", "0"))  # wall clock for the whole run
 
 
+# ─── System prompt ─────────────────────────────────────────────────────────────
+
+SYSTEM_PROMPT = """
+You are CLAII, a helpful AI coding agent that edits and runs code in the user's workspace.
+
+You can:
+
+- List files and directories
+- Read file contents
+- Search code across the workspace
+- Search the knowledge base (kb/) for relevant passages
+- Execute Python files with optional arguments
+- Write or overwrite files
+- Edit parts of files with search/replace blocks or unified diffs
+
+You must ALWAYS:
+- Keep paths relative to the working directory
+- Use tools instead of guessing file contents
+- Make a plan before making changes
+- Validate your changes by running tests when available
+
+Refactor / bugfix workflow:
+
+1. Use get_files_info to discover relevant files (recursive=true lists a whole
+   subtree in one call), and search_code to find where something is defined
+   or used.
+2. Use get_file_content to inspect code (start_line/end_line for parts of
+   large files), or get_files_content to read several files (or a glob such
+   as "*.py") in one call.
+3. Describe your plan briefly in natural language.
+4. Use apply_edit to apply small, focused changes to existing files (short
+   search/replace blocks), and write_file only for new files or full rewrites.
+5. Use run_python_file to run tests or scripts to verify.
+
+Knowledge base usage:
+
+- When the user mentions @kb/<path>, treat it as a reference to the file "kb/<path>"
+  under the working directory. Inline KB content or call get_kb_file as needed.
+- To find KB content on a topic, call search_kb with keywords or a question; it
+  returns the most relevant passages, so prefer it over reading whole KB files.
+- When the user mentions @file:<path>, treat it as a hint to inspect that project file
+  via get_file_content with file_path="<path>".
+
+Path handling rules:
+
+- If a user mentions a path that might be inside the working directory, ALWAYS
+  call get_files_info or get_file_content to check, instead of assuming it does
+  not exist. Never claim a directory or file is invalid without calling a tool.
+
+- Treat most user paths as project-relative. If a user writes something like
+  "/src", "/root", or "/claii.egg-info", interpret these as relative to the
+  working directory (e.g. "src", "root", "claii.egg-info") unless it is clearly
+  an absolute OS path such as "/home/user/...". When in doubt, prefer the
+  project-relative interpretation and call a tool rather than refusing.
+
+"""
+
 
 # ─── Arg parsing & helpers ─────────────────────────────────────────────────────
 
-def _parse_args(argv: List[str]) -> tuple[str, bool, bool, bool]:
+@dataclass
+class AgentArgs:
+    user_prompt: str
+    verbose: bool = False
+    use_memory: bool = True
+    prune_history: bool = True
+    stream: bool = True
+    trace_file: str | None = None
+    max_tokens: int = MAX_RUN_TOKENS
+    max_seconds: float = MAX_RUN_SECONDS
+
+
+def _parse_args(argv: List[str]) -> AgentArgs:
     """
     Parse CLI args for the agent.
 
     Expected:
-        claii "<prompt>" [--verbose] [--no-memory] [--no-prune]
-
-    Returns:
-        (user_prompt, verbose, use_memory, prune_history)
+        claii "<prompt>" [--verbose] [--no-memory] [--no-prune] [--no-stream]
+                         [--trace FILE] [--max-tokens N] [--max-seconds S]
     """
+    usage = (
+        'Usage: claii "<prompt>" [--verbose] [--no-memory] [--no-prune] [--no-stream]\n'
+        "                        [--trace FILE] [--max-tokens N] [--max-seconds S]"
+    )
     if not argv:
-        print('Usage: claii "<prompt>" [--verbose] [--no-memory] [--no-prune]')
+        print(usage)
         sys.exit(1)
 
     user_prompt = argv[0]
     flags = argv[1:]
 
-    verbose = "--verbose" in flags
-    use_memory = "--no-memory" not in flags
-    prune_history = "--no-prune" not in flags
-
-    return user_prompt, verbose, use_memory, prune_history
+    def value(flag: str, convert):
+        if flag not in flags:
+            return None
+        try:
+            return convert(flags[flags.index(flag) + 1])
+        except (IndexError, ValueError):
+            print(usage)
+            sys.exit(1)
+
+    max_tokens = value("--max-tokens", int)
+    max_seconds = value("--max-seconds", float)
+    return AgentArgs(
+        user_prompt=user_prompt,
+        verbose="--verbose" in flags,
+        use_memory="--no-memory" not in flags,
+        prune_history="--no-prune" not in flags,
+        stream="--no-stream" not in flags,
+        trace_file=value("--trace", str),
+        max_tokens=MAX_RUN_TOKENS if max_tokens is None else max_tokens,
+        max_seconds=MAX_RUN_SECONDS if max_seconds is None else max_seconds,
+    )
 
 
-def _prune_messages(
-    messages: List[types.Content],
-    max_messages: int = MAX_MEMORY_MESSAGES,
-) -> List[types.Content]:
+@functools.cache
+def _build_tools() -> types.Tool:
     """
-    Keep only the most recent `max_messages` entries in the history.
-    System prompt is separate, so this only affects conversation messages.
+    Return the Tool spec with every registered tool's declaration (see
+    functions/registry.py), built once per process.
     """
-    if len(messages) <= max_messages:
-        return messages
-    return messages[-max_messages:]
-
-
-def _build_tools() -> types.Tool:
-    """Return the Tool spec with all function declarations."""
-    return types.Tool(
-        function_declarations=[
-            schema_get_files_info,
-            schema_get_file_content,
-            schema_run_python_file,
-            schema_write_file,
-            schema_get_kb_file,
-        ]
-    )
+    return types.Tool(function_declarations=[spec.declaration for spec in load_tools().values()])
 
 
 # ─── @-mention expansion ───────────────────────────────────────────────────────
 
 KB_PATTERN = re.compile(r"@kb/([^\s]+)")
+KB_QUERY_PATTERN = re.compile(r'@kb\?(?:"([^"]+)"|(\S+))')
 FILE_PATTERN = re.compile(r"@file:([^\s]+)")
 
 
 def expand_at_mentions(prompt: str, working_directory: str) -> str:
     """
-    Expand @kb/file.md into inline KB content, and annotate @file:path/to/file.py
+    Expand @kb/file.md into inline KB content, @kb?query into the KB
+    passages that best match the query, and annotate @file:path/to/file.py
     so the agent is nudged to call the right tools.
 
     - @kb/foo.md → embeds the content of kb/foo.md (using get_kb_file)
+    - @kb?retry or @kb?"retry backoff" → embeds the top KB_TOP_K chunks of
+      kb/ for that query, within KB_INLINE_CHARS (using the BM25 index
+      behind search_kb)
     - @file:src/main.py → leaves a descriptive hint telling the model to use
       get_file_content with file_path="src/main.py"
     """
@@ -115,7 +208,25 @@ def expand_at_mentions(prompt: str, working_directory: str) -> str:
 
     text = KB_PATTERN.sub(kb_repl, text)
 
-    # 2) Annotate explicit @file paths – do NOT auto-load, just hint
+    # 2) Inline only the relevant KB chunks for @kb?query
+    def kb_query_repl(match: re.Match) -> str:
+        query = match.group(1) or match.group(2)
+        try:
+            passages = retrieve_kb(working_directory, query)
+        except Exception as e:  # noqa: BLE001
+            return f'@kb?"{query}" (KB search error: {e})'
+        if not passages:
+            return f'@kb?"{query}" (no KB passages matched)'
+        return (
+            f'Below are the knowledge base passages most relevant to "{query}":\n'
+            f"--- KB START [?{query}] ---\n"
+            f"{passages}\n"
+            f"--- KB END [?{query}] ---\n"
+        )
+
+    text = KB_QUERY_PATTERN.sub(kb_query_repl, text)
+
+    # 3) Annotate explicit @file paths – do NOT auto-load, just hint
     def file_repl(match: re.Match) -> str:
         path = match.group(1)  # e.g. "calculator/pkg/calculator.py"
         return (
@@ -130,183 +241,514 @@ def expand_at_mentions(prompt: str, working_directory: str) -> str:
 
 # ─── Function dispatcher ───────────────────────────────────────────────────────
 
-# ─── Function dispatcher ───────────────────────────────────────────────────────
-
-def _call_function(function_call_part, verbose: bool = False) -> types.Content:
+def _tool_reply(function_name: str, response: dict) -> types.Content:
     """
-    Dispatch a model function_call to the underlying Python implementation
-    and wrap the result back into a tool response Content.
+    Wrap a tool result as a function_response Content.
 
     NOTE:
     - Gemini's SDK only accepts roles "user" or "model".
       We encode tool results as `role="user"` with a function_response part.
     """
+    return types.Content(
+        role="user",
+        parts=[
+            types.Part.from_function_response(
+                name=function_name,
+                response=response,
+            )
+        ],
+    )
+
+
+def _answer_unanswered_calls(messages: List[types.Content], reason: str) -> None:
+    """
+    If the history ends with the model's function calls and no replies (a
+    step timed out or was cancelled while its tools ran), answer each call
+    with an error reply. The model rejects calls without responses, so an
+    unpaired turn would break the next request, or the next session once
+    it is saved to memory.
+    """
+    if not messages or messages[-1].role != "model":
+        return
+    calls = [part.function_call for part in messages[-1].parts or [] if part.function_call]
+    messages.extend(_tool_reply(fc.name, {"error": reason}) for fc in calls)
+
+
+async def _call_function(
+    function_call_part,
+    verbose: bool = False,
+    working_directory: str = DEFAULT_WORKING_DIR,
+) -> types.Content:
+    """
+    Dispatch a model function_call to the underlying Python implementation
+    and wrap the result back into a tool response Content.
+    """
     function_name = function_call_part.name
     args = dict(function_call_part.args or {})
 
     # Inject working directory – model never controls this.
-    args.setdefault("working_directory", DEFAULT_WORKING_DIR)
+    args["working_directory"] = working_directory
 
     if verbose:
         print(f"Calling function: {function_name}({args})")
     else:
         print(f" - Calling function: {function_name}")
 
-    fn_map = {
-        "get_files_info": get_files_info,
-        "get_file_content": get_file_content,
-        "run_python_file": run_python_file,
-        "write_file": write_file,
-        "get_kb_file": get_kb_file,
-    }
-
-    fn = fn_map.get(function_name)
-    if fn is None:
-        # Unknown function name – return a tool-style error object,
-        # but encoded as a `user` message with a function_response.
-        return types.Content(
-            role="user",
-            parts=[
-                types.Part.from_function_response(
-                    name=function_name,
-                    response={"error": f"Unknown function: {function_name}"},
-                )
-            ],
-        )
-
-    # Actually run the underlying function
-    result = fn(**args)
+    spec = load_tools().get(function_name)
+    if spec is None:
+        # Unknown function name – return a tool-style error object
+        return _tool_reply(function_name, {"error": f"Unknown function: {function_name}"})
+
+    # Checks the arguments first, then runs the tool: natively if it is a
+    # coroutine, on a worker thread otherwise, within its deadline
+    with span(function_name, "tool", tool=function_name, cost=spec.cost) as s:
+        if s:
+            s.set(bytes_in=len(json.dumps(args, default=str)))
+        try:
+            result = await spec.run(args)
+        except (ToolArgumentError, TimeoutError) as e:
+            if s:
+                s.set(error=str(e))
+            if verbose:
+                print(f"-> error: {e}")
+            return _tool_reply(function_name, {"error": str(e)})
+        if s:
+            s.set(bytes_out=len(result) if isinstance(result, str) else len(json.dumps(result, default=str)))
 
     if verbose:
         print(f"-> {result!r}")
 
     # Wrap as a tool response for the model
-    return types.Content(
-        role="user",
-        parts=[
-            types.Part.from_function_response(
-                name=function_name,
-                response={"result": result},
-            )
-        ],
-    )
-
+    return _tool_reply(function_name, {"result": result})
 
-# ─── Main agent entrypoint ─────────────────────────────────────────────────────
 
-def run_agent(argv: List[str] | None = None, banner_shown: bool = False) -> None:
+class _ToolDispatcher:
     """
-    Core agent loop. This is called from claii.cli.main().
+    Dispatch function calls as they arrive and hand back the tool replies
+    in the original call order.
+
+    Read-only calls start right away and run side by side, at most
+    `max_workers` at a time. Writes and executions act as barriers: they
+    wait for everything submitted before them, and later calls wait for
+    them, so a read issued after a write still sees its effect.
+
+    A dispatcher lives exactly as long as its step: use it as
+    `async with _ToolDispatcher(...) as dispatcher`, so a step that times
+    out, is cancelled or fails cancels the calls it started (killing any
+    running script) and waits for them to stop before the step is left.
     """
-    if argv is None:
-        argv = sys.argv[1:]
 
-    user_prompt, verbose, use_memory, prune_history = _parse_args(argv)
+    def __init__(
+        self,
+        max_workers: int = MAX_TOOL_WORKERS,
+        verbose: bool = False,
+        working_directory: str = DEFAULT_WORKING_DIR,
+    ) -> None:
+        self._slots = asyncio.Semaphore(max(1, max_workers))
+        self._verbose = verbose
+        self._working_directory = working_directory
+        self._tasks: list[asyncio.Task] = []
+        self._barrier: asyncio.Task | None = None
+        self._since_barrier: list[asyncio.Task] = []
+        # Tool calls run in the context the dispatcher was made in, so
+        # their trace spans nest under the step, not the model stream
+        self._context = contextvars.copy_context()
+
+    async def _run(self, deps: list[asyncio.Task], function_call_part) -> types.Content:
+        if deps:
+            # Failures surface through results(); here we only need ordering
+            await asyncio.gather(*deps, return_exceptions=True)
+        async with self._slots:
+            return await _call_function(
+                function_call_part,
+                verbose=self._verbose,
+                working_directory=self._working_directory,
+            )
 
-    if verbose and not banner_shown:
-        print(f"User prompt: {user_prompt}")
+    async def __aenter__(self) -> "_ToolDispatcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Cancel every call still running and wait until all of them have stopped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _start(self, coro) -> asyncio.Task:
+        return asyncio.create_task(coro, context=self._context.copy())
+
+    def submit(self, function_call_part) -> None:
+        spec = load_tools().get(function_call_part.name)
+        if spec is not None and spec.read_only:
+            deps = [self._barrier] if self._barrier else []
+            task = self._start(self._run(deps, function_call_part))
+            self._since_barrier.append(task)
+        else:
+            deps = self._since_barrier + ([self._barrier] if self._barrier else [])
+            task = self._start(self._run(deps, function_call_part))
+            self._barrier = task
+            self._since_barrier = []
+        self._tasks.append(task)
+
+    async def results(self) -> List[types.Content]:
+        """Wait for every submitted call; replies come back in call order."""
+        try:
+            return list(await asyncio.gather(*self._tasks))
+        except BaseException:
+            # Timeout, cancellation or a failing tool: stop the stragglers
+            # and wait for them, so none of them acts after the step
+            await self.aclose()
+            raise
+
+
+# ─── Agent steps ───────────────────────────────────────────────────────────────
+
+async def _generate(provider, messages: List[types.Content], tools: types.Tool, system_prompt: str):
+    """Call the provider's async API, or run its blocking one on a thread."""
+    kwargs = dict(messages=messages, tools=[tools], system_prompt=system_prompt)
+    with span("generate", "provider", model=getattr(provider, "model_name", None)) as s:
+        if s:
+            s.set(bytes_in=sum(message_chars(m) for m in messages))
+        if hasattr(provider, "agenerate"):
+            response = await provider.agenerate(**kwargs)
+        else:
+            response = await asyncio.to_thread(provider.generate, **kwargs)
+        if s:
+            s.set(bytes_out=sum(message_chars(c.content) for c in response.candidates or [] if c.content))
+        return response
+
+
+def _prepare(context: ContextManager, messages: List[types.Content]) -> List[types.Content]:
+    with span("context.prepare", "local", messages=len(messages)):
+        return context.prepare(messages)
+
+
+async def _run_step(
+    provider,
+    messages: List[types.Content],
+    tools: types.Tool,
+    system_prompt: str,
+    dispatcher: _ToolDispatcher,
+    context: ContextManager,
+) -> tuple[list[str], bool]:
+    """
+    One non-streaming model round trip. Sends the budgeted view of
+    `messages`, appends the model reply and any tool replies to it, and
+    returns (texts, any_function_calls).
+    """
+    response = await _generate(provider, _prepare(context, messages), tools, system_prompt)
 
-    provider = get_provider()
-    tools = _build_tools()
-    project_root = Path.cwd()
-    working_directory = DEFAULT_WORKING_DIR
+    finished_texts: list[str] = []
+    any_function_calls = False
 
-    system_prompt = """
-You are CLAII, a helpful AI coding agent that edits and runs code in the user's workspace.
+    for candidate in response.candidates:
+        content = candidate.content
+        # Model's reply goes into the conversation
+        messages.append(content)
 
-You can:
+        # Inspect for function calls; independent calls are dispatched together
+        for part in content.parts:
+            fc = getattr(part, "function_call", None)
+            if fc:
+                any_function_calls = True
+                dispatcher.submit(fc)
+            elif hasattr(part, "text") and part.text:
+                finished_texts.append(part.text)
 
-- List files and directories
-- Read file contents
-- Execute Python files with optional arguments
-- Write or overwrite files
+    messages.extend(await dispatcher.results())
+    return finished_texts, any_function_calls
 
-You must ALWAYS:
-- Keep paths relative to the working directory
-- Use tools instead of guessing file contents
-- Make a plan before making changes
-- Validate your changes by running tests when available
-
-Refactor / bugfix workflow:
-
-1. Use get_files_info to discover relevant files.
-2. Use get_file_content to inspect code.
-3. Describe your plan briefly in natural language.
-4. Use write_file to apply small, focused changes.
-5. Use run_python_file to run tests or scripts to verify.
-
-Knowledge base usage:
 
-- When the user mentions @kb/<path>, treat it as a reference to the file "kb/<path>"
-  under the working directory. Inline KB content or call get_kb_file as needed.
-- When the user mentions @file:<path>, treat it as a hint to inspect that project file
-  via get_file_content with file_path="<path>".
+async def _run_step_streaming(
+    provider,
+    messages: List[types.Content],
+    tools: types.Tool,
+    system_prompt: str,
+    dispatcher: _ToolDispatcher,
+    context: ContextManager,
+) -> tuple[list[str], bool]:
+    """
+    Streaming variant of `_run_step`.
 
-Path handling rules:
+    Text is echoed as it arrives and each function_call is dispatched as
+    soon as its part lands, so tools run while the model is still talking.
+    If the stream fails or the step is cancelled part-way, the stream is
+    closed and the calls already dispatched are cancelled and waited for,
+    so nothing it started keeps running.
+    """
+    parts: list[types.Part] = []
+    any_function_calls = False
+    printed_text = False
+
+    request = _prepare(context, messages)
+    started = time.perf_counter()
+    with span("generate_stream", "provider", model=getattr(provider, "model_name", None)) as s:
+        if s:
+            s.set(bytes_in=sum(message_chars(m) for m in request), bytes_out=0)
+        stream = provider.agenerate_stream(
+            messages=request,
+            tools=[tools],
+            system_prompt=system_prompt,
+        )
+        try:
+            async for part in stream:
+                if s:
+                    if "first_part_ms" not in s.attrs:
+                        s.set(first_part_ms=round((time.perf_counter() - started) * 1000, 3))
+                    s.add(bytes_out=part_chars(part))
+                fc = getattr(part, "function_call", None)
+                if fc:
+                    any_function_calls = True
+                    if printed_text:
+                        print()
+                        printed_text = False
+                    dispatcher.submit(fc)
+                    parts.append(part)
+                elif getattr(part, "text", None):
+                    print(part.text, end="", flush=True)
+                    printed_text = True
+                    # Fold consecutive text fragments back into a single part
+                    if parts and parts[-1].text is not None and not parts[-1].function_call:
+                        parts[-1] = types.Part(text=parts[-1].text + part.text)
+                    else:
+                        parts.append(types.Part(text=part.text))
+                else:
+                    parts.append(part)
+        except BaseException:
+            await dispatcher.aclose()
+            raise
+        finally:
+            if hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    if printed_text:
+        print()
+
+    messages.append(types.Content(role="model", parts=parts))
+    messages.extend(await dispatcher.results())
+
+    finished_texts = [p.text for p in parts if p.text]
+    return finished_texts, any_function_calls
 
-- If a user mentions a path that might be inside the working directory, ALWAYS
-  call get_files_info or get_file_content to check, instead of assuming it does
-  not exist. Never claim a directory or file is invalid without calling a tool.
 
-- Treat most user paths as project-relative. If a user writes something like
-  "/src", "/root", or "/claii.egg-info", interpret these as relative to the
-  working directory (e.g. "src", "root", "claii.egg-info") unless it is clearly
-  an absolute OS path such as "/home/user/...". When in doubt, prefer the
-  project-relative interpretation and call a tool rather than refusing.
+# ─── Main agent entrypoint ─────────────────────────────────────────────────────
 
-"""
+def _budget_spent(args: AgentArgs, meter: UsageMeter, deadline: float | None) -> str | None:
+    """Why the run may not take another step, or None while within budget."""
+    if args.max_tokens > 0:
+        used = meter.total_tokens
+        # the next request resends at least the previous prompt
+        if used + meter.last_prompt_tokens > args.max_tokens:
+            return f"token budget reached ({used:,} of {args.max_tokens:,} tokens used)"
+    if deadline is not None and time.monotonic() >= deadline:
+        return f"time budget of {args.max_seconds:g}s used up"
+    return None
+
+
+async def run_session(
+    args: AgentArgs,
+    *,
+    provider=None,
+    project_root: str | Path | None = None,
+    working_directory: str = DEFAULT_WORKING_DIR,
+    step_timeout: float | None = STEP_TIMEOUT_S,
+) -> str | None:
+    """
+    Async agent engine: one prompt, run to a final answer.
+
+    Sessions share no mutable state, so many of them can run concurrently
+    on one event loop. Each step (model call plus its tools) is bounded by
+    `step_timeout` seconds; cancelling the task stops the step in flight,
+    including any running `run_python_file` subprocess.
+
+    With `args.trace_file`, every phase (model calls, tools, memory,
+    local work) is traced and the spans are written there at the end (see
+    claii/tracing.py); a relative path is taken from `project_root`, as
+    are the providers' on-disk caches (see claii/providers/base.py).
+
+    Tokens are counted per step from the providers' usage reports (see
+    claii/usage.py). Once `args.max_tokens` or `args.max_seconds` is used
+    up the loop stops before the next step (a step in flight when the
+    time runs out is cut short), and the run ends with the text the
+    model had produced so far.
+
+    Returns the final (or partial) answer text, or None if the run ended
+    without one.
+    """
+    project_root = Path(project_root) if project_root is not None else Path.cwd()
+    deadline = time.monotonic() + args.max_seconds if args.max_seconds > 0 else None
+    tracer = Tracer() if args.trace_file else None
+    meter = UsageMeter()
+    with tracing(tracer), metering(meter), rooted_at(project_root), prefix_session():
+        try:
+            with span("session", "agent", prompt_chars=len(args.user_prompt)) as s:
+                final = await _run_session(
+                    args, provider, project_root, working_directory, step_timeout, meter, deadline
+                )
+                if s:
+                    s.set(prompt_tokens=meter.prompt_tokens, output_tokens=meter.output_tokens)
+                return final
+        finally:
+            if tracer is not None:
+                trace_path = project_root / args.trace_file
+                try:
+                    tracer.write(trace_path)
+                except OSError as e:
+                    print(f"Could not write the trace to {trace_path}: {e}")
+                else:
+                    print(tracer.summary())
+                    print(f"Trace written to {trace_path}")
+
+
+async def _run_session(
+    args: AgentArgs,
+    provider,
+    project_root: Path,
+    working_directory: str,
+    step_timeout: float | None,
+    meter: UsageMeter,
+    deadline: float | None,
+) -> str | None:
+    verbose = args.verbose
+
+    if provider is None:
+        provider = get_provider()
+    tools = _build_tools()
 
     # ── Memory bootstrap ───────────────────────────────────────────────────────
-    if use_memory:
-        messages: List[types.Content] = load_memory(project_root)
+    memory_window = MAX_MEMORY_MESSAGES if args.prune_history else None
+    if args.use_memory:
+        with span("load_memory", "memory") as s:
+            messages: List[types.Content] = await asyncio.to_thread(
+                load_memory, project_root, memory_window
+            )
+            if s:
+                s.set(messages=len(messages), bytes_in=sum(message_chars(m) for m in messages))
     else:
         messages = []
+    n_remembered = len(messages)
 
     # Preprocess @-mentions and append the new user request
-    expanded_prompt = expand_at_mentions(user_prompt, working_directory=working_directory)
+    with span("expand_at_mentions", "local") as s:
+        expanded_prompt = await asyncio.to_thread(
+            expand_at_mentions, args.user_prompt, working_directory
+        )
+        if s:
+            s.set(bytes_in=len(args.user_prompt), bytes_out=len(expanded_prompt))
     messages.append(
         types.Content(role="user", parts=[types.Part(text=expanded_prompt)])
     )
 
     # ── Agent loop ────────────────────────────────────────────────────────────
-    for _ in range(MAX_AGENT_STEPS):
-        response = provider.generate(
-            messages=messages,
-            tools=[tools],
-            system_prompt=system_prompt,
-        )
+    stream = args.stream and hasattr(provider, "agenerate_stream")
+    run_step = _run_step_streaming if stream else _run_step
+    final: str | None = None
+    partial: list[str] = []  # text from steps that also called tools
+    stopped: str | None = None  # why a budget ended the run
+
+    # Requests are trimmed to MAX_CONTEXT_TOKENS before every model call;
+    # the system prompt and tool schemas count against it too.
+    fixed_chars = len(SYSTEM_PROMPT) + len(tools.model_dump_json(exclude_none=True))
+    context = ContextManager(MAX_CONTEXT_TOKENS, fixed_tokens=fixed_chars // CHARS_PER_TOKEN)
+
+    try:
+        for step in range(MAX_AGENT_STEPS):
+            stopped = _budget_spent(args, meter, deadline)
+            if stopped:
+                break
+            meter.start_step(step + 1)
+            timeout = step_timeout
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+                timeout = remaining if timeout is None else min(timeout, remaining)
+
+            with span("step", "agent", step=step + 1) as s:
+                try:
+                    async with asyncio.timeout(timeout):
+                        # no tool call outlives its step (see _ToolDispatcher)
+                        async with _ToolDispatcher(
+                            verbose=verbose, working_directory=working_directory
+                        ) as dispatcher:
+                            finished_texts, any_function_calls = await run_step(
+                                provider, messages, tools, SYSTEM_PROMPT, dispatcher, context
+                            )
+                except TimeoutError:
+                    s.set(error="TimeoutError")
+                    stopped = _budget_spent(args, meter, deadline)
+                    if not stopped:
+                        print(f"Agent step timed out after {step_timeout:g} seconds.")
+                    break
+
+            # No more tool calls + some final text → we're done
+            if not any_function_calls and finished_texts:
+                final = "\n".join(finished_texts).strip() or None
+                # A streamed answer has already been printed token by token
+                if final and not stream:
+                    print("Final response:\n")
+                    print(final)
+                break
+            partial.extend(finished_texts)
+        else:
+            # Failsafe if no final answer after MAX_AGENT_STEPS
+            print("Max agent steps reached without final answer.")
+
+        if stopped:
+            print(f"Stopped: {stopped}.")
+            final = "\n".join(partial).strip() or None
+            if final and not stream:
+                print("Partial response:\n")
+                print(final)
+    finally:
+        _answer_unanswered_calls(messages, "the step ended before this call finished; it was cancelled")
+        # ── Persist memory ────────────────────────────────────────────────────
+        # Also on cancellation, so an interrupted session keeps its history.
+        # In a worker thread, like load_memory: under `claii serve` the loop
+        # is shared with other sessions. A second cancellation only stops
+        # the wait; the thread still finishes the write.
+        if args.use_memory:
+            with span("save_memory", "memory") as s:
+                await asyncio.to_thread(
+                    save_memory,
+                    project_root,
+                    messages,
+                    start=n_remembered,
+                    retain=RETAIN_RECORDS if args.prune_history else None,
+                )
+                if s:
+                    s.set(messages=len(messages) - n_remembered,
+                          bytes_out=sum(message_chars(m) for m in messages[n_remembered:]))
 
-        finished_texts: list[str] = []
-        any_function_calls = False
+    if meter.calls:
+        print(meter.summary(per_step=verbose))
 
-        for candidate in response.candidates:
-            content = candidate.content
-            # Model's reply goes into the conversation
-            messages.append(content)
+    if verbose:
+        stats = READ_CACHE.stats()
+        print(f"Read cache: {stats['hits']} hits, {stats['misses']} misses")
+        inner = provider
+        while inner is not None and not hasattr(inner, "describe"):
+            inner = getattr(inner, "inner", None)  # under Caching/RecordingProvider
+        if inner is not None:
+            print(f"Backends:\n{inner.describe()}")
 
-            # Inspect for function calls
-            for part in content.parts:
-                fc = getattr(part, "function_call", None)
-                if fc:
-                    any_function_calls = True
-                    tool_reply = _call_function(fc, verbose=verbose)
-                    messages.append(tool_reply)
-                elif hasattr(part, "text") and part.text:
-                    finished_texts.append(part.text)
-
-        # No more tool calls + some final text → we're done
-        if not any_function_calls and finished_texts:
-            final = "\n".join(finished_texts).strip()
-            if final:
-                print("Final response:\n")
-                print(final)
-            break
-    else:
-        # Failsafe if no final answer after MAX_AGENT_STEPS
-        print("Max agent steps reached without final answer.")
-
-    # ── Persist memory ────────────────────────────────────────────────────────
-    if use_memory:
-        if prune_history:
-            messages = _prune_messages(messages, MAX_MEMORY_MESSAGES)
-        save_memory(project_root, messages)
+    return final
+
+
+def run_agent(argv: List[str] | None = None, banner_shown: bool = False) -> None:
+    """
+    Core agent loop. This is called from claii.cli.main().
+
+    Synchronous wrapper: parses argv and drives `run_session` on a fresh
+    event loop.
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+
+    args = _parse_args(argv)
+
+    if args.verbose and not banner_shown:
+        print(f"User prompt: {args.user_prompt}")
+
+    asyncio.run(run_session(args))
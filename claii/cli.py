@@ -1,6 +1,12 @@
 # claii/cli.py
+#
+# Kept free of heavy imports: the agent (and with it google.genai, which
+# takes most of a second to import) is only loaded once a prompt is
+# actually going to run, so --help, usage errors and --memory stay fast.
+# When `claii serve` is running, prompts are forwarded to it instead and
+# the agent is never imported here at all.
+import os
 import sys
-from .agent import run_agent
 
 
 CLAII_LOGO = r"""
@@ -12,6 +18,34 @@ CLAII_LOGO = r"""
    ╚═════╝ ╚══════╝╚═╝  ╚═╝╚═╝╚═╝   (CLAII)
 """
 
+USAGE = (
+    'Usage: claii "<prompt>" [--verbose] [--no-memory] [--no-prune] [--no-stream]\n'
+    "                        [--trace FILE] [--max-tokens N] [--max-seconds S]"
+)
+
+HELP = f"""{USAGE}
+       claii --memory [N]
+       claii serve
+
+Options:
+  --verbose        print every tool call with its arguments and result
+  --no-memory      do not load or save the .claii/memory/ log for this run
+  --no-prune       load the whole memory log instead of the recent window
+  --no-stream      wait for each complete model reply instead of streaming it
+  --trace FILE     record where the run's time goes: spans as JSON lines, or
+                   Chrome trace events if FILE ends in .json
+  --max-tokens N   stop once the run has used N prompt + output tokens
+  --max-seconds S  stop once the run has taken S seconds
+                   (both end the run cleanly with the answer so far;
+                   defaults: CLAII_MAX_TOKENS / CLAII_MAX_SECONDS, 0 = no limit)
+  --memory [N]     show what is remembered for this project (last N prompts)
+
+claii serve runs a long-lived daemon that keeps the model client, memory
+and file caches warm; while it is up, claii forwards prompts to it. Set
+CLAII_DAEMON=0 to run a prompt in-process anyway.
+  -h, --help       show this help
+"""
+
 
 def main() -> None:
     # ASCII banner
@@ -21,8 +55,42 @@ def main() -> None:
     argv = sys.argv[1:]
 
     if not argv:
-        print('Usage: claii "<prompt>" [--verbose]')
+        print(USAGE)
         sys.exit(1)
 
-    # Delegate to the core agent logic
+    if argv[0] in ("-h", "--help"):
+        print(HELP)
+        return
+
+    if argv[0] == "--memory":
+        from pathlib import Path
+
+        from .memory import describe_memory
+
+        try:
+            limit = int(argv[1]) if len(argv) > 1 else 10
+        except ValueError:
+            print(USAGE)
+            sys.exit(1)
+        print(describe_memory(Path.cwd(), limit))
+        return
+
+    if argv[0] == "serve":
+        from .daemon import serve
+
+        serve()
+        return
+
+    from .config import DAEMON_SOCKET, USE_DAEMON
+
+    if USE_DAEMON:
+        from .client import connect, run_remote
+
+        sock = connect(DAEMON_SOCKET)
+        if sock is not None:
+            sys.exit(run_remote(sock, argv, os.getcwd()))
+
+    # No daemon: run the core agent logic in this process
+    from .agent import run_agent
+
     run_agent(argv, banner_shown=True)
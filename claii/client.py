@@ -0,0 +1,75 @@
+# claii/client.py
+#
+# The `claii` command's side of `claii serve`. Deliberately stdlib-only
+# and import-light: forwarding a prompt to a warm daemon should cost a
+# few milliseconds, not an SDK import.
+from __future__ import annotations
+
+import json
+import os
+import socket
+import stat
+import sys
+
+CONNECT_TIMEOUT_S = 0.5
+
+
+def _owned_by_me(path: str) -> bool:
+    """
+    True if `path` is a socket owned by this user, in a directory owned by
+    this user. Anyone who can plant a socket there would otherwise receive
+    our prompts (and answer them with tool calls run as us).
+    """
+    try:
+        st = os.lstat(path)
+        parent = os.stat(os.path.dirname(os.path.abspath(path)))
+    except OSError:
+        return False
+    uid = os.getuid()
+    return stat.S_ISSOCK(st.st_mode) and st.st_uid == uid and parent.st_uid == uid
+
+
+def connect(path: str) -> socket.socket | None:
+    """
+    A connection to the daemon at `path`, or None if none is listening
+    (or the socket is not ours; see _owned_by_me).
+    """
+    if not hasattr(socket, "AF_UNIX") or not _owned_by_me(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT_S)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None  # stale socket file, or the daemon is shutting down
+    sock.settimeout(None)
+    return sock
+
+
+def run_remote(sock: socket.socket, argv: list[str], cwd: str) -> int:
+    """
+    Run one prompt on the daemon and copy its output to stdout as it
+    streams in. Returns the session's exit status.
+
+    Wire format (both directions): one JSON object per line.
+      -> {"argv": [...], "cwd": "/abs/project"}
+      <- {"out": "text"} ...  then  {"exit": 0}
+    Closing the connection (e.g. on Ctrl-C) cancels the session.
+    """
+    with sock:
+        sock.sendall((json.dumps({"argv": argv, "cwd": cwd}) + "\n").encode("utf-8"))
+        try:
+            for line in sock.makefile("rb"):
+                msg = json.loads(line)
+                if "out" in msg:
+                    sys.stdout.write(msg["out"])
+                    sys.stdout.flush()
+                elif "exit" in msg:
+                    return int(msg["exit"])
+        except KeyboardInterrupt:
+            return 130
+        except ConnectionError:
+            pass
+    print("claii: lost the connection to the daemon", file=sys.stderr)
+    return 1
@@ -7,6 +7,28 @@ from dataclasses import dataclass
 class ProviderConfig:
     provider: str = os.getenv("CLAII_PROVIDER", "google-genai")
     model: str = os.getenv("CLAII_MODEL", "gemini-2.0-flash-001")
+    response_cache: str = os.getenv("CLAII_RESPONSE_CACHE", "off")  # off | rw | ro
+    replay_file: str = os.getenv("CLAII_REPLAY_FILE", "")   # transcript for CLAII_PROVIDER=replay
+    record_file: str = os.getenv("CLAII_RECORD_FILE", "")   # record responses to this transcript
+    response_cache_max_bytes: int = int(os.getenv("CLAII_RESPONSE_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+    request_timeout_s: float = float(os.getenv("CLAII_REQUEST_TIMEOUT", "120"))  # deadline per model call
+    max_retries: int = int(os.getenv("CLAII_MAX_RETRIES", "3"))     # for transient errors only
+    hedge: bool = os.getenv("CLAII_HEDGE", "0") not in ("0", "false", "off")  # duplicate slow calls
+    keepalive_s: float = float(os.getenv("CLAII_KEEPALIVE", "120"))  # idle pooled connections live this long
+    backends: str = os.getenv("CLAII_BACKENDS", "")              # "provider:model,..." to route between
+    small_backends: str = os.getenv("CLAII_SMALL_BACKENDS", "")  # same, for tool-selection steps
+    context_cache: bool = os.getenv("CLAII_CONTEXT_CACHE", "0") not in ("0", "false", "off")  # server-side prefix cache; billed storage
+    context_cache_ttl_s: float = float(os.getenv("CLAII_CONTEXT_CACHE_TTL", "600"))
+    context_cache_min_tokens: int = int(os.getenv("CLAII_CONTEXT_CACHE_MIN_TOKENS", "4096"))  # smaller prefixes are sent whole
 
 def get_provider_config() -> ProviderConfig:
     return ProviderConfig()
+
+# `claii serve` listens here; the `claii` command forwards prompts to it
+# when it is running. Set CLAII_DAEMON=0 to always run in-process.
+# The socket lives in a private (0700) per-user directory: a predictable
+# path in a shared /tmp could be claimed by another user first.
+_UID = os.getuid() if hasattr(os, "getuid") else 0
+DAEMON_SOCKET_DIR = os.path.join(os.getenv("XDG_RUNTIME_DIR") or "/tmp", f"claii-{_UID}")
+DAEMON_SOCKET = os.getenv("CLAII_SOCKET", os.path.join(DAEMON_SOCKET_DIR, "daemon.sock"))
+USE_DAEMON = os.getenv("CLAII_DAEMON", "1") not in ("0", "false", "off")
@@ -0,0 +1,189 @@
+# claii/context.py
+from __future__ import annotations
+
+import json
+from typing import List
+
+from google.genai import types
+
+# Rough chars-per-token ratio used for estimates; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+# Tool results older than this many model steps may be elided.
+STALE_AFTER_STEPS = 2
+# Tool results shorter than this are never worth eliding.
+MIN_ELIDE_CHARS = 400
+# How much of each folded message survives into the rolling summary.
+SUMMARY_LINE_CHARS = 160
+
+SUMMARY_HEADER = "Summary of earlier conversation (older turns, condensed):"
+
+
+def part_chars(part: types.Part) -> int:
+    if part.text:
+        return len(part.text)
+    if part.function_call:
+        return len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        return len(part.function_response.name or "") + len(json.dumps(part.function_response.response or {}, default=str))
+    return 0
+
+
+def message_chars(content: types.Content) -> int:
+    return sum(part_chars(p) for p in (content.parts or []))
+
+
+def estimate_tokens(content: types.Content) -> int:
+    chars = message_chars(content)
+    # small per-message overhead for role/framing
+    return chars // CHARS_PER_TOKEN + 4
+
+
+def _is_tool_reply(content: types.Content) -> bool:
+    return any(p.function_response for p in (content.parts or []))
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    """A user message that is a prompt, not a tool reply."""
+    return content.role == "user" and not _is_tool_reply(content)
+
+
+def _clip(text: str, limit: int = SUMMARY_LINE_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _summary_line(content: types.Content) -> str:
+    bits: list[str] = []
+    for p in content.parts or []:
+        if p.text:
+            bits.append(_clip(p.text))
+        elif p.function_call:
+            args = json.dumps(p.function_call.args or {}, default=str)
+            bits.append(f"called {p.function_call.name}({_clip(args, 80)})")
+        elif p.function_response:
+            size = part_chars(p)
+            bits.append(f"{p.function_response.name} returned {size} chars")
+    role = "tool" if _is_tool_reply(content) else content.role
+    return f"- {role}: " + "; ".join(bits) if bits else ""
+
+
+class ContextManager:
+    """
+    Keeps every request under a token budget.
+
+    The conversation history itself is never modified; `prepare` returns
+    the list of messages to send for the next step:
+
+    1. If everything fits, the history goes out verbatim.
+    2. Otherwise large tool results that are more than STALE_AFTER_STEPS
+       model steps old are replaced by a short stub, oldest first.
+    3. If that is not enough, whole turns (a user prompt plus its tool
+       round trips) are folded, oldest first, into a rolling summary sent as
+       the first message. Folding is sticky, so the summary only grows at
+       its end and the request prefix stays stable from step to step.
+
+    The current turn is never folded. Token estimates are cached per
+    message object.
+    """
+
+    def __init__(self, max_tokens: int, fixed_tokens: int = 0) -> None:
+        self.max_tokens = max_tokens
+        # system prompt + tool declarations, sent with every request
+        self.fixed_tokens = fixed_tokens
+        self._estimates: dict[int, tuple[types.Content, int]] = {}
+        self._elided: dict[int, tuple[types.Content, types.Content]] = {}
+        self._summary_lines: list[str] = []
+        self._summary: types.Content | None = None
+        self._folded = 0  # messages[:_folded] live in the summary
+
+    def tokens(self, content: types.Content) -> int:
+        cached = self._estimates.get(id(content))
+        # keep a reference to the object so its id cannot be reused
+        if cached is None or cached[0] is not content:
+            cached = (content, estimate_tokens(content))
+            self._estimates[id(content)] = cached
+        return cached[1]
+
+    def _elide(self, content: types.Content) -> types.Content:
+        cached = self._elided.get(id(content))
+        if cached is not None and cached[0] is content:
+            return cached[1]
+        parts: list[types.Part] = []
+        for p in content.parts or []:
+            if p.function_response and part_chars(p) >= MIN_ELIDE_CHARS:
+                name = p.function_response.name
+                stub = (
+                    f"[elided: {part_chars(p)} chars of earlier {name} output; "
+                    "call the tool again if you still need it]"
+                )
+                parts.append(types.Part.from_function_response(name=name, response={"result": stub}))
+            else:
+                parts.append(p)
+        elided = types.Content(role=content.role, parts=parts)
+        self._elided[id(content)] = (content, elided)
+        return elided
+
+    def _with_summary(self, live: List[types.Content]) -> List[types.Content]:
+        return ([self._summary] if self._summary else []) + live
+
+    def _fold(self, folded: List[types.Content], budget: int) -> None:
+        for m in folded:
+            line = _summary_line(m)
+            if line:
+                self._summary_lines.append(line)
+        # Rolling: the summary may use at most a quarter of the budget
+        limit = budget // 4 * CHARS_PER_TOKEN
+        while len(self._summary_lines) > 1 and sum(len(l) + 1 for l in self._summary_lines) > limit:
+            self._summary_lines.pop(0)
+        if self._summary_lines:
+            text = SUMMARY_HEADER + "\n" + "\n".join(self._summary_lines)
+            self._summary = types.Content(role="user", parts=[types.Part(text=text)])
+
+    def _total(self, msgs: List[types.Content]) -> int:
+        return sum(self.tokens(m) for m in msgs)
+
+    def prepare(self, messages: List[types.Content]) -> List[types.Content]:
+        """Return the messages to send for the next step."""
+        budget = self.max_tokens - self.fixed_tokens
+
+        # ── 1. everything fits ────────────────────────────────────────────────
+        live = list(messages[self._folded:])
+        out = self._with_summary(live)
+        current = self._total(out)
+        if current <= budget:
+            return out
+
+        # ── 2. elide stale tool results, oldest first ─────────────────────────
+        stale = [False] * len(messages)
+        steps_after = 0
+        for i in range(len(messages) - 1, -1, -1):
+            stale[i] = _is_tool_reply(messages[i]) and steps_after > STALE_AFTER_STEPS
+            if messages[i].role == "model":
+                steps_after += 1
+
+        for i in range(self._folded, len(messages)):
+            if not stale[i]:
+                continue
+            j = i - self._folded
+            elided = self._elide(live[j])
+            current += self.tokens(elided) - self.tokens(live[j])
+            live[j] = elided
+            if current <= budget:
+                return self._with_summary(live)
+
+        # ── 3. fold whole turns into the rolling summary ──────────────────────
+        turn_starts = [i for i in range(self._folded, len(messages)) if _is_turn_start(messages[i])]
+        for nxt in turn_starts[1:]:  # never fold the last (current) turn
+            self._fold(messages[self._folded:nxt], budget)
+            self._folded = nxt
+            live = [
+                self._elide(m) if stale[i] else m
+                for i, m in enumerate(messages[nxt:], start=nxt)
+            ]
+            out = self._with_summary(live)
+            if self._total(out) <= budget:
+                return out
+
+        # Only the current turn is left; send what we have
+        return self._with_summary(live)
@@ -0,0 +1,213 @@
+# claii/daemon.py
+"""
+`claii serve`: a long-lived agent process behind a Unix domain socket.
+
+A one-shot `claii "<prompt>"` pays for everything from scratch: the SDK
+import, a new provider client, parsing the memory log, rebuilding the
+file caches and re-walking the workspace. The daemon keeps all of that
+warm in one process: the provider, load_memory's parsed windows, the
+read cache, mmaps, workspace/code indexes and the warm Python zygote.
+Each connection runs one `run_session` on the shared event loop, so
+sessions from different terminals (and projects) run concurrently.
+
+Output: everything a session prints (streamed text, tool call notices,
+the final answer) is routed back to its own client. sys.stdout is
+replaced by a proxy that looks up the current session's sink in a
+ContextVar; asyncio tasks and asyncio.to_thread workers inherit it.
+
+See claii/client.py for the wire format.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import io
+import json
+import os
+import signal
+import socket
+import stat
+import sys
+import traceback
+from typing import Callable, TextIO
+
+from . import agent
+from .config import DAEMON_SOCKET, DAEMON_SOCKET_DIR
+from .providers import get_provider
+
+# Where the current session's output goes (None = the daemon's own stdout).
+_SINK: contextvars.ContextVar[Callable[[str], None] | None] = contextvars.ContextVar(
+    "claii_output_sink", default=None
+)
+
+
+class _RoutedStdout(io.TextIOBase):
+    """sys.stdout stand-in that sends each session's writes to its client."""
+
+    def __init__(self, fallback: TextIO) -> None:
+        self._fallback = fallback
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        sink = _SINK.get()
+        if sink is None:
+            return self._fallback.write(text)
+        sink(text)
+        return len(text)
+
+    def flush(self) -> None:
+        if _SINK.get() is None:
+            self._fallback.flush()
+
+
+class Daemon:
+    def __init__(self, socket_path: str = DAEMON_SOCKET, provider=None) -> None:
+        self.socket_path = socket_path
+        self.provider = provider
+        self.sessions: set[asyncio.Task] = set()
+
+    # ── socket file ───────────────────────────────────────────────────────────
+
+    def _private_dir(self) -> None:
+        """
+        Create the socket's directory as 0700 and make sure it is ours.
+        The default per-user directory is tightened if its mode drifted; a
+        directory chosen through CLAII_SOCKET is only checked for its owner.
+        """
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise RuntimeError(f"{directory} is not a directory owned by this user; refusing to listen there")
+        if directory == os.path.abspath(DAEMON_SOCKET_DIR) and stat.S_IMODE(st.st_mode) != 0o700:
+            os.chmod(directory, 0o700)
+
+    def _claim_socket(self) -> None:
+        """Remove a stale socket file; refuse to start next to a live daemon."""
+        self._private_dir()
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"a claii daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+
+    # ── one connection = one session ──────────────────────────────────────────
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+
+        def sink(text: str) -> None:
+            # called from the loop and from tool worker threads alike
+            loop.call_soon_threadsafe(queue.put_nowait, text)
+
+        async def send(msg: dict) -> None:
+            writer.write((json.dumps(msg) + "\n").encode("utf-8"))
+            await writer.drain()
+
+        async def pump() -> None:
+            while (text := await queue.get()) is not None:
+                await send({"out": text})
+
+        try:
+            try:
+                request = json.loads(await reader.readline())
+                argv = [str(a) for a in request["argv"]]
+                cwd = os.path.abspath(str(request["cwd"]))
+                if not argv:
+                    raise ValueError("empty argv")
+            except (ValueError, KeyError, TypeError) as e:
+                await send({"out": f"Error: bad request ({e})\n"})
+                await send({"exit": 2})
+                return
+
+            async def session() -> int:
+                _SINK.set(sink)  # only this task's context (and its children)
+                try:
+                    await agent.run_session(
+                        agent._parse_args(argv),
+                        provider=self.provider,
+                        project_root=cwd,
+                        working_directory=cwd,
+                    )
+                    return 0
+                except SystemExit as e:  # bad flags: _parse_args printed the usage
+                    return e.code if isinstance(e.code, int) else 1
+                except Exception:  # noqa: BLE001
+                    print(traceback.format_exc(), end="")
+                    return 1
+
+            task = asyncio.create_task(session())
+            self.sessions.add(task)
+            task.add_done_callback(self.sessions.discard)
+            pumping = asyncio.create_task(pump())
+            # The client sends nothing after the request; EOF means it went away
+            hangup = asyncio.create_task(reader.read())
+
+            await asyncio.wait({task, hangup}, return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                task.cancel()  # also kills a running script (see run_python)
+                await asyncio.gather(task, return_exceptions=True)
+                pumping.cancel()
+                return
+            hangup.cancel()
+            status = task.result() if not task.cancelled() else 1
+            loop.call_soon_threadsafe(queue.put_nowait, None)  # after any queued output
+            await pumping
+            await send({"exit": status})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    # ── lifecycle ─────────────────────────────────────────────────────────────
+
+    async def serve(self) -> None:
+        if self.provider is None:
+            self.provider = get_provider()  # one client for every session
+        agent._build_tools()
+        self._claim_socket()
+
+        # the socket runs code as this user: nobody else may connect
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        finally:
+            os.umask(umask)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        print(f"claii daemon listening on {self.socket_path} (pid {os.getpid()})", file=sys.stderr)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            for task in list(self.sessions):
+                task.cancel()
+            await asyncio.gather(*self.sessions, return_exceptions=True)
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+            print("claii daemon stopped", file=sys.stderr)
+
+
+def serve(socket_path: str = DAEMON_SOCKET) -> None:
+    """Entry point for `claii serve`: run the daemon until SIGINT/SIGTERM."""
+    sys.stdout = _RoutedStdout(sys.stdout)
+    try:
+        asyncio.run(Daemon(socket_path).serve())
+    except RuntimeError as e:
+        print(f"claii: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -1,48 +1,420 @@
 # claii/memory.py
 from __future__ import annotations
+import hashlib
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Any, List
-from google.genai import types
+from typing import TYPE_CHECKING, Any, Iterator, List
 
-MEMORY_FILE = ".claii_memory.json"
+if TYPE_CHECKING:  # google.genai is slow to import; only loading needs it
+    from google.genai import types
 
-def _memory_path(project_root: Path) -> Path:
-    return project_root / MEMORY_FILE
+# Append-only log of JSONL segments, one record per message:
+#   .claii/memory/segment-000001.jsonl, segment-000002.jsonl, ...
+# The highest-numbered segment is the active one; new messages are only
+# ever appended to it. Once it grows past SEGMENT_MAX_BYTES a new segment is
+# started, and once there are more than MAX_SEGMENTS the log is compacted.
+MEMORY_DIR = Path(".claii") / "memory"
+SEGMENT_MAX_BYTES = 256 * 1024
+MAX_SEGMENTS = 8
+RETAIN_RECORDS = 2000  # records kept by compaction (None = keep everything)
 
-def load_memory(project_root: str | Path) -> List[types.Content]:
-    path = _memory_path(Path(project_root))
-    if not path.exists():
-        return []
+# Pre-segment format, imported once on first use.
+LEGACY_MEMORY_FILE = ".claii_memory.json"
+
+_READ_BLOCK = 64 * 1024
+
+# Parsed windows from load_memory, reused while the log is unchanged. Only
+# a long-lived process (claii serve) ever hits this; keyed by
+# (memory dir, limit) and checked against the segments' sizes and mtimes.
+_MAX_CACHED_WINDOWS = 16
+_WINDOWS: dict[tuple[str, int | None], tuple[tuple, list]] = {}
+_WINDOWS_LOCK = threading.Lock()
+
+
+def _memory_dir(project_root: Path) -> Path:
+    return project_root / MEMORY_DIR
+
+def _segment_name(n: int) -> str:
+    return f"segment-{n:06d}.jsonl"
+
+def _segments(mem_dir: Path) -> list[Path]:
+    """All segments, oldest first."""
+    return sorted(mem_dir.glob("segment-*.jsonl"))
+
+def _segment_number(path: Path) -> int:
+    return int(path.stem.split("-", 1)[1])
+
+
+# ─── Records ───────────────────────────────────────────────────────────────────
+#
+# {"role": "model", "parts": [{"text": "..."},
+#                             {"call": {"name": "get_file_content", "args": {...}}}]}
+# {"role": "user",  "parts": [{"response": {"name": "get_file_content",
+#                                            "result": "<first MAX_RESULT_CHARS>",
+#                                            "chars": 12345, "sha256": "..."}}]}
+#
+# Tool results and long string arguments are truncated, with their full
+# length and a digest recorded, so the next session knows what it already
+# looked at without carrying whole file dumps around. Records from before
+# tool calls were kept ({"role", "text"}) are still understood.
+
+MAX_RESULT_CHARS = 2000  # kept from each tool result
+MAX_ARG_CHARS = 500      # kept from each string argument (e.g. write_file content)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:16]
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return (
+        text[:limit]
+        + f"\n[... truncated from {len(text)} chars in memory; sha256:{_digest(text)}]"
+    )
+
+def _compact_args(value: Any) -> Any:
+    # nested too, e.g. apply_edit's list of search/replace blocks
+    if isinstance(value, str):
+        return _truncate(value, MAX_ARG_CHARS)
+    if isinstance(value, dict):
+        return {k: _compact_args(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact_args(v) for v in value]
+    return value
+
+def _to_record(m: types.Content) -> dict[str, Any]:
+    parts: list[dict[str, Any]] = []
+    for p in m.parts or []:
+        if p.function_call:
+            parts.append({"call": {
+                "name": p.function_call.name,
+                "args": _compact_args(dict(p.function_call.args or {})),
+            }})
+        elif p.function_response:
+            response = p.function_response.response or {}
+            payload = response.get("result", response.get("error", response))
+            text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+            parts.append({"response": {
+                "name": p.function_response.name,
+                "result": text[:MAX_RESULT_CHARS],
+                "chars": len(text),
+                "sha256": _digest(text),
+            }})
+        elif p.text:
+            parts.append({"text": p.text})
+    return {"role": m.role, "parts": parts}
+
+def _part_from_record(item: dict[str, Any]) -> types.Part | None:
+    from google.genai import types
+
+    if "text" in item:
+        return types.Part(text=item["text"])
+    if "call" in item:
+        call = item["call"]
+        return types.Part.from_function_call(name=call["name"], args=call.get("args") or {})
+    if "response" in item:
+        resp = item["response"]
+        result = resp.get("result", "")
+        if resp.get("chars", len(result)) > len(result):
+            result += (
+                f"\n[... truncated from {resp['chars']} chars in memory; "
+                f"sha256:{resp.get('sha256', '?')}; call the tool again for the rest]"
+            )
+        return types.Part.from_function_response(name=resp["name"], response={"result": result})
+    return None
+
+def _from_record(item: dict[str, Any]) -> types.Content | None:
+    from google.genai import types
+
+    role = item.get("role", "user")
+
+    if "parts" in item:
+        parts = [p for p in map(_part_from_record, item["parts"]) if p is not None]
+    else:
+        text = item.get("text", "")
+        parts = [types.Part(text=text)] if text else []
+    if not parts:
+        return None
+
+    # 🔧 Normalize roles for Gemini: only "user" or "model" allowed
+    if role not in ("user", "model"):
+        role = "user"
+
+    return types.Content(role=role, parts=parts)
+
+def _is_empty(item: dict[str, Any]) -> bool:
+    return not (item.get("parts") or item.get("text"))
+
+def _is_tool_record(item: dict[str, Any]) -> bool:
+    """A record holding function calls or function responses."""
+    return any("call" in p or "response" in p for p in item.get("parts", []))
+
+def _is_prompt(item: dict[str, Any]) -> bool:
+    """A user record that is a prompt rather than a tool reply."""
+    if item.get("role", "user") != "user":
+        return False
+    return not any("response" in p for p in item.get("parts", []))
+
+
+# ─── Reading ───────────────────────────────────────────────────────────────────
+
+def _lines_reversed(path: Path) -> Iterator[bytes]:
+    """Yield the non-blank lines of `path`, last line first, reading from the end."""
+    with path.open("rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        rest = b""
+        while pos > 0:
+            step = min(_READ_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + rest).split(b"\n")
+            rest = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if rest.strip():
+            yield rest
+
+def _records_reversed(mem_dir: Path) -> Iterator[dict[str, Any]]:
+    """
+    Every record in the log, newest first. Torn lines left by a crash are
+    skipped. A compacted segment starts with a {"compacted": ...} header
+    and supersedes all older segments, even if they were not yet deleted.
+    """
+    for seg in reversed(_segments(mem_dir)):
+        compacted = False
+        for line in _lines_reversed(seg):
+            try:
+                item = json.loads(line)
+            except ValueError:
+                continue
+            if "compacted" in item:
+                compacted = True
+                continue
+            yield item
+        if compacted:
+            return
+
+def _import_legacy(project_root: Path, mem_dir: Path) -> None:
+    legacy = project_root / LEGACY_MEMORY_FILE
+    if mem_dir.exists() or not legacy.exists():
+        return
     try:
-        data = json.loads(path.read_text(encoding="utf-8"))
+        data = json.loads(legacy.read_text(encoding="utf-8"))
     except Exception:
-        return []
+        return
+    _append(mem_dir, [item for item in data if not _is_empty(item)])
 
-    messages: List[types.Content] = []
-    for item in data:
-        role = item.get("role", "user")
-        text = item.get("text", "")
 
-        # 🔧 Normalize roles for Gemini: only "user" or "model" allowed
-        if role not in ("user", "model"):
-            role = "user"
+def load_memory(project_root: str | Path, limit: int | None = None) -> List[types.Content]:
+    """
+    Return the last `limit` remembered messages (all of them if None).
 
-        messages.append(
-            types.Content(
-                role=role,
-                parts=[types.Part(text=text)],
-            )
+    Only as much of the log as the window needs is read, starting from the
+    end of the newest segment. The window is trimmed to start at a user
+    prompt, so it never opens with a tool reply whose call was cut off.
+    """
+    project_root = Path(project_root)
+    mem_dir = _memory_dir(project_root)
+    _import_legacy(project_root, mem_dir)
+    if not mem_dir.exists():
+        return []
+
+    key = (str(mem_dir.resolve()), limit)
+    try:
+        signature = tuple(
+            (seg.name, st.st_size, st.st_mtime_ns)
+            for seg in _segments(mem_dir)
+            for st in (seg.stat(),)
         )
-    return messages
+    except OSError:
+        signature = None
+    with _WINDOWS_LOCK:
+        cached = _WINDOWS.get(key)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return list(cached[1])  # callers append to the list they get
 
+    window: list[dict[str, Any]] = []
+    try:
+        for item in _records_reversed(mem_dir):
+            if limit is not None and len(window) >= limit:
+                break
+            if not _is_empty(item):
+                window.append(item)
+    except OSError:
+        return []
 
-def save_memory(project_root: str | Path, messages: List[types.Content]) -> None:
-    path = _memory_path(Path(project_root))
-    serializable: list[dict[str, Any]] = []
-    for m in messages:
-        text_parts = [p.text for p in m.parts if hasattr(p, "text") and p.text]
-        serializable.append(
-            {"role": m.role, "text": "\n".join(text_parts)}
-        )
-    path.write_text(json.dumps(serializable, indent=2), encoding="utf-8")
+    window.reverse()
+    while window and not _is_prompt(window[0]):
+        window.pop(0)
+
+    messages = [c for c in map(_from_record, window) if c is not None]
+    if signature is not None:
+        with _WINDOWS_LOCK:
+            _WINDOWS.pop(key, None)
+            _WINDOWS[key] = (signature, messages)
+            while len(_WINDOWS) > _MAX_CACHED_WINDOWS:
+                del _WINDOWS[next(iter(_WINDOWS))]
+    return list(messages)
+
+
+def describe_memory(project_root: str | Path, limit: int = 10) -> str:
+    """
+    Human-readable overview of the log for `claii --memory`: its size and
+    the last `limit` prompts with the tools each one led to. Works on the
+    raw records, so it never needs the model SDK.
+    """
+    project_root = Path(project_root)
+    mem_dir = _memory_dir(project_root)
+    _import_legacy(project_root, mem_dir)
+    segments = _segments(mem_dir) if mem_dir.exists() else []
+    if not segments:
+        return f"No memory stored under {mem_dir}"
+
+    total_bytes = sum(seg.stat().st_size for seg in segments)
+    n_records = 0
+    prompts: list[tuple[str, list[str]]] = []  # newest first
+    calls: list[str] = []
+    for item in _records_reversed(mem_dir):
+        if _is_empty(item):
+            continue
+        n_records += 1
+        if _is_prompt(item):
+            if len(prompts) < limit:
+                text = item.get("text") or " ".join(
+                    p["text"] for p in item.get("parts", []) if "text" in p
+                )
+                prompts.append((text, calls))
+            calls = []
+        elif item.get("role") == "model":
+            # collected newest first; reversed again when printed
+            calls += reversed([p["call"]["name"] for p in item.get("parts", []) if "call" in p])
+
+    lines = [
+        f"Memory: {n_records} records in {len(segments)} segment(s), "
+        f"{total_bytes} bytes under {mem_dir}"
+    ]
+    if prompts:
+        lines.append(f"Last {len(prompts)} prompt(s), newest first:")
+    for text, tools in prompts:
+        first = " ".join(text.split())
+        if len(first) > 100:
+            first = first[:99] + "…"
+        used = f"  [{', '.join(reversed(tools))}]" if tools else ""
+        lines.append(f"- {first}{used}")
+    return "\n".join(lines)
+
+
+# ─── Writing ───────────────────────────────────────────────────────────────────
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # e.g. Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _append(mem_dir: Path, records: list[dict[str, Any]]) -> None:
+    """
+    Append records to the active segment in a single write, then fsync.
+    A crash mid-write can at worst leave one torn line at the end, which
+    readers skip and the next append starts a fresh line after.
+    """
+    if not records:
+        return
+    mem_dir.mkdir(parents=True, exist_ok=True)
+
+    segments = _segments(mem_dir)
+    active = segments[-1] if segments else mem_dir / _segment_name(1)
+    if active.exists() and active.stat().st_size >= SEGMENT_MAX_BYTES:
+        active = mem_dir / _segment_name(_segment_number(active) + 1)
+
+    payload = "".join(
+        json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records
+    ).encode("utf-8")
+
+    with active.open("ab+") as f:
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                payload = b"\n" + payload
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+def compact_memory(project_root: str | Path, retain: int | None = RETAIN_RECORDS) -> None:
+    """
+    Rewrite the whole log as one segment, dropping empty records, plain
+    text records identical to the one before them, and everything older
+    than the last `retain` records. Tool calls and tool replies are never
+    deduplicated: identical replies to separate calls are separate records,
+    and Gemini rejects a history whose calls and replies don't pair up.
+    The kept records start at a user prompt, for the same reason.
+
+    The compacted segment is written to a temp file and swapped in over the
+    newest segment with os.replace; its header marks every older segment as
+    superseded, so a crash before they are unlinked loses nothing and
+    duplicates nothing.
+    """
+    mem_dir = _memory_dir(Path(project_root))
+    segments = _segments(mem_dir)
+    if not segments:
+        return
+
+    kept: list[dict[str, Any]] = []
+    for item in _records_reversed(mem_dir):
+        if retain is not None and len(kept) >= retain:
+            break
+        if _is_empty(item):
+            continue
+        if kept and kept[-1] == item and not _is_tool_record(item):
+            continue
+        kept.append(item)
+    kept.reverse()
+    while kept and not _is_prompt(kept[0]):
+        kept.pop(0)
+
+    newest = segments[-1]
+    tmp = mem_dir / "compact.tmp"
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write(json.dumps({"compacted": len(kept)}) + "\n")
+        for item in kept:
+            f.write(json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, newest)
+    _fsync_dir(mem_dir)
+
+    for seg in segments[:-1]:
+        seg.unlink(missing_ok=True)
+
+
+def save_memory(
+    project_root: str | Path,
+    messages: List[types.Content],
+    start: int = 0,
+    retain: int | None = RETAIN_RECORDS,
+) -> None:
+    """
+    Append `messages[start:]` to the log. Pass `start=len(loaded)` so
+    only this session's new messages are written.
+
+    Compaction (see `compact_memory`) runs once the log spans more than
+    MAX_SEGMENTS segments.
+    """
+    project_root = Path(project_root)
+    mem_dir = _memory_dir(project_root)
+    _import_legacy(project_root, mem_dir)
+
+    records = [_to_record(m) for m in messages[start:]]
+    _append(mem_dir, [r for r in records if not _is_empty(r)])
+
+    if len(_segments(mem_dir)) > MAX_SEGMENTS:
+        compact_memory(project_root, retain=retain)
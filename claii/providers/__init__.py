@@ -0,0 +1,291 @@
+# claii/providers/__init__.py
+
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Iterator
+
+from google.genai import types
+
+from ..config import get_provider_config
+from ..usage import record_usage
+from .base import LLMProvider
+from .cache import CachingProvider
+from .context_cache import ContextCachingProvider
+from .replay import RecordingProvider, ReplayProvider
+from .resilience import ResilientProvider
+from .router import Backend, RouterProvider
+
+# One genai.Client per (API key, keep-alive) per process: the client owns
+# the pooled httpx connections, so sharing it lets every provider and
+# every session (e.g. under `claii serve`) reuse warm TLS connections.
+_CLIENTS: dict[tuple[str, float], Any] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def shared_client(api_key: str, keepalive_s: float = 120.0):
+    """The process-wide genai.Client for `api_key`, created on first use."""
+    key = (api_key, keepalive_s)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            import httpx
+            from google import genai
+
+            # httpx drops idle connections after 5 s by default, shorter
+            # than a typical tool step; keep them for the next model call
+            limits = httpx.Limits(max_connections=32, max_keepalive_connections=8, keepalive_expiry=keepalive_s)
+            client = _CLIENTS[key] = genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(
+                    client_args={"limits": limits},
+                    async_client_args={"limits": limits},
+                ),
+            )
+        return client
+
+
+class GeminiProvider(LLMProvider):
+    """
+    Thin wrapper around Google Gemini so the agent code doesn't depend
+    directly on the SDK. Later I'll add OpenAIProvider, AnthropicProvider, etc.
+
+    Supports server-side context caches (see claii/providers/context_cache.py):
+    with `cached_content`, the request carries only the messages after the
+    cached prefix, and the system prompt and tools come from the cache.
+    """
+
+    supports_context_cache = True
+
+    def __init__(
+        self,
+        model_name: str = "gemini-2.0-flash-001",
+        timeout_s: float | None = None,
+        keepalive_s: float = 120.0,
+    ) -> None:
+        # only a live provider needs .env and the client (replay does not)
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY is not set in the environment")
+        self.client = shared_client(api_key, keepalive_s)
+        self.model_name = model_name
+        # per-request deadline, enforced by the HTTP client itself
+        self._http_options = types.HttpOptions(timeout=int(timeout_s * 1000)) if timeout_s else None
+
+    def _config(
+        self,
+        tools: list[types.Tool],
+        system_prompt: str,
+        cached_content: str | None = None,
+    ) -> types.GenerateContentConfig:
+        if cached_content:
+            # the cache already holds the system instruction and tools
+            return types.GenerateContentConfig(cached_content=cached_content, http_options=self._http_options)
+        return types.GenerateContentConfig(
+            tools=tools,
+            system_instruction=system_prompt,
+            http_options=self._http_options,
+        )
+
+    @staticmethod
+    def _chunk_parts(chunk: types.GenerateContentResponse) -> list[types.Part]:
+        if not chunk.candidates:
+            return []
+        content = chunk.candidates[0].content
+        return list(content.parts or []) if content else []
+
+    def generate(
+        self,
+        *,
+        messages: list[types.Content],
+        tools: list[types.Tool],
+        system_prompt: str,
+        cached_content: str | None = None,
+    ):
+        """
+        Normalised interface the agent can call.
+        """
+        response = self.client.models.generate_content(
+            model=self.model_name,
+            contents=messages,
+            config=self._config(tools, system_prompt, cached_content),
+        )
+        record_usage(response.usage_metadata)
+        return response
+
+    def generate_stream(
+        self,
+        *,
+        messages: list[types.Content],
+        tools: list[types.Tool],
+        system_prompt: str,
+        cached_content: str | None = None,
+    ) -> Iterator[types.Part]:
+        """
+        Streaming counterpart of `generate`: yields the reply's parts as the
+        SDK delivers them. Text arrives in fragments; function calls arrive
+        as complete parts.
+        """
+        stream = self.client.models.generate_content_stream(
+            model=self.model_name,
+            contents=messages,
+            config=self._config(tools, system_prompt, cached_content),
+        )
+        usage = None
+        for chunk in stream:
+            usage = chunk.usage_metadata or usage  # the last chunk has the totals
+            yield from self._chunk_parts(chunk)
+        record_usage(usage)
+
+    async def agenerate(
+        self,
+        *,
+        messages: list[types.Content],
+        tools: list[types.Tool],
+        system_prompt: str,
+        cached_content: str | None = None,
+    ):
+        """Async `generate`, on the SDK's aio client."""
+        response = await self.client.aio.models.generate_content(
+            model=self.model_name,
+            contents=messages,
+            config=self._config(tools, system_prompt, cached_content),
+        )
+        record_usage(response.usage_metadata)
+        return response
+
+    async def agenerate_stream(
+        self,
+        *,
+        messages: list[types.Content],
+        tools: list[types.Tool],
+        system_prompt: str,
+        cached_content: str | None = None,
+    ) -> AsyncIterator[types.Part]:
+        """Async `generate_stream`, on the SDK's aio client."""
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model_name,
+            contents=messages,
+            config=self._config(tools, system_prompt, cached_content),
+        )
+        usage = None
+        async for chunk in stream:
+            usage = chunk.usage_metadata or usage
+            for part in self._chunk_parts(chunk):
+                yield part
+        record_usage(usage)
+
+    def create_context_cache(
+        self,
+        *,
+        system_prompt: str,
+        tools: list[types.Tool],
+        messages: list[types.Content],
+        ttl_s: float,
+    ) -> tuple[str, float]:
+        """Cache a request prefix server-side: (cache name, expiry as time.time())."""
+        cache = self.client.caches.create(
+            model=self.model_name,
+            config=types.CreateCachedContentConfig(
+                contents=messages or None,
+                system_instruction=system_prompt,
+                tools=tools,
+                ttl=f"{int(ttl_s)}s",
+                display_name="claii",
+                http_options=self._http_options,
+            ),
+        )
+        return cache.name, _expiry(cache, ttl_s)
+
+    def refresh_context_cache(self, name: str, ttl_s: float) -> float:
+        """Give a cache a fresh TTL; returns its new expiry."""
+        cache = self.client.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{int(ttl_s)}s", http_options=self._http_options),
+        )
+        return _expiry(cache, ttl_s)
+
+
+def _expiry(cache: types.CachedContent, ttl_s: float) -> float:
+    return cache.expire_time.timestamp() if cache.expire_time else time.time() + ttl_s
+
+
+def _build_backend(spec: str, config, max_retries: int) -> LLMProvider:
+    """
+    One provider from a "provider:model" spec; a bare "model" uses
+    CLAII_PROVIDER, and "replay:path" plays back a transcript.
+    """
+    kind, sep, model = spec.strip().partition(":")
+    if not sep:
+        kind, model = config.provider, kind
+    if kind == "replay":
+        path = model or config.replay_file
+        if not path:
+            raise RuntimeError("CLAII_PROVIDER=replay needs CLAII_REPLAY_FILE")
+        return ReplayProvider.from_file(path)
+    if kind in ("google-genai", "gemini"):
+        provider: LLMProvider = GeminiProvider(
+            model or config.model, timeout_s=config.request_timeout_s, keepalive_s=config.keepalive_s
+        )
+        if config.context_cache:
+            provider = ContextCachingProvider(
+                provider, ttl_s=config.context_cache_ttl_s, min_tokens=config.context_cache_min_tokens
+            )
+        return ResilientProvider(
+            provider,
+            timeout_s=config.request_timeout_s,
+            max_retries=max_retries,
+            hedge=config.hedge,
+        )
+    raise RuntimeError(f"unsupported provider {kind!r} in {spec!r} (use google-genai or replay)")
+
+
+def _build_pool(specs: str, config) -> list[Backend]:
+    names = [s.strip() for s in specs.split(",") if s.strip()]
+    # with somewhere to fail over to, failing over beats retrying in place
+    retries = config.max_retries if len(names) == 1 else 0
+    return [Backend(name, _build_backend(name, config, retries)) for name in names]
+
+
+def get_provider() -> LLMProvider:
+    """
+    Build the provider described by ProviderConfig (env vars).
+
+    By default that is CLAII_MODEL on CLAII_PROVIDER. CLAII_PROVIDER=replay
+    plays back CLAII_REPLAY_FILE offline, and CLAII_RECORD_FILE records a
+    transcript for it (see claii/providers/replay.py).
+    A live provider is wrapped in a ResilientProvider (deadlines, retries
+    and optional hedging; see claii/providers/resilience.py). Inside that,
+    with CLAII_CONTEXT_CACHE=1, a ContextCachingProvider serves the
+    stable request prefix from a server-side cache (see
+    claii/providers/context_cache.py). Off by default: the provider bills
+    those caches by storage time.
+    CLAII_BACKENDS (and optionally CLAII_SMALL_BACKENDS) list several
+    "provider:model" backends for a latency-aware RouterProvider instead
+    (see claii/providers/router.py).
+    With CLAII_RESPONSE_CACHE=rw|ro the provider is wrapped in a disk-backed
+    CachingProvider (see claii/providers/cache.py).
+    """
+    config = get_provider_config()
+    provider: LLMProvider
+    if config.backends or config.small_backends:
+        provider = RouterProvider(
+            _build_pool(config.backends or f"{config.provider}:{config.model}", config),
+            small=_build_pool(config.small_backends, config),
+        )
+    elif config.provider == "replay":
+        provider = _build_backend("replay:", config, config.max_retries)
+    else:
+        provider = _build_backend(f"{config.provider}:{config.model}", config, config.max_retries)
+    if config.record_file:
+        provider = RecordingProvider(provider, config.record_file)
+    if config.response_cache != "off":
+        provider = CachingProvider(
+            provider,
+            mode=config.response_cache,
+            max_bytes=config.response_cache_max_bytes,
+        )
+    return provider
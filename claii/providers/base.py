@@ -1,10 +1,38 @@
 # claii/providers/base.py
 from __future__ import annotations
+import contextlib
+import contextvars
 from abc import ABC, abstractmethod
-from typing import Any, List
+from pathlib import Path
+from typing import Any, Iterator, List
 
 from google.genai import types  # we can generalize later
 
+# The project the current session works on. Under `claii serve` one
+# provider serves sessions from many projects, so on-disk provider state
+# (response cache, context-cache registry) is looked up per session.
+_PROJECT_ROOT: contextvars.ContextVar[Path | None] = contextvars.ContextVar("claii_project_root", default=None)
+
+
+@contextlib.contextmanager
+def rooted_at(root: str | Path) -> Iterator[Path]:
+    """Resolve relative provider state paths against `root` in this context (and its children)."""
+    path = Path(root).resolve()
+    token = _PROJECT_ROOT.set(path)
+    try:
+        yield path
+    finally:
+        _PROJECT_ROOT.reset(token)
+
+
+def project_path(path: str | Path) -> Path:
+    """`path` as an absolute path; relative ones are taken from the current project root (or the cwd)."""
+    path = Path(path)
+    if path.is_absolute():
+        return path
+    return (_PROJECT_ROOT.get() or Path.cwd()) / path
+
+
 class LLMProvider(ABC):
     """Abstract interface all providers must implement."""
 
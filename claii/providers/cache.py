@@ -0,0 +1,233 @@
+# claii/providers/cache.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List
+
+from google.genai import types
+
+from .base import LLMProvider, project_path
+
+CACHE_MODES = ("off", "rw", "ro")
+DEFAULT_CACHE_DIR = Path(".claii") / "response_cache"
+DEFAULT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+
+def _dump(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json", exclude_none=True)
+    return obj
+
+
+def request_key(
+    model: str,
+    system_prompt: str,
+    tools: list[Any] | None,
+    messages: List[types.Content],
+) -> str:
+    """Stable hash of everything that determines a model response."""
+    payload = {
+        "model": model,
+        "system_prompt": system_prompt,
+        "tools": [_dump(t) for t in tools or []],
+        "messages": [_dump(m) for m in messages],
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _response_from_parts(parts: list[types.Part]) -> types.GenerateContentResponse:
+    """Reassemble a streamed reply into a single response object."""
+    merged: list[types.Part] = []
+    for part in parts:
+        if part.text and merged and merged[-1].text is not None and not merged[-1].function_call:
+            merged[-1] = types.Part(text=merged[-1].text + part.text)
+        else:
+            merged.append(part)
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=merged))]
+    )
+
+
+def _response_parts(response: types.GenerateContentResponse) -> list[types.Part]:
+    if not response.candidates or not response.candidates[0].content:
+        return []
+    return list(response.candidates[0].content.parts or [])
+
+
+class CachingProvider(LLMProvider):
+    """
+    Disk-backed response cache in front of another provider.
+
+    Responses are stored as JSON files named by `request_key` (model,
+    system prompt, tool declarations and messages), so only byte-identical
+    requests hit. Modes:
+
+    - "rw": serve hits, record misses
+    - "ro": serve hits, never write (e.g. CI against a checked-in cache)
+    - "off": pass everything straight through
+
+    When the cache grows past `max_bytes`, least recently used entries
+    (by file mtime, refreshed on every hit) are deleted.
+
+    A relative `cache_dir` is taken from the current session's project
+    root (see base.rooted_at), so a daemon serving several projects keeps
+    a separate cache in each.
+    """
+
+    def __init__(
+        self,
+        inner,
+        mode: str = "rw",
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    ) -> None:
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown response cache mode {mode!r}; expected one of {CACHE_MODES}")
+        self.inner = inner
+        self.mode = mode
+        self._cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.model_name = getattr(inner, "model_name", None) or getattr(inner, "model", type(inner).__name__)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes: dict[Path, int] = {}  # per cache directory
+
+    # ── storage ───────────────────────────────────────────────────────────────
+
+    @property
+    def cache_dir(self) -> Path:
+        return project_path(self._cache_dir)
+
+    def _key(self, messages, tools, system_prompt) -> str:
+        return request_key(self.model_name, system_prompt, tools, messages)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _lookup(self, key: str) -> types.GenerateContentResponse | None:
+        if self.mode == "off":
+            return None
+        path = self._path(key)
+        try:
+            response = types.GenerateContentResponse.model_validate_json(path.read_bytes())
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # LRU bookkeeping
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def _store(self, key: str, response: types.GenerateContentResponse) -> None:
+        if self.mode != "rw" or not _response_parts(response):
+            return
+        cache_dir = self.cache_dir
+        path = cache_dir / key[:2] / f"{key}.json"
+        data = response.model_dump_json(exclude_none=True).encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            if cache_dir not in self._total_bytes:
+                self._total_bytes[cache_dir] = sum(p.stat().st_size for p in cache_dir.glob("*/*.json"))
+            else:
+                self._total_bytes[cache_dir] += len(data)
+            if self._total_bytes[cache_dir] > self.max_bytes:
+                self._evict(cache_dir)
+
+    def _evict(self, cache_dir: Path) -> None:
+        entries = []
+        for p in cache_dir.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # evict down to 90% so we do not rescan on every store
+        target = self.max_bytes * 9 // 10
+        for _, size, p in entries:
+            if total <= target:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._total_bytes[cache_dir] = total
+
+    # ── provider interface ────────────────────────────────────────────────────
+
+    def generate(self, *, messages, tools, system_prompt):
+        key = self._key(messages, tools, system_prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        response = self.inner.generate(messages=messages, tools=tools, system_prompt=system_prompt)
+        self._store(key, response)
+        return response
+
+    async def _agenerate_inner(self, key, messages, tools, system_prompt):
+        if hasattr(self.inner, "agenerate"):
+            response = await self.inner.agenerate(messages=messages, tools=tools, system_prompt=system_prompt)
+        else:
+            response = await asyncio.to_thread(
+                self.inner.generate, messages=messages, tools=tools, system_prompt=system_prompt
+            )
+        await asyncio.to_thread(self._store, key, response)
+        return response
+
+    async def agenerate(self, *, messages, tools, system_prompt):
+        key = self._key(messages, tools, system_prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            return cached
+        return await self._agenerate_inner(key, messages, tools, system_prompt)
+
+    def generate_stream(self, *, messages, tools, system_prompt) -> Iterator[types.Part]:
+        key = self._key(messages, tools, system_prompt)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield from _response_parts(cached)
+            return
+        if not hasattr(self.inner, "generate_stream"):
+            response = self.inner.generate(messages=messages, tools=tools, system_prompt=system_prompt)
+            self._store(key, response)
+            yield from _response_parts(response)
+            return
+        parts: list[types.Part] = []
+        for part in self.inner.generate_stream(messages=messages, tools=tools, system_prompt=system_prompt):
+            parts.append(part)
+            yield part
+        self._store(key, _response_from_parts(parts))
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt) -> AsyncIterator[types.Part]:
+        key = self._key(messages, tools, system_prompt)
+        cached = await asyncio.to_thread(self._lookup, key)
+        if cached is not None:
+            for part in _response_parts(cached):
+                yield part
+            return
+        if not hasattr(self.inner, "agenerate_stream"):
+            response = await self._agenerate_inner(key, messages, tools, system_prompt)
+            for part in _response_parts(response):
+                yield part
+            return
+        parts: list[types.Part] = []
+        async for part in self.inner.agenerate_stream(messages=messages, tools=tools, system_prompt=system_prompt):
+            parts.append(part)
+            yield part
+        await asyncio.to_thread(self._store, key, _response_from_parts(parts))
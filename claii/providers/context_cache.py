@@ -0,0 +1,389 @@
+# claii/providers/context_cache.py
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List
+
+from google.genai import types
+
+from ..context import CHARS_PER_TOKEN, message_chars
+from ..tracing import span
+from .base import LLMProvider, project_path
+from .cache import _dump
+from .resilience import _aclose, is_transient
+
+DEFAULT_REGISTRY_PATH = Path(".claii") / "context_caches.json"
+DEFAULT_TTL_S = 600.0
+# Prefixes shorter than this are not cached; Gemini rejects small caches
+# (the minimum depends on the model).
+DEFAULT_MIN_TOKENS = 4096
+# A cache is given a fresh TTL when it is used with less than this
+# fraction of its TTL left.
+REFRESH_WHEN_LEFT = 0.25
+
+
+def _blob(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def prefix_keys(
+    model: str,
+    system_prompt: str,
+    tools: list[Any] | None,
+    messages: List[types.Content],
+) -> tuple[list[str], list[int]]:
+    """
+    (keys, tokens): keys[i] identifies the request prefix made of the model,
+    system prompt, tool declarations and messages[:i]; tokens[i] estimates
+    its size.
+    """
+    head = {"model": model, "system_prompt": system_prompt, "tools": [_dump(t) for t in tools or []]}
+    blob = _blob(head)
+    h = hashlib.sha256(blob)
+    keys = [h.hexdigest()]
+    chars = len(blob)
+    tokens = [chars // CHARS_PER_TOKEN]
+    for m in messages:
+        h.update(_blob(_dump(m)))
+        keys.append(h.hexdigest())
+        chars += message_chars(m)
+        tokens.append(chars // CHARS_PER_TOKEN)
+    return keys, tokens
+
+
+@dataclass
+class CachedContext:
+    name: str  # server-side handle, e.g. "cachedContents/abc123"
+    tokens: int  # estimated size of the cached prefix
+    expires_at: float  # time.time()
+
+
+class ContextCacheRegistry:
+    """
+    Which request prefixes have a live server-side cache, by prefix key.
+
+    Kept in memory and mirrored to `path` (JSON) so later sessions and
+    processes reuse caches until they expire. Pass path=None for a
+    registry that lives only in memory.
+    """
+
+    def __init__(self, path: str | Path | None = DEFAULT_REGISTRY_PATH) -> None:
+        self.path = Path(path) if path is not None else None
+        self._entries: dict[str, CachedContext] | None = None
+        self._lock = threading.Lock()
+
+    def _loaded(self) -> dict[str, CachedContext]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path is not None:
+                try:
+                    data = json.loads(self.path.read_text(encoding="utf-8"))
+                    now = time.time()
+                    self._entries = {
+                        key: entry
+                        for key, raw in data.items()
+                        if (entry := CachedContext(**raw)).expires_at > now
+                    }
+                except (OSError, ValueError, TypeError):
+                    pass
+        return self._entries
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        data = {key: asdict(entry) for key, entry in self._entries.items()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> CachedContext | None:
+        """The live cache for `key`, if any."""
+        with self._lock:
+            entry = self._loaded().get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                del self._entries[key]
+                self._save()
+                return None
+            return entry
+
+    def put(self, key: str, entry: CachedContext) -> None:
+        with self._lock:
+            now = time.time()
+            entries = self._loaded()
+            for stale in [k for k, e in entries.items() if e.expires_at <= now]:
+                del entries[stale]
+            entries[key] = entry
+            self._save()
+
+    def drop(self, key: str) -> None:
+        with self._lock:
+            if self._loaded().pop(key, None) is not None:
+                self._save()
+
+
+_DEFAULT_REGISTRIES: dict[Path, ContextCacheRegistry] = {}
+_DEFAULT_REGISTRY_LOCK = threading.Lock()
+
+
+def default_registry() -> ContextCacheRegistry:
+    """
+    The registry at DEFAULT_REGISTRY_PATH under the current session's
+    project root (see base.rooted_at), shared by every provider.
+    """
+    path = project_path(DEFAULT_REGISTRY_PATH)
+    with _DEFAULT_REGISTRY_LOCK:
+        registry = _DEFAULT_REGISTRIES.get(path)
+        if registry is None:
+            registry = _DEFAULT_REGISTRIES[path] = ContextCacheRegistry(path)
+        return registry
+
+
+# Prefix keys of each provider's last request (by id), for the session
+# running in this context: whether a prefix is stable depends on that
+# session's own previous request, never on another session's.
+_SESSION_PREFIXES: contextvars.ContextVar[dict[int, list[str]] | None] = contextvars.ContextVar(
+    "claii_context_cache_prefixes", default=None
+)
+
+
+@contextlib.contextmanager
+def prefix_session() -> Iterator[None]:
+    """Judge prefix stability by the requests made in this context (and its children) alone."""
+    token = _SESSION_PREFIXES.set({})
+    try:
+        yield
+    finally:
+        _SESSION_PREFIXES.reset(token)
+
+
+@dataclass
+class _Plan:
+    key: str
+    name: str
+    covered: int  # leading messages served from the cache
+
+
+class ContextCachingProvider(LLMProvider):
+    """
+    Serves the stable prefix of each request from a server-side context
+    cache, so the model does not re-process it on every step.
+
+    The prefix is the system prompt and tool declarations plus leading
+    messages: remembered history and the user prompt with its inlined KB
+    content. A prefix counts as stable once two consecutive requests
+    share it; the system prompt and tools alone always do. "Consecutive"
+    is per session: the agent runs each session in a `prefix_session`,
+    so sessions served side by side by `claii serve` do not interleave. If a stable
+    prefix is at least `min_tokens` long and no cache covers it, one is
+    created for `ttl_s` seconds. If a shorter cache exists, a new one is
+    made only when it would cover `min_tokens` more. Requests then send
+    the uncached tail with a reference to the longest live cache that
+    leaves at least one message out. A cache used close to its expiry
+    gets a fresh TTL. Caches are recorded in a ContextCacheRegistry, so
+    later sessions reuse them too.
+
+    Server-side caches are paid resources: besides the (discounted)
+    cached input tokens, the provider bills storage per token for as long
+    as a cache lives, used or not. get_provider only installs this
+    wrapper with CLAII_CONTEXT_CACHE=1.
+
+    The inner provider opts in with `supports_context_cache = True`. It
+    implements `create_context_cache(*, system_prompt, tools, messages,
+    ttl_s) -> (name, expires_at)` and `refresh_context_cache(name, ttl_s)
+    -> expires_at`, and accepts `cached_content=name` on all four
+    generate methods. Without that this wrapper passes every call
+    straight through. If creating a cache fails (model unsupported,
+    prefix too small, ...), that prefix is sent in full from then on. If
+    a request that uses a cache fails with a non-transient error (the
+    cache expired or was deleted), the cache is forgotten and the request
+    is resent in full. Transient errors propagate, for ResilientProvider
+    to retry.
+
+    `stats` counts cache hits, creations, TTL refreshes and fallbacks.
+    """
+
+    def __init__(
+        self,
+        inner,
+        ttl_s: float = DEFAULT_TTL_S,
+        min_tokens: int = DEFAULT_MIN_TOKENS,
+        registry: ContextCacheRegistry | None = None,
+    ) -> None:
+        self.inner = inner
+        self.ttl_s = ttl_s
+        self.min_tokens = min_tokens
+        self._registry = registry
+        self.enabled = bool(getattr(inner, "supports_context_cache", False))
+        self.model_name = getattr(inner, "model_name", None) or getattr(inner, "model", type(inner).__name__)
+        self.stats = {"hits": 0, "created": 0, "refreshed": 0, "fallbacks": 0}
+        self._previous: list[str] = []  # prefix keys of the last request outside any prefix_session
+        self._failed: set[str] = set()  # prefixes the server would not cache
+        self._lock = threading.Lock()
+
+    @property
+    def registry(self) -> ContextCacheRegistry:
+        """The registry given at construction, else the current project's default one."""
+        return self._registry if self._registry is not None else default_registry()
+
+    # ── choosing a cache ──────────────────────────────────────────────────────
+
+    def _plan(self, messages, tools, system_prompt) -> _Plan | None:
+        """
+        The cache to send this request against, creating or refreshing one
+        as needed (blocking), or None to send it whole.
+        """
+        if not self.enabled or not messages:
+            return None
+        keys, tokens = prefix_keys(self.model_name, system_prompt, tools, messages)
+        last = len(messages) - 1  # the newest message is always sent
+        session = _SESSION_PREFIXES.get()
+        with self._lock:
+            if session is not None:
+                previous, session[id(self)] = session.get(id(self), []), keys
+            else:
+                previous, self._previous = self._previous, keys
+        stable = 0
+        for i in range(min(last, len(previous) - 1), 0, -1):
+            if keys[i] == previous[i]:
+                stable = i
+                break
+        hit = next(
+            ((i, entry) for i in range(last, -1, -1) if (entry := self.registry.get(keys[i])) is not None),
+            None,
+        )
+        worth_creating = tokens[stable] >= self.min_tokens and keys[stable] not in self._failed
+        if worth_creating and (hit is None or (stable > hit[0] and tokens[stable] - tokens[hit[0]] >= self.min_tokens)):
+            entry = self._create(keys[stable], tokens[stable], system_prompt, tools, messages[:stable])
+            if entry is not None:
+                return _Plan(keys[stable], entry.name, stable)
+        if hit is None:
+            return None
+        covered, entry = hit
+        if entry.expires_at - time.time() < self.ttl_s * REFRESH_WHEN_LEFT and not self._refresh(keys[covered], entry):
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+        return _Plan(keys[covered], entry.name, covered)
+
+    def _create(self, key, tokens, system_prompt, tools, messages) -> CachedContext | None:
+        with span("context_cache.create", "provider", messages=len(messages), prefix_tokens=tokens) as s:
+            try:
+                name, expires_at = self.inner.create_context_cache(
+                    system_prompt=system_prompt, tools=tools, messages=messages, ttl_s=self.ttl_s
+                )
+            except Exception as e:  # noqa: BLE001
+                if s:
+                    s.set(error=type(e).__name__)
+                if not is_transient(e):
+                    with self._lock:
+                        self._failed.add(key)
+                return None
+        entry = CachedContext(name, tokens, expires_at)
+        self.registry.put(key, entry)
+        with self._lock:
+            self.stats["created"] += 1
+        return entry
+
+    def _refresh(self, key: str, entry: CachedContext) -> bool:
+        try:
+            expires_at = self.inner.refresh_context_cache(entry.name, self.ttl_s)
+        except Exception:  # noqa: BLE001
+            self.registry.drop(key)  # most likely gone already
+            return False
+        self.registry.put(key, CachedContext(entry.name, entry.tokens, expires_at))
+        with self._lock:
+            self.stats["refreshed"] += 1
+        return True
+
+    def _fall_back(self, plan: _Plan, error: Exception) -> None:
+        if is_transient(error):
+            raise error
+        self.registry.drop(plan.key)
+        with self._lock:
+            self.stats["fallbacks"] += 1
+
+    # ── provider interface ────────────────────────────────────────────────────
+
+    def generate(self, *, messages, tools, system_prompt):
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        plan = self._plan(messages, tools, system_prompt)
+        if plan is not None:
+            try:
+                return self.inner.generate(
+                    messages=messages[plan.covered:], tools=tools, system_prompt=system_prompt,
+                    cached_content=plan.name,
+                )
+            except Exception as e:  # noqa: BLE001
+                self._fall_back(plan, e)
+        return self.inner.generate(**kwargs)
+
+    async def agenerate(self, *, messages, tools, system_prompt):
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        plan = await asyncio.to_thread(self._plan, messages, tools, system_prompt)
+        if plan is not None:
+            try:
+                return await self.inner.agenerate(
+                    messages=messages[plan.covered:], tools=tools, system_prompt=system_prompt,
+                    cached_content=plan.name,
+                )
+            except Exception as e:  # noqa: BLE001
+                await asyncio.to_thread(self._fall_back, plan, e)
+        return await self.inner.agenerate(**kwargs)
+
+    def generate_stream(self, *, messages, tools, system_prompt) -> Iterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        plan = self._plan(messages, tools, system_prompt)
+        if plan is not None:
+            # a failure surfaces by the first part; after that we are committed
+            stream = iter(self.inner.generate_stream(
+                messages=messages[plan.covered:], tools=tools, system_prompt=system_prompt,
+                cached_content=plan.name,
+            ))
+            try:
+                first = next(stream, None)
+            except Exception as e:  # noqa: BLE001
+                self._fall_back(plan, e)
+            else:
+                if first is not None:
+                    yield first
+                    yield from stream
+                return
+        yield from self.inner.generate_stream(**kwargs)
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt) -> AsyncIterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        plan = await asyncio.to_thread(self._plan, messages, tools, system_prompt)
+        if plan is not None:
+            stream = aiter(self.inner.agenerate_stream(
+                messages=messages[plan.covered:], tools=tools, system_prompt=system_prompt,
+                cached_content=plan.name,
+            ))
+            try:
+                try:
+                    first = await anext(stream)
+                except StopAsyncIteration:
+                    return
+                except Exception as e:  # noqa: BLE001
+                    await asyncio.to_thread(self._fall_back, plan, e)
+                else:
+                    yield first
+                    async for part in stream:
+                        yield part
+                    return
+            finally:
+                await _aclose(stream)
+        async for part in self.inner.agenerate_stream(**kwargs):
+            yield part
@@ -0,0 +1,224 @@
+# claii/providers/replay.py
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List
+
+from google.genai import types
+
+from ..usage import record_usage
+from .base import LLMProvider
+from .cache import _response_from_parts, _response_parts
+
+# Transcript format (JSON), one entry per model call, played back in order:
+#
+# {
+#   "model": "gemini-2.0-flash-001",
+#   "steps": [
+#     {"parts": [{"function_call": {"name": "get_files_info", "args": {"directory": "."}}}]},
+#     {"parts": [{"text": "All done."}],
+#      "usage_metadata": {"prompt_token_count": 812, "candidates_token_count": 9}}
+#   ]
+# }
+#
+# Parts use the SDK's own JSON shape, so anything types.Part accepts works.
+
+
+def _response_from_step(step: dict[str, Any]) -> types.GenerateContentResponse:
+    parts = [types.Part.model_validate(p) for p in step.get("parts", [])]
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=step.get("usage_metadata"),
+    )
+
+
+def _step_from_response(response: types.GenerateContentResponse) -> dict[str, Any]:
+    content = response.candidates[0].content if response.candidates else None
+    step: dict[str, Any] = {
+        "parts": [p.model_dump(mode="json", exclude_none=True) for p in (content.parts or [])] if content else [],
+    }
+    if response.usage_metadata:
+        step["usage_metadata"] = response.usage_metadata.model_dump(mode="json", exclude_none=True)
+    return step
+
+
+def _stream_chunks(parts: list[types.Part]) -> Iterator[types.Part]:
+    """Split text parts into word-sized fragments, like a live stream."""
+    for part in parts:
+        if part.text:
+            words = part.text.split(" ")
+            for i, word in enumerate(words):
+                yield types.Part(text=word if i == len(words) - 1 else word + " ")
+        else:
+            yield part
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Offline provider that plays back a recorded or hand-written transcript.
+
+    Each model call returns the next step, whatever the request was, so a
+    scripted tool-call sequence drives the real agent loop, tools, memory
+    and all, without network access. `latency_s` is slept before every
+    reply and `chunk_latency_s` between streamed fragments, to model a live
+    backend. The (start, end) perf_counter interval of every call is kept
+    in `call_intervals`.
+
+    With `context_cache=True` it also fakes server-side context caches for
+    ContextCachingProvider: caches live in `context_caches` (name -> expiry),
+    a request naming an unknown or expired cache fails like the server's
+    404, and `cached_calls` counts the requests that used one.
+    """
+
+    def __init__(
+        self,
+        steps: List[dict[str, Any]],
+        model_name: str = "replay",
+        latency_s: float = 0.0,
+        chunk_latency_s: float = 0.0,
+        context_cache: bool = False,
+    ) -> None:
+        self.steps = steps
+        self.model_name = model_name
+        self.latency_s = latency_s
+        self.chunk_latency_s = chunk_latency_s
+        self.call_intervals: list[tuple[float, float]] = []
+        self.supports_context_cache = context_cache
+        self.context_caches: dict[str, float] = {}
+        self.cached_calls = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str | Path, **kwargs) -> "ReplayProvider":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        kwargs.setdefault("model_name", data.get("model", "replay"))
+        return cls(data["steps"], **kwargs)
+
+    def create_context_cache(self, *, system_prompt, tools, messages, ttl_s) -> tuple[str, float]:
+        with self._lock:
+            name = f"cachedContents/replay-{len(self.context_caches) + 1}"
+            self.context_caches[name] = time.time() + ttl_s
+        return name, self.context_caches[name]
+
+    def refresh_context_cache(self, name: str, ttl_s: float) -> float:
+        with self._lock:
+            self._check_cache(name)
+            self.context_caches[name] = time.time() + ttl_s
+            return self.context_caches[name]
+
+    def _check_cache(self, name: str) -> None:
+        if self.context_caches.get(name, 0.0) <= time.time():
+            raise LookupError(f"cached content {name} not found")
+
+    def _take(self, cached_content: str | None = None) -> types.GenerateContentResponse:
+        with self._lock:
+            if cached_content is not None:
+                self._check_cache(cached_content)
+                self.cached_calls += 1
+            if self._next >= len(self.steps):
+                raise RuntimeError(
+                    f"Replay transcript exhausted after {len(self.steps)} model calls"
+                )
+            step = self.steps[self._next]
+            self._next += 1
+        response = _response_from_step(step)
+        record_usage(response.usage_metadata)  # as a live provider would
+        return response
+
+    def generate(self, *, messages, tools, system_prompt, cached_content=None):
+        start = time.perf_counter()
+        response = self._take(cached_content)
+        time.sleep(self.latency_s)
+        self.call_intervals.append((start, time.perf_counter()))
+        return response
+
+    async def agenerate(self, *, messages, tools, system_prompt, cached_content=None):
+        start = time.perf_counter()
+        response = self._take(cached_content)
+        await asyncio.sleep(self.latency_s)
+        self.call_intervals.append((start, time.perf_counter()))
+        return response
+
+    def generate_stream(self, *, messages, tools, system_prompt, cached_content=None) -> Iterator[types.Part]:
+        start = time.perf_counter()
+        response = self._take(cached_content)
+        time.sleep(self.latency_s)
+        for part in _stream_chunks(response.candidates[0].content.parts or []):
+            yield part
+            time.sleep(self.chunk_latency_s)
+        self.call_intervals.append((start, time.perf_counter()))
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt, cached_content=None) -> AsyncIterator[types.Part]:
+        start = time.perf_counter()
+        response = self._take(cached_content)
+        await asyncio.sleep(self.latency_s)
+        for part in _stream_chunks(response.candidates[0].content.parts or []):
+            yield part
+            await asyncio.sleep(self.chunk_latency_s)
+        self.call_intervals.append((start, time.perf_counter()))
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Pass-through provider that records every response into a transcript
+    ReplayProvider can play back. The file is rewritten after each call,
+    so even an interrupted session leaves a usable transcript. Streamed
+    replies are passed on part by part and recorded once complete, as
+    one response; the async methods write the file on a worker thread.
+    """
+
+    def __init__(self, inner, path: str | Path) -> None:
+        self.inner = inner
+        self.path = Path(path)
+        self.model_name = getattr(inner, "model_name", "replay")
+        self.steps: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _record(self, response: types.GenerateContentResponse) -> None:
+        with self._lock:
+            self.steps.append(_step_from_response(response))
+            data = {"model": self.model_name, "steps": self.steps}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+    def generate(self, *, messages, tools, system_prompt):
+        response = self.inner.generate(messages=messages, tools=tools, system_prompt=system_prompt)
+        self._record(response)
+        return response
+
+    async def agenerate(self, *, messages, tools, system_prompt):
+        if hasattr(self.inner, "agenerate"):
+            response = await self.inner.agenerate(messages=messages, tools=tools, system_prompt=system_prompt)
+        else:
+            response = await asyncio.to_thread(
+                self.inner.generate, messages=messages, tools=tools, system_prompt=system_prompt
+            )
+        await asyncio.to_thread(self._record, response)
+        return response
+
+    def generate_stream(self, *, messages, tools, system_prompt) -> Iterator[types.Part]:
+        if not hasattr(self.inner, "generate_stream"):
+            yield from _response_parts(self.generate(messages=messages, tools=tools, system_prompt=system_prompt))
+            return
+        parts: list[types.Part] = []
+        for part in self.inner.generate_stream(messages=messages, tools=tools, system_prompt=system_prompt):
+            parts.append(part)
+            yield part
+        self._record(_response_from_parts(parts))
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt) -> AsyncIterator[types.Part]:
+        if not hasattr(self.inner, "agenerate_stream"):
+            response = await self.agenerate(messages=messages, tools=tools, system_prompt=system_prompt)
+            for part in _response_parts(response):
+                yield part
+            return
+        parts: list[types.Part] = []
+        async for part in self.inner.agenerate_stream(messages=messages, tools=tools, system_prompt=system_prompt):
+            parts.append(part)
+            yield part
+        await asyncio.to_thread(self._record, _response_from_parts(parts))
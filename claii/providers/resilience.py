@@ -0,0 +1,253 @@
+# claii/providers/resilience.py
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+from .base import LLMProvider
+from .cache import _response_parts
+
+# Transient failures are retried after a full-jitter exponential backoff:
+# attempt n sleeps uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2**n)).
+BACKOFF_BASE_S = 0.5
+BACKOFF_CAP_S = 20.0
+_TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+# Hedging waits for the HEDGE_QUANTILE of recent latencies before sending a
+# duplicate, and only once MIN_LATENCY_SAMPLES calls have been seen.
+HEDGE_QUANTILE = 0.95
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Worth retrying: timeouts, dropped connections, 408/429 and 5xx replies."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None)  # google.genai.errors.APIError
+    if isinstance(code, int):
+        return code in _TRANSIENT_STATUS
+    try:
+        import httpx
+    except ImportError:  # pragma: no cover - the SDK depends on it
+        return False
+    return isinstance(exc, httpx.TransportError)
+
+
+def backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2**attempt))
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies, in seconds."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """The q-quantile of the window, or None until there are enough samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def _aclose(stream: Any) -> None:
+    aclose = getattr(stream, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:  # noqa: BLE001
+            pass
+
+
+class ResilientProvider(LLMProvider):
+    """
+    Deadlines, retries and (optionally) hedged requests around a live
+    provider.
+
+    - Every call is bounded by `timeout_s`; for streams, each wait for the
+      next part is.
+    - Transient errors (see `is_transient`) are retried up to
+      `max_retries` times with jittered exponential backoff. A stream is
+      only retried until its first part has been handed on; after that
+      an error propagates, since the caller has already seen output.
+    - With `hedge=True` the async calls send a duplicate request once the
+      first one has been outstanding longer than the p95 of recent
+      latencies (whole replies for agenerate, time to first part for
+      agenerate_stream). Whichever answers first is used and the other
+      is cancelled, which cuts the tail at the cost of a few percent
+      extra requests.
+
+    `stats` counts calls, retries, hedges sent and hedges that won.
+    """
+
+    def __init__(
+        self,
+        inner,
+        timeout_s: float = 120.0,
+        max_retries: int = 3,
+        hedge: bool = False,
+    ) -> None:
+        self.inner = inner
+        self.timeout_s = timeout_s
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.model_name = getattr(inner, "model_name", None) or getattr(inner, "model", type(inner).__name__)
+        self.reply_latency = LatencyTracker()
+        self.first_part_latency = LatencyTracker()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+    # ── building blocks ───────────────────────────────────────────────────────
+
+    async def _retrying(self, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        for n in itertools.count():
+            try:
+                return await attempt()
+            except Exception as e:  # noqa: BLE001
+                if n >= self.max_retries or not is_transient(e):
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(backoff_delay(n))
+
+    async def _hedged(
+        self,
+        attempt: Callable[[], Awaitable[Any]],
+        tracker: LatencyTracker,
+        discard: Callable[[Any], Awaitable[None]] | None = None,
+    ) -> Any:
+        """
+        Run `attempt`; if hedging is on and it is slower than the tracked
+        p95, race a second copy against it. `discard` disposes of a result
+        that finished but lost the race.
+        """
+        threshold = tracker.quantile(HEDGE_QUANTILE) if self.hedge else None
+        tasks = [asyncio.create_task(attempt())]
+        try:
+            if threshold is None:
+                return await tasks[0]
+            done, _ = await asyncio.wait(tasks, timeout=threshold)
+            if not done:
+                self.stats["hedges"] += 1
+                tasks.append(asyncio.create_task(attempt()))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [t for t in tasks if t in done and not t.cancelled() and t.exception() is None]
+                if winners:
+                    if winners[0] is not tasks[0]:
+                        self.stats["hedge_wins"] += 1
+                    for extra in winners[1:]:
+                        if discard is not None:
+                            await discard(extra.result())
+                    return winners[0].result()
+                error = next(t.exception() for t in done if not t.cancelled())
+            raise error  # both copies failed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    # ── provider interface ────────────────────────────────────────────────────
+
+    def generate(self, *, messages, tools, system_prompt):
+        """Blocking call with retries; the deadline is the inner client's timeout."""
+        self.stats["calls"] += 1
+        for n in itertools.count():
+            try:
+                return self.inner.generate(messages=messages, tools=tools, system_prompt=system_prompt)
+            except Exception as e:  # noqa: BLE001
+                if n >= self.max_retries or not is_transient(e):
+                    raise
+                self.stats["retries"] += 1
+                time.sleep(backoff_delay(n))
+
+    async def agenerate(self, *, messages, tools, system_prompt):
+        self.stats["calls"] += 1
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+
+        async def once():
+            start = time.monotonic()
+            if hasattr(self.inner, "agenerate"):
+                call = self.inner.agenerate(**kwargs)
+            else:
+                call = asyncio.to_thread(self.inner.generate, **kwargs)
+            response = await asyncio.wait_for(call, self.timeout_s)
+            self.reply_latency.add(time.monotonic() - start)
+            return response
+
+        return await self._retrying(lambda: self._hedged(once, self.reply_latency))
+
+    def generate_stream(self, *, messages, tools, system_prompt) -> Iterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if not hasattr(self.inner, "generate_stream"):
+            yield from _response_parts(self.generate(**kwargs))  # counts the call
+            return
+        self.stats["calls"] += 1
+        for n in itertools.count():
+            stream = iter(self.inner.generate_stream(**kwargs))
+            try:
+                first = next(stream)
+            except StopIteration:
+                return
+            except Exception as e:  # noqa: BLE001
+                if n >= self.max_retries or not is_transient(e):
+                    raise
+                self.stats["retries"] += 1
+                time.sleep(backoff_delay(n))
+                continue
+            break
+        yield first
+        yield from stream
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt) -> AsyncIterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if not hasattr(self.inner, "agenerate_stream"):
+            for part in _response_parts(await self.agenerate(**kwargs)):
+                yield part
+            return
+        self.stats["calls"] += 1
+
+        async def open_stream():
+            """Start a stream and wait for its first part: (first, stream)."""
+            start = time.monotonic()
+            stream = aiter(self.inner.agenerate_stream(**kwargs))
+            try:
+                first = await asyncio.wait_for(anext(stream), self.timeout_s)
+            except StopAsyncIteration:
+                first = None
+            except BaseException:
+                await _aclose(stream)
+                raise
+            self.first_part_latency.add(time.monotonic() - start)
+            return first, stream
+
+        async def discard(opened):
+            await _aclose(opened[1])
+
+        first, stream = await self._retrying(
+            lambda: self._hedged(open_stream, self.first_part_latency, discard)
+        )
+        try:
+            if first is None:
+                return
+            yield first
+            while True:
+                try:
+                    part = await asyncio.wait_for(anext(stream), self.timeout_s)
+                except StopAsyncIteration:
+                    return
+                yield part
+        finally:
+            await _aclose(stream)
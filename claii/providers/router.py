@@ -0,0 +1,328 @@
+# claii/providers/router.py
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator
+
+from .base import LLMProvider
+from .cache import _response_parts
+from .resilience import _aclose
+
+# Latency is an exponentially weighted moving average of whole replies
+# (agenerate) or time to first part (streams); new samples weigh EWMA_ALPHA.
+EWMA_ALPHA = 0.3
+# Health is judged on the last ERROR_WINDOW outcomes: above MAX_ERROR_RATE
+# the backend is only used once nothing healthy is left. After
+# EJECT_AFTER consecutive failures it is skipped outright for a cooldown
+# that doubles with every further failure, from COOLDOWN_BASE_S up to
+# COOLDOWN_CAP_S.
+ERROR_WINDOW = 20
+MAX_ERROR_RATE = 0.5
+EJECT_AFTER = 2
+COOLDOWN_BASE_S = 5.0
+COOLDOWN_CAP_S = 300.0
+# A backend that has not been measured for PROBE_AFTER_S is tried once
+# more (ranked first), so one that was slow or down gets a chance to show
+# it has recovered. EXPLORE is the chance of routing to a random healthy
+# backend instead of the fastest.
+PROBE_AFTER_S = 60.0
+EXPLORE = 0.05
+
+
+@dataclass
+class Backend:
+    """One routable provider and its rolling health record."""
+
+    name: str
+    provider: Any
+    latency_s: float | None = None  # EWMA; None until the first success
+    last_sample: float = 0.0  # time.monotonic() of the latest outcome
+    consecutive_failures: int = 0
+    down_until: float = 0.0
+    outcomes: deque[bool] = field(default_factory=lambda: deque(maxlen=ERROR_WINDOW))
+    calls: int = 0
+    errors: int = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until and self.error_rate <= MAX_ERROR_RATE
+
+    def record(self, ok: bool, seconds: float | None = None) -> None:
+        now = time.monotonic()
+        self.calls += 1
+        self.outcomes.append(ok)
+        self.last_sample = now
+        if ok:
+            self.consecutive_failures = 0
+            self.down_until = 0.0
+            if seconds is not None:
+                self.latency_s = seconds if self.latency_s is None else (
+                    EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.latency_s
+                )
+            return
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= EJECT_AFTER:
+            extra = self.consecutive_failures - EJECT_AFTER
+            self.down_until = now + min(COOLDOWN_CAP_S, COOLDOWN_BASE_S * 2**extra)
+
+    def describe(self) -> str:
+        latency = f"{self.latency_s * 1000:.0f} ms" if self.latency_s is not None else "unmeasured"
+        state = "up" if self.healthy(time.monotonic()) else "down"
+        return f"{self.name}: {state}, {latency}, {self.errors}/{self.calls} errors"
+
+
+def _has_function_call(parts: list[Any]) -> bool:
+    return any(getattr(p, "function_call", None) for p in parts)
+
+
+class RouterProvider(LLMProvider):
+    """
+    Routes each model call to the fastest healthy backend of a pool.
+
+    Backends are ranked by their latency EWMA; unmeasured and stale ones
+    are tried first so every backend keeps being measured. A failing call
+    counts against its backend and fails over to the next one in the
+    ranking (streams only until their first part has been handed on).
+    Backends whose recent error rate is too high, or that failed
+    EJECT_AFTER times in a row, drop to the back of the ranking or are
+    skipped for a cooldown. Only once every backend has failed is the
+    last error raised.
+
+    With a `small` pool the router cascades: each step goes to the small
+    pool first, and if the reply is a tool call (the cheap, frequent case)
+    it is used as is. If the small model wants to answer in text instead,
+    its reply is dropped and the step is re-asked of the `large` pool, so
+    final answers come from the large model. A step on which every small
+    backend fails escalates to the large pool the same way.
+    """
+
+    def __init__(self, large: list[Backend], small: list[Backend] | None = None) -> None:
+        if not large:
+            raise ValueError("RouterProvider needs at least one backend")
+        self.large = large
+        self.small = small or []
+        names = [b.name for b in self.small] + [b.name for b in self.large]
+        self.model_name = "router(" + ",".join(names) + ")"
+        self.stats = {"small_used": 0, "escalations": 0, "failovers": 0}
+        self._lock = threading.Lock()
+
+    # ── choosing a backend ────────────────────────────────────────────────────
+
+    def ranked(self, pool: list[Backend]) -> list[Backend]:
+        """The order to try `pool` in: healthy by speed, then the rest."""
+        now = time.monotonic()
+        with self._lock:
+            available = [b for b in pool if now >= b.down_until]
+            cooling = sorted((b for b in pool if now < b.down_until), key=lambda b: b.down_until)
+            healthy = [b for b in available if b.healthy(now)]
+            unhealthy = sorted((b for b in available if not b.healthy(now)), key=lambda b: b.error_rate)
+
+            def score(b: Backend) -> float:
+                if b.latency_s is None or now - b.last_sample > PROBE_AFTER_S:
+                    return -1.0  # measure it first
+                return b.latency_s
+
+            healthy.sort(key=score)
+            if len(healthy) > 1 and random.random() < EXPLORE:
+                healthy.insert(0, healthy.pop(random.randrange(1, len(healthy))))
+        # a cooling-down backend is still better than giving up
+        return healthy + unhealthy + cooling
+
+    def _record(self, backend: Backend, ok: bool, seconds: float | None = None) -> None:
+        with self._lock:
+            backend.record(ok, seconds)
+
+    def describe(self) -> str:
+        lines = [f"small  {b.describe()}" for b in self.small]
+        lines += [f"large  {b.describe()}" for b in self.large]
+        return "\n".join(lines)
+
+    # ── one pool, with failover ───────────────────────────────────────────────
+
+    def _generate_on(self, pool: list[Backend], kwargs: dict[str, Any]):
+        error: Exception | None = None
+        for n, backend in enumerate(self.ranked(pool)):
+            if n:
+                self.stats["failovers"] += 1
+            start = time.monotonic()
+            try:
+                response = backend.provider.generate(**kwargs)
+            except Exception as e:  # noqa: BLE001
+                self._record(backend, False)
+                error = e
+                continue
+            self._record(backend, True, time.monotonic() - start)
+            return response
+        raise error  # type: ignore[misc]  # every backend failed
+
+    async def _agenerate_on(self, pool: list[Backend], kwargs: dict[str, Any]):
+        error: Exception | None = None
+        for n, backend in enumerate(self.ranked(pool)):
+            if n:
+                self.stats["failovers"] += 1
+            start = time.monotonic()
+            try:
+                if hasattr(backend.provider, "agenerate"):
+                    response = await backend.provider.agenerate(**kwargs)
+                else:
+                    response = await asyncio.to_thread(backend.provider.generate, **kwargs)
+            except Exception as e:  # noqa: BLE001
+                self._record(backend, False)
+                error = e
+                continue
+            self._record(backend, True, time.monotonic() - start)
+            return response
+        raise error  # type: ignore[misc]
+
+    def _open_on(self, pool: list[Backend], kwargs: dict[str, Any]):
+        """Start a stream on the best backend that yields a first part: (backend, first, stream)."""
+        error: Exception | None = None
+        for n, backend in enumerate(self.ranked(pool)):
+            if n:
+                self.stats["failovers"] += 1
+            start = time.monotonic()
+            try:
+                if hasattr(backend.provider, "generate_stream"):
+                    stream = iter(backend.provider.generate_stream(**kwargs))
+                else:
+                    stream = iter(_response_parts(backend.provider.generate(**kwargs)))
+                first = next(stream, None)
+            except Exception as e:  # noqa: BLE001
+                self._record(backend, False)
+                error = e
+                continue
+            self._record(backend, True, time.monotonic() - start)
+            return backend, first, stream
+        raise error  # type: ignore[misc]
+
+    async def _aopen_on(self, pool: list[Backend], kwargs: dict[str, Any]):
+        """Async `_open_on`."""
+        error: Exception | None = None
+        for n, backend in enumerate(self.ranked(pool)):
+            if n:
+                self.stats["failovers"] += 1
+            start = time.monotonic()
+            stream: Any = None
+            try:
+                if hasattr(backend.provider, "agenerate_stream"):
+                    stream = aiter(backend.provider.agenerate_stream(**kwargs))
+                    try:
+                        first = await anext(stream)
+                    except StopAsyncIteration:
+                        first = None
+                else:
+                    if hasattr(backend.provider, "agenerate"):
+                        response = await backend.provider.agenerate(**kwargs)
+                    else:
+                        response = await asyncio.to_thread(backend.provider.generate, **kwargs)
+                    parts = _response_parts(response)
+                    first, stream = (parts[0] if parts else None), _aiter_list(parts[1:])
+            except Exception as e:  # noqa: BLE001
+                if stream is not None:
+                    await _aclose(stream)
+                self._record(backend, False)
+                error = e
+                continue
+            self._record(backend, True, time.monotonic() - start)
+            return backend, first, stream
+        raise error  # type: ignore[misc]
+
+    # ── provider interface ────────────────────────────────────────────────────
+
+    def generate(self, *, messages, tools, system_prompt):
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if self.small:
+            try:
+                response = self._generate_on(self.small, kwargs)
+            except Exception:  # noqa: BLE001
+                response = None  # every small backend failed
+            if response is not None and _has_function_call(_response_parts(response)):
+                self.stats["small_used"] += 1
+                return response
+            self.stats["escalations"] += 1
+        return self._generate_on(self.large, kwargs)
+
+    async def agenerate(self, *, messages, tools, system_prompt):
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if self.small:
+            try:
+                response = await self._agenerate_on(self.small, kwargs)
+            except Exception:  # noqa: BLE001
+                response = None
+            if response is not None and _has_function_call(_response_parts(response)):
+                self.stats["small_used"] += 1
+                return response
+            self.stats["escalations"] += 1
+        return await self._agenerate_on(self.large, kwargs)
+
+    def generate_stream(self, *, messages, tools, system_prompt) -> Iterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if self.small:
+            # A reply that opens with a tool call is a tool-selection step
+            try:
+                backend, first, stream = self._open_on(self.small, kwargs)
+            except Exception:  # noqa: BLE001
+                backend, first, stream = None, None, None
+            if first is not None and getattr(first, "function_call", None):
+                self.stats["small_used"] += 1
+                yield from self._relay(backend, first, stream)
+                return
+            getattr(stream, "close", lambda: None)()
+            self.stats["escalations"] += 1
+        backend, first, stream = self._open_on(self.large, kwargs)
+        yield from self._relay(backend, first, stream)
+
+    def _relay(self, backend: Backend, first: Any, stream: Iterator[Any]) -> Iterator[Any]:
+        if first is None:
+            return
+        yield first
+        try:
+            yield from stream
+        except Exception:
+            self._record(backend, False)  # died mid-reply
+            raise
+
+    async def agenerate_stream(self, *, messages, tools, system_prompt) -> AsyncIterator[Any]:
+        kwargs = dict(messages=messages, tools=tools, system_prompt=system_prompt)
+        if self.small:
+            try:
+                backend, first, stream = await self._aopen_on(self.small, kwargs)
+            except Exception:  # noqa: BLE001
+                backend, first, stream = None, None, None
+            if first is not None and getattr(first, "function_call", None):
+                self.stats["small_used"] += 1
+                async for part in self._arelay(backend, first, stream):
+                    yield part
+                return
+            await _aclose(stream)
+            self.stats["escalations"] += 1
+        backend, first, stream = await self._aopen_on(self.large, kwargs)
+        async for part in self._arelay(backend, first, stream):
+            yield part
+
+    async def _arelay(self, backend: Backend, first: Any, stream: Any) -> AsyncIterator[Any]:
+        try:
+            if first is None:
+                return
+            yield first
+            async for part in stream:
+                yield part
+        except Exception:
+            self._record(backend, False)
+            raise
+        finally:
+            await _aclose(stream)
+
+
+async def _aiter_list(items: list[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
@@ -0,0 +1,223 @@
+# claii/tracing.py
+"""
+Lightweight tracing for one agent session.
+
+Code marks its phases with `span(name, cat, **attrs)`:
+
+    with span("tool", "tool", tool=name) as s:
+        result = ...
+        if s:                           # only when a trace is being recorded
+            s.set(bytes_out=len(result))
+
+Each span records wall time, the process CPU time used while it was
+open, its parent span and any attributes (tool name, bytes in/out, ...).
+Nothing is recorded unless a Tracer has been installed with `tracing()`,
+and then only for the current context: the tracer and the current
+parent live in ContextVars, so concurrent sessions on one event loop
+(`claii serve`) each trace only themselves, and spans opened in child
+tasks and asyncio.to_thread workers nest under the span that started
+them.
+
+Categories used by the agent: "agent" (session and steps), "provider"
+(model calls), "tool", "memory" and "local" (prompt expansion, context
+trimming). `--trace FILE` writes the spans as JSON lines, or in Chrome's
+trace-event format if FILE ends in .json (load it in chrome://tracing
+or https://ui.perfetto.dev).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+
+
+@dataclass
+class Span:
+    name: str
+    cat: str
+    id: int
+    parent: int | None
+    lane: int  # asyncio task or thread the span ran on
+    start_s: float  # since the trace started
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, **counts: float) -> None:
+        """Add to numeric attributes (e.g. bytes_out per streamed part)."""
+        for key, value in counts.items():
+            self.attrs[key] = self.attrs.get(key, 0) + value
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "cat": self.cat,
+            "id": self.id,
+            "parent": self.parent,
+            "start_ms": round(self.start_s * 1000, 3),
+            "wall_ms": round(self.wall_s * 1000, 3),
+            "cpu_ms": round(self.cpu_s * 1000, 3),
+            **self.attrs,
+        }
+
+
+class _NullSpan:
+    """What `span()` yields when nothing is being traced; falsy."""
+
+    def __bool__(self) -> bool:
+        return False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def add(self, **counts: float) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects the finished spans of one session."""
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lanes: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self) -> int:
+        try:
+            key = id(asyncio.current_task())
+        except RuntimeError:  # not on an event loop: a worker thread
+            key = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def start(self, name: str, cat: str, parent: Span | None, attrs: dict[str, Any]) -> Span:
+        return Span(
+            name=name,
+            cat=cat,
+            id=next(self._ids),
+            parent=parent.id if parent else None,
+            lane=self._lane(),
+            start_s=time.perf_counter() - self._origin,
+            attrs=attrs,
+        )
+
+    def finish(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    # ── export ────────────────────────────────────────────────────────────────
+
+    def write_jsonl(self, path: str | Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for s in sorted(self.spans, key=lambda s: s.start_s):
+                f.write(json.dumps(s.to_json(), default=str) + "\n")
+
+    def write_chrome(self, path: str | Path) -> None:
+        """Chrome trace-event format: one complete ("X") event per span."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "cat": s.cat,
+                "ph": "X",
+                "ts": round(s.start_s * 1e6, 1),
+                "dur": round(s.wall_s * 1e6, 1),
+                "pid": pid,
+                "tid": s.lane,
+                "args": {"cpu_ms": round(s.cpu_s * 1000, 3), **s.attrs},
+            }
+            for s in sorted(self.spans, key=lambda s: s.start_s)
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def write(self, path: str | Path) -> None:
+        if str(path).endswith(".json"):
+            self.write_chrome(path)
+        else:
+            self.write_jsonl(path)
+
+    def summary(self) -> str:
+        """Where the session's time went, per category (wall time inside spans)."""
+        totals: dict[str, list[float]] = {}
+        tools: dict[str, float] = {}
+        for s in self.spans:
+            if s.cat == "agent":
+                continue
+            entry = totals.setdefault(s.cat, [0.0, 0])
+            entry[0] += s.wall_s
+            entry[1] += 1
+            if s.cat == "tool":
+                tools[s.attrs.get("tool", s.name)] = tools.get(s.attrs.get("tool", s.name), 0.0) + s.wall_s
+        session = max((s.wall_s for s in self.spans if s.name == "session"), default=0.0)
+        parts = [f"{cat} {wall:.2f}s ({n})" for cat, (wall, n) in sorted(totals.items(), key=lambda kv: -kv[1][0])]
+        line = f"Trace: session {session:.2f}s" + ("; " + ", ".join(parts) if parts else "")
+        if tools:
+            slowest = sorted(tools.items(), key=lambda kv: -kv[1])[:3]
+            line += "\n  slowest tools: " + ", ".join(f"{name} {wall:.2f}s" for name, wall in slowest)
+        return line
+
+
+_TRACER: contextvars.ContextVar[Tracer | None] = contextvars.ContextVar("claii_tracer", default=None)
+_CURRENT: contextvars.ContextVar[Span | None] = contextvars.ContextVar("claii_span", default=None)
+
+
+@contextlib.contextmanager
+def tracing(tracer: Tracer | None) -> Iterator[Tracer | None]:
+    """Record spans opened in this context (and its children) into `tracer`."""
+    token = _TRACER.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _TRACER.reset(token)
+
+
+def current_tracer() -> Tracer | None:
+    return _TRACER.get()
+
+
+@contextlib.contextmanager
+def span(name: str, cat: str, **attrs: Any) -> Iterator[Span | _NullSpan]:
+    """Time the enclosed block as a child of the current span."""
+    tracer = _TRACER.get()
+    if tracer is None:
+        yield _NULL_SPAN
+        return
+    s = tracer.start(name, cat, _CURRENT.get(), attrs)
+    token = _CURRENT.set(s)
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs.setdefault("error", type(e).__name__)
+        raise
+    finally:
+        s.wall_s = time.perf_counter() - wall0
+        s.cpu_s = time.process_time() - cpu0
+        _CURRENT.reset(token)
+        tracer.finish(s)
+
+
+def annotate(**counts: float) -> None:
+    """Add to numeric attributes of the current span, if one is being traced."""
+    if _TRACER.get() is None:
+        return
+    current = _CURRENT.get()
+    if current is not None:
+        current.add(**counts)
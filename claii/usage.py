@@ -0,0 +1,124 @@
+# claii/usage.py
+"""
+Token accounting for one agent session.
+
+Providers report the usage_metadata of every model call they actually
+make with `record_usage()`; streamed calls report the usage carried by
+their last chunk. Reports land in the session's UsageMeter, which the
+agent installs in a ContextVar (like the tracer in claii/tracing.py),
+so concurrent sessions under `claii serve` are metered separately and
+a retried, hedged or escalated call counts every request that was
+answered. Responses served from the response cache cost nothing and
+report nothing.
+
+Each report is also added to the current trace span, so `--trace`
+output shows the tokens of every model call.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+from dataclasses import dataclass
+from typing import Any, Iterator
+
+from .tracing import annotate
+
+
+@dataclass
+class StepUsage:
+    step: int
+    calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0  # candidates plus thinking
+    cached_tokens: int = 0  # part of prompt_tokens served from the context cache
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+
+class UsageMeter:
+    """Per-step and per-run token counts of one session."""
+
+    def __init__(self) -> None:
+        self.steps: list[StepUsage] = [StepUsage(step=0)]
+
+    def start_step(self, step: int) -> None:
+        self.steps.append(StepUsage(step=step))
+
+    def record(self, usage: Any) -> None:
+        current = self.steps[-1]
+        current.calls += 1
+        current.prompt_tokens += getattr(usage, "prompt_token_count", None) or 0
+        current.output_tokens += (getattr(usage, "candidates_token_count", None) or 0) + (
+            getattr(usage, "thoughts_token_count", None) or 0
+        )
+        current.cached_tokens += getattr(usage, "cached_content_token_count", None) or 0
+
+    @property
+    def calls(self) -> int:
+        return sum(s.calls for s in self.steps)
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(s.prompt_tokens for s in self.steps)
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(s.output_tokens for s in self.steps)
+
+    @property
+    def cached_tokens(self) -> int:
+        return sum(s.cached_tokens for s in self.steps)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+    @property
+    def last_prompt_tokens(self) -> int:
+        """Prompt size of the latest step that made a call (the next is at least this big)."""
+        for s in reversed(self.steps):
+            if s.calls:
+                return s.prompt_tokens // s.calls
+        return 0
+
+    def summary(self, per_step: bool = False) -> str:
+        line = (
+            f"Tokens: {self.prompt_tokens:,} prompt + {self.output_tokens:,} output "
+            f"= {self.total_tokens:,} over {self.calls} model call{'s' if self.calls != 1 else ''}"
+        )
+        if self.cached_tokens:
+            line += f" ({self.cached_tokens:,} prompt tokens cached)"
+        if per_step:
+            for s in self.steps:
+                if s.calls:
+                    line += f"\n  step {s.step}: {s.prompt_tokens:,} prompt, {s.output_tokens:,} output"
+        return line
+
+
+_METER: contextvars.ContextVar[UsageMeter | None] = contextvars.ContextVar("claii_usage", default=None)
+
+
+@contextlib.contextmanager
+def metering(meter: UsageMeter | None) -> Iterator[UsageMeter | None]:
+    """Send usage reported in this context (and its children) to `meter`."""
+    token = _METER.set(meter)
+    try:
+        yield meter
+    finally:
+        _METER.reset(token)
+
+
+def record_usage(usage: Any) -> None:
+    """Called by providers with a response's usage_metadata (None is ignored)."""
+    if usage is None:
+        return
+    meter = _METER.get()
+    if meter is not None:
+        meter.record(usage)
+    annotate(
+        prompt_tokens=getattr(usage, "prompt_token_count", None) or 0,
+        output_tokens=(getattr(usage, "candidates_token_count", None) or 0)
+        + (getattr(usage, "thoughts_token_count", None) or 0),
+    )
@@ -0,0 +1,186 @@
+# functions/_zygote.py
+"""
+Warm Python "zygote" used by functions/python_pool.py.
+
+Started once as `python3 _zygote.py SOCKET_PATH [module,module,...]`, it
+imports the preload modules and then serves run requests on a Unix socket.
+Stdlib only, so it starts fast and does not drag the agent's own imports
+into the scripts it runs.
+
+Per request (one connection each) the zygote forks a monitor, which forks
+the runner:
+
+    zygote ──fork──> monitor ──fork──> runner (executes the script)
+
+The monitor reports the runner's pid, waits for it and reports its exit
+code, so the zygote itself never blocks on a running script. The runner
+gets the caller's stdio (passed as file descriptors), cwd, argv and
+environment, and executes the script as __main__ via runpy.
+
+Wire format, client -> zygote: 4-byte big-endian length sent together
+with the fds (stdin, stdout, stderr) via SCM_RIGHTS, then that many bytes
+of JSON: {"script", "args", "cwd", "env"}.
+Zygote -> client: "<pid>\n" then "<exit code>\n" (negative for a signal,
+like subprocess).
+"""
+import atexit
+import json
+import os
+import runpy
+import selectors
+import signal
+import socket
+import sys
+import traceback
+
+
+def _recv_exact(conn, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = conn.recv(n - len(buf))
+        if not chunk:
+            raise EOFError("client went away")
+        buf += chunk
+    return buf
+
+
+def _drop_workspace_modules(cwd):
+    """Forget preloaded modules that live in the workspace; they may have been edited."""
+    prefix = os.path.join(os.path.realpath(cwd), "")
+    for name, mod in list(sys.modules.items()):
+        path = getattr(mod, "__file__", None)
+        if path and os.path.realpath(path).startswith(prefix):
+            del sys.modules[name]
+
+
+def _run_script(request, fds):
+    """Runner body: become `python3 script args...`, then exit."""
+    stdin_fd, stdout_fd, stderr_fd = fds
+    os.dup2(stdin_fd, 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    for fd in fds:
+        if fd > 2:
+            os.close(fd)
+
+    script = request["script"]
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = [script, *request["args"]]
+    sys.path[0] = os.path.dirname(script)
+    _drop_workspace_modules(request["cwd"])
+    if "random" in sys.modules:
+        # otherwise every run would replay the zygote's random sequence
+        sys.modules["random"].seed()
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:  # noqa: BLE001
+        # report it like the interpreter would: from the script's frame down
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != script:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        code = 1
+
+    try:
+        import threading
+        threading._shutdown()  # wait for non-daemon threads, like a normal exit
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code & 0xFF)
+
+
+def _monitor(conn, request, fds):
+    """Monitor body: fork the runner, report its pid and exit code."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        _run_script(request, fds)
+    for fd in fds:
+        os.close(fd)
+    try:
+        conn.sendall(f"{pid}\n".encode())
+        _, status = os.waitpid(pid, 0)
+        conn.sendall(f"{os.waitstatus_to_exitcode(status)}\n".encode())
+    finally:
+        os._exit(0)
+
+
+def _serve_one(listener, control):
+    conn, _ = listener.accept()
+    fds = []
+    try:
+        header, fds, _, _ = socket.recv_fds(conn, 4, 3)
+        if len(header) < 4:
+            header += _recv_exact(conn, 4 - len(header))
+        size = int.from_bytes(header, "big")
+        request = json.loads(_recv_exact(conn, size))
+        if len(fds) != 3:
+            raise ValueError("expected stdin/stdout/stderr descriptors")
+    except Exception:  # noqa: BLE001
+        for fd in fds:
+            os.close(fd)
+        conn.close()
+        return
+
+    if os.fork() == 0:
+        listener.close()
+        control.close()
+        _monitor(conn, request, fds)
+    for fd in fds:
+        os.close(fd)
+    conn.close()
+
+
+def main():
+    sock_path = sys.argv[1]
+    preload = [m for m in (sys.argv[2] if len(sys.argv) > 2 else "").split(",") if m]
+    for name in preload:
+        try:
+            __import__(name)
+        except Exception:  # noqa: BLE001
+            pass  # a missing optional module just is not warm
+
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # monitors are reaped automatically
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(sock_path)
+    listener.listen(64)
+
+    # stdin is a pipe from the parent; EOF means the parent is gone
+    control = os.fdopen(0, "rb", buffering=0)
+    sel = selectors.DefaultSelector()
+    sel.register(listener, selectors.EVENT_READ)
+    sel.register(control, selectors.EVENT_READ)
+
+    # tell the parent we are warm, then let go of its pipe
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    while True:
+        for key, _ in sel.select():
+            if key.fileobj is control:
+                if not control.read(1):
+                    return
+            else:
+                _serve_one(listener, control)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# functions/apply_edit.py
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import NotRequired, TypedDict
+
+from .atomic_write import atomic_write, content_hash
+from .registry import register, schema_getattr
+
+
+class EditError(Exception):
+    """An edit does not apply to the file's current content."""
+
+
+# One search/replace block. Functional syntax so that NotRequired is seen
+# despite the postponed annotations.
+EditBlock = TypedDict("EditBlock", {"search": str, "replace": str, "replace_all": NotRequired[bool]})
+
+
+# ─── search / replace blocks ──────────────────────────────────────────────────
+
+def _apply_blocks(text: str, edits: list[EditBlock]) -> str:
+    for n, edit in enumerate(edits, start=1):
+        search = edit.get("search")
+        replace = edit.get("replace", "")
+        if not isinstance(search, str) or not search:
+            raise EditError(f"edit {n}: 'search' must be a non-empty string")
+        if not isinstance(replace, str):
+            raise EditError(f"edit {n}: 'replace' must be a string")
+
+        count = text.count(search)
+        if count == 0:
+            hint = ""
+            if _loose(search) in _loose(text):
+                hint = " (it does appear with different whitespace; copy it exactly)"
+            raise EditError(f"edit {n}: search text not found{hint}")
+        if count > 1 and not edit.get("replace_all"):
+            raise EditError(
+                f"edit {n}: search text occurs {count} times; add surrounding lines to "
+                "make it unique, or set replace_all=true"
+            )
+        text = text.replace(search, replace) if edit.get("replace_all") else text.replace(search, replace, 1)
+    return text
+
+
+def _loose(s: str) -> str:
+    return re.sub(r"\s+", " ", s).strip()
+
+
+# ─── unified diffs ────────────────────────────────────────────────────────────
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _parse_hunks(diff: str) -> list[tuple[int, list[str], list[str]]]:
+    """[(old_start, old_lines, new_lines)] for every hunk, lines without newlines.
+
+    old_start is the first old line the hunk covers. A pure insertion
+    (`@@ -N,0 ...`) covers no lines and goes after line N, so its
+    old_start is N + 1.
+    """
+    hunks: list[tuple[int, list[str], list[str]]] = []
+    current: tuple[int, list[str], list[str]] | None = None
+    lines = diff.splitlines()
+    for i, raw in enumerate(lines):
+        m = _HUNK_RE.match(raw)
+        if m:
+            old_start = int(m.group(1))
+            if m.group(2) == "0":
+                old_start += 1  # insertion after line N
+            current = (old_start, [], [])
+            hunks.append(current)
+            continue
+        is_header = raw.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")
+        if current is None or is_header or (raw.startswith("+++ ") and i and lines[i - 1].startswith("--- ")):
+            continue  # file headers and anything before the first hunk
+        if raw.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        tag, body = raw[:1], raw[1:]
+        if tag == " " or raw == "":
+            current[1].append(body)
+            current[2].append(body)
+        elif tag == "-":
+            current[1].append(body)
+        elif tag == "+":
+            current[2].append(body)
+        else:
+            raise EditError(f"unexpected line in diff: {raw[:80]!r}")
+    if not hunks:
+        raise EditError("diff contains no @@ hunks")
+    return hunks
+
+
+def _find_block(lines: list[str], block: list[str], expected: int, start: int) -> int:
+    """Index where `block` occurs at or after `start`, nearest to `expected`."""
+    if not block:
+        return max(start, min(expected, len(lines)))
+    hits = [
+        i for i in range(start, len(lines) - len(block) + 1)
+        if lines[i : i + len(block)] == block
+    ]
+    if not hits:
+        return -1
+    return min(hits, key=lambda i: abs(i - expected))
+
+
+def _apply_diff(text: str, diff: str) -> str:
+    trailing_newline = text.endswith("\n")
+    lines = text.split("\n")
+    if trailing_newline:
+        lines.pop()
+
+    out: list[str] = []
+    pos = 0  # next unconsumed line of the original
+    shift = 0  # how far hunks have been found from their stated position
+    for n, (old_start, old_lines, new_lines) in enumerate(_parse_hunks(diff), start=1):
+        expected = max(0, old_start - 1) + shift
+        at = _find_block(lines, old_lines, expected, pos)
+        if at < 0:
+            preview = old_lines[0][:60] if old_lines else ""
+            raise EditError(
+                f"hunk {n} (@@ -{old_start}) does not match the file; context/removed "
+                f"lines starting {preview!r} were not found; re-read the file and regenerate the diff"
+            )
+        shift = at - max(0, old_start - 1)
+        out += lines[pos:at]
+        out += new_lines
+        pos = at + len(old_lines)
+    out += lines[pos:]
+    return "\n".join(out) + ("\n" if trailing_newline else "")
+
+
+# ─── tool ─────────────────────────────────────────────────────────────────────
+
+def apply_edit(
+    working_directory: str,
+    file_path: str,
+    edits: list[EditBlock] | None = None,
+    diff: str | None = None,
+    expected_hash: str | None = None,
+) -> str:
+    """
+    Change part of an existing file inside `working_directory`.
+
+    Takes either `edits`, a list of {"search", "replace"} blocks where
+    each search text must occur exactly once (unless "replace_all"), or
+    `diff`, a unified diff whose hunks are located by their context lines
+    (line numbers are only a hint). All edits apply or none do.
+
+    `expected_hash` (as reported by write_file / apply_edit) guards
+    against editing a file that changed since the model last wrote it.
+    The read tools report no hash, so the guard only covers files the
+    agent itself wrote or edited. The file is also re-hashed just before
+    the write, so a concurrent change is never overwritten. The write itself is atomic (temp file +
+    os.replace), and CRLF files keep their line endings.
+
+    Always returns a string (no exceptions propagate).
+    """
+    try:
+        abs_workdir = Path(working_directory).resolve()
+        abs_target = (abs_workdir / file_path).resolve()
+
+        # guard-rails: keep writes inside working_directory
+        if not str(abs_target).startswith(str(abs_workdir)):
+            return (
+                f'Error: Cannot edit "{file_path}" as it is outside the permitted '
+                "working directory"
+            )
+        if not abs_target.is_file():
+            return f'Error: File not found: "{file_path}" (use write_file to create new files)'
+        if (edits is None) == (diff is None):
+            return "Error: Pass exactly one of edits or diff"
+
+        original = abs_target.read_bytes()
+        before = content_hash(original)
+        if expected_hash and expected_hash != before:
+            return (
+                f'Error: "{file_path}" changed since you last saw it (content_hash is '
+                f"{before}, expected {expected_hash}). Re-read it and retry."
+            )
+
+        text = original.decode("utf-8")
+        crlf = "\r\n" in text
+        if crlf:
+            text = text.replace("\r\n", "\n")
+
+        if edits is not None:
+            if isinstance(edits, dict):
+                edits = [edits]
+            new_text = _apply_blocks(text, [dict(e) for e in edits])
+            what = f"{len(edits)} edit(s)"
+        else:
+            new_text = _apply_diff(text, diff)
+            what = "diff"
+
+        if new_text == text:
+            return f'No changes: the edits leave "{file_path}" as it is (content_hash={before})'
+
+        if crlf:
+            new_text = new_text.replace("\n", "\r\n")
+        data = new_text.encode("utf-8")
+
+        if content_hash(abs_target.read_bytes()) != before:
+            return f'Error: "{file_path}" was modified while the edit was being applied; retry.'
+        atomic_write(abs_target, data)
+
+        old_n, new_n = text.count("\n"), new_text.count("\n")
+        return (
+            f'Successfully applied {what} to "{file_path}" '
+            f"({old_n} -> {new_n} lines; content_hash={content_hash(data)})"
+        )
+
+    except EditError as e:
+        return f"Error: {e}. Nothing was written."
+    except UnicodeDecodeError:
+        return f'Error: "{file_path}" is not UTF-8 text'
+    except Exception as e:  # noqa: BLE001
+        return f"Error: {e}"
+
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    apply_edit,
+    description=(
+        "Edits part of an existing file without rewriting it. Pass either `edits` "
+        "(search/replace blocks; each search text must match the file exactly and "
+        "occur once) or `diff` (a unified diff). All edits apply atomically or none "
+        "do. Much cheaper than write_file for small changes to large files."
+    ),
+    params={
+        "file_path": "Path of the file to edit, relative to the working directory.",
+        "edits": "Search/replace blocks, applied in order.",
+        "edits.search": "Exact existing text, including indentation; a few lines are usually enough.",
+        "edits.replace": "Text to put in its place (empty to delete).",
+        "edits.replace_all": "Replace every occurrence instead of requiring a unique match.",
+        "diff": "A unified diff (with @@ hunks) against the current file.",
+        "expected_hash": (
+            "Optional content_hash from an earlier write_file/apply_edit reply; "
+            "the edit is refused if the file has changed since. Only files you "
+            "wrote or edited have one: the read tools do not report it."
+        ),
+    },
+)
+__getattr__ = schema_getattr(__name__, "apply_edit")
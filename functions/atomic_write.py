@@ -0,0 +1,49 @@
+# functions/atomic_write.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from . import code_index, workspace_index
+from .line_index import MAPPED_FILES
+from .read_cache import READ_CACHE
+
+
+def content_hash(data: bytes) -> str:
+    """Short content digest the edit tools report and check (sha256 prefix)."""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def atomic_write(abs_target: Path, data: bytes) -> None:
+    """
+    Replace `abs_target` with `data` all at once.
+
+    The bytes go to a temp file in the same directory, are fsynced, and
+    the temp file is renamed over the target with os.replace, so readers
+    (and a crash) see either the old or the new file, never a torn one.
+    An existing file's permission bits are kept. Afterwards every cache
+    keyed on the path is told about the write.
+    """
+    abs_target = Path(abs_target)
+    abs_target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = abs_target.with_name(f".{abs_target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(tmp, abs_target.stat().st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, abs_target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    READ_CACHE.invalidate(abs_target)
+    MAPPED_FILES.invalidate(abs_target)
+    workspace_index.invalidate(str(abs_target))
+    code_index.update_file(str(abs_target))
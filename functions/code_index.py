@@ -0,0 +1,238 @@
+# functions/code_index.py
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Iterable, Iterator
+
+from .file_text import is_binary, read_text_uncached
+from .workspace_index import STATE_DIR, get_index
+
+CODE_INDEX_FILE = "code_index.sqlite"
+CODE_INDEX_VERSION = 1
+
+# Files larger than this, or that look binary, are not indexed or searched.
+MAX_INDEXED_FILE_BYTES = 1024 * 1024
+# Any subset of a query's trigrams is a valid filter; cap the SQL IN list.
+MAX_QUERY_TRIGRAMS = 64
+
+
+def trigrams(text: str) -> set[int]:
+    """
+    Case-folded trigrams of `text` (the index is case-insensitive), each
+    packed into one sqlite INTEGER as three 21-bit code points.
+    """
+    text = text.lower()
+    # dedupe as tuples first (C speed), pack only the distinct ones
+    return {(ord(a) << 42) | (ord(b) << 21) | ord(c) for a, b, c in set(zip(text, text[1:], text[2:]))}
+
+
+class CodeIndex:
+    """
+    On-disk trigram index of the text files under one working directory.
+
+    Stored in `.claii/code_index.sqlite`: one row per (trigram, file), so a
+    query's candidate files are those containing every trigram the query
+    requires. Candidates are then verified by actually searching them, so
+    the index only ever narrows the scan and never changes the results.
+    Each file row also keeps its own trigram list, so re-indexing a file
+    deletes its postings by primary key instead of needing a second index.
+
+    `refresh` reconciles the index with the file list from the workspace
+    index (respecting .gitignore), re-indexing only files whose mtime or
+    size moved. `update_file` re-indexes a single file at once; write_file
+    calls it through the module-level `update_file`.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, STATE_DIR, CODE_INDEX_FILE)
+        self._db: sqlite3.Connection | None = None
+        self.lock = threading.RLock()
+
+    # ── storage ───────────────────────────────────────────────────────────────
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA cache_size=-65536")  # 64 MB; bulk indexing is B-tree bound
+            if db.execute("PRAGMA user_version").fetchone()[0] != CODE_INDEX_VERSION:
+                db.executescript(
+                    """
+                    DROP TABLE IF EXISTS files;
+                    DROP TABLE IF EXISTS trigrams;
+                    CREATE TABLE files (
+                        id INTEGER PRIMARY KEY,
+                        path TEXT UNIQUE NOT NULL,
+                        mtime_ns INTEGER NOT NULL,
+                        size INTEGER NOT NULL,
+                        is_text INTEGER NOT NULL,
+                        tris BLOB NOT NULL
+                    );
+                    CREATE TABLE trigrams (
+                        tri INTEGER NOT NULL,
+                        file_id INTEGER NOT NULL,
+                        PRIMARY KEY (tri, file_id)
+                    ) WITHOUT ROWID;
+                    """
+                )
+                db.execute(f"PRAGMA user_version={CODE_INDEX_VERSION}")
+            self._db = db
+        return self._db
+
+    def _abs(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path)
+
+    def _drop_postings(self, file_id: int) -> None:
+        row = self.db.execute("SELECT tris FROM files WHERE id = ?", (file_id,)).fetchone()
+        if row and row[0]:
+            self.db.executemany(
+                "DELETE FROM trigrams WHERE tri = ? AND file_id = ?",
+                ((t, file_id) for t in array("q", row[0])),
+            )
+
+    def _remove(self, file_id: int) -> None:
+        self._drop_postings(file_id)
+        self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, rel_path: str, st: os.stat_result, file_id: int | None) -> None:
+        abs_path = self._abs(rel_path)
+        tris: set[int] = set()
+        is_text = False
+        if st.st_size <= MAX_INDEXED_FILE_BYTES and not is_binary(abs_path):
+            try:
+                tris = trigrams(read_text_uncached(abs_path))
+                is_text = True
+            except (OSError, UnicodeDecodeError):
+                pass
+        # sorted inserts walk the B-tree in order instead of at random
+        ordered = array("q", sorted(tris))
+        if file_id is None:
+            file_id = self.db.execute(
+                "INSERT INTO files (path, mtime_ns, size, is_text, tris) VALUES (?, ?, ?, ?, ?)",
+                (rel_path, st.st_mtime_ns, st.st_size, is_text, ordered.tobytes()),
+            ).lastrowid
+        else:
+            self._drop_postings(file_id)
+            self.db.execute(
+                "UPDATE files SET mtime_ns = ?, size = ?, is_text = ?, tris = ? WHERE id = ?",
+                (st.st_mtime_ns, st.st_size, is_text, ordered.tobytes(), file_id),
+            )
+        self.db.executemany(
+            "INSERT INTO trigrams (tri, file_id) VALUES (?, ?)",
+            ((t, file_id) for t in ordered),
+        )
+
+    # ── maintenance ───────────────────────────────────────────────────────────
+
+    def refresh(self) -> None:
+        """Bring the index in line with the working directory."""
+        with self.lock:
+            known = {
+                path: (file_id, mtime_ns, size)
+                for file_id, path, mtime_ns, size in self.db.execute(
+                    "SELECT id, path, mtime_ns, size FROM files"
+                )
+            }
+            workspace = get_index(self.root)
+            seen: set[str] = set()
+            self.db.execute("BEGIN")
+            try:
+                for rel_path, is_dir, _ in workspace.walk():
+                    if is_dir is not False:
+                        continue
+                    try:
+                        st = os.stat(self._abs(rel_path))
+                    except OSError:
+                        continue
+                    seen.add(rel_path)
+                    row = known.get(rel_path)
+                    if row is None or row[1:] != (st.st_mtime_ns, st.st_size):
+                        self._index_file(rel_path, st, row[0] if row else None)
+                for rel_path, (file_id, _, _) in known.items():
+                    if rel_path not in seen:
+                        self._remove(file_id)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            workspace.save()
+
+    def update_file(self, abs_path: str) -> None:
+        """Re-index (or drop) one file right after it was written."""
+        rel_path = os.path.relpath(os.path.abspath(abs_path), self.root).replace(os.sep, "/")
+        with self.lock:
+            row = self.db.execute("SELECT id FROM files WHERE path = ?", (rel_path,)).fetchone()
+            self.db.execute("BEGIN")
+            try:
+                try:
+                    st = os.stat(abs_path)
+                except OSError:
+                    if row:
+                        self._remove(row[0])
+                else:
+                    self._index_file(rel_path, st, row[0] if row else None)
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    # ── queries ───────────────────────────────────────────────────────────────
+
+    def candidates(self, required: Iterable[int] | None, prefix: str = "") -> Iterator[str]:
+        """
+        Relative paths of text files that contain every trigram in
+        `required` (all of them if None), sorted, limited to those under
+        `prefix`.
+        """
+        with self.lock:
+            if not required:
+                rows = self.db.execute("SELECT path FROM files WHERE is_text ORDER BY path").fetchall()
+            else:
+                tris = sorted(set(required))[:MAX_QUERY_TRIGRAMS]
+                marks = ",".join("?" * len(tris))
+                rows = self.db.execute(
+                    f"""
+                    SELECT f.path FROM trigrams t JOIN files f ON f.id = t.file_id
+                    WHERE t.tri IN ({marks})
+                    GROUP BY t.file_id HAVING COUNT(*) = ?
+                    ORDER BY f.path
+                    """,
+                    (*tris, len(tris)),
+                ).fetchall()
+        for (path,) in rows:
+            if not prefix or path == prefix or path.startswith(prefix + "/"):
+                yield path
+
+
+_INDEXES: dict[str, CodeIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_code_index(working_directory: str) -> CodeIndex:
+    """Return the shared code index for `working_directory`, creating it lazily."""
+    root = os.path.abspath(working_directory)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = CodeIndex(root)
+        return index
+
+
+def update_file(abs_path: str) -> None:
+    """Tell every loaded code index that `abs_path` was just written."""
+    abs_path = os.path.abspath(abs_path)
+    with _INDEXES_LOCK:
+        indexes = list(_INDEXES.values())
+    for index in indexes:
+        if abs_path.startswith(index.root + os.sep):
+            try:
+                index.update_file(abs_path)
+            except sqlite3.Error:
+                pass  # the next refresh catches up
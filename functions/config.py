@@ -1,4 +1,46 @@
 # Global configuration for function helpers
+import os
 
 # Maximum number of characters to read from a file before truncating.
 MAX_FILE_CHARS = 10000
+
+# get_files_content: total characters one batch may return, shared across
+# its files (each file is still capped at MAX_FILE_CHARS), and how many
+# files a batch may name after glob expansion.
+MAX_BATCH_CHARS = int(os.getenv("CLAII_MAX_BATCH_CHARS", str(4 * MAX_FILE_CHARS)))
+MAX_BATCH_FILES = int(os.getenv("CLAII_MAX_BATCH_FILES", "50"))
+
+# Byte budget for the shared file read cache (see functions/read_cache.py).
+READ_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Warm worker pool for run_python_file (see functions/python_pool.py).
+# Set CLAII_PYTHON_POOL=0 to always start a fresh interpreter instead.
+PYTHON_POOL_ENABLED = os.getenv("CLAII_PYTHON_POOL", "1") not in ("0", "false", "off")
+# Modules the warm interpreter imports up front, comma-separated.
+PYTHON_PRELOAD_MODULES = [
+    m.strip()
+    for m in os.getenv("CLAII_PYTHON_PRELOAD", "unittest,json,re,collections,dataclasses").split(",")
+    if m.strip()
+]
+
+# run_python_file keeps the first and last this many bytes of stdout and
+# of stderr; anything in between is dropped from the reply.
+RUN_OUTPUT_HEAD_BYTES = int(os.getenv("CLAII_RUN_OUTPUT_HEAD_BYTES", str(4 * 1024)))
+RUN_OUTPUT_TAIL_BYTES = int(os.getenv("CLAII_RUN_OUTPUT_TAIL_BYTES", str(4 * 1024)))
+# Spool the complete output to .claii/spool/ when something was dropped.
+RUN_OUTPUT_SPOOL = os.getenv("CLAII_RUN_OUTPUT_SPOOL", "1") not in ("0", "false", "off")
+# Older spool files are deleted beyond this many.
+MAX_SPOOL_FILES = 20
+
+# Tool dispatch (see functions/registry.py): how long a read-only tool may
+# run before the agent gives up on it, and the most characters any tool
+# reply may hand to the model.
+TOOL_TIMEOUT_S = float(os.getenv("CLAII_TOOL_TIMEOUT", "60"))
+MAX_TOOL_RESULT_CHARS = int(os.getenv("CLAII_MAX_TOOL_RESULT_CHARS", str(MAX_BATCH_CHARS + MAX_FILE_CHARS)))
+
+# Knowledge-base retrieval (see functions/kb_index.py): target chunk size
+# when kb/ documents are split, how many chunks search_kb and @kb?query
+# return by default, and how many characters @kb?query may inline.
+KB_CHUNK_CHARS = int(os.getenv("CLAII_KB_CHUNK_CHARS", "1500"))
+KB_TOP_K = int(os.getenv("CLAII_KB_TOP_K", "5"))
+KB_INLINE_CHARS = int(os.getenv("CLAII_KB_INLINE_CHARS", "6000"))
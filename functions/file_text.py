@@ -0,0 +1,23 @@
+# functions/file_text.py
+from __future__ import annotations
+
+_BINARY_SNIFF_BYTES = 8192
+
+
+def read_text_uncached(path: str) -> str:
+    """
+    A file's text straight from disk. The indexes and search_code read
+    many files once each; going through READ_CACHE would evict the files
+    the agent is working on for ones it may never look at.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def is_binary(path: str) -> bool:
+    """True for files with a NUL byte near the start (or that cannot be read)."""
+    try:
+        with open(path, "rb") as f:
+            return b"\0" in f.read(_BINARY_SNIFF_BYTES)
+    except OSError:
+        return True
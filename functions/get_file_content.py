@@ -1,32 +1,126 @@
 # functions/get_file_content.py
 import os
-from google.genai import types
 from .config import MAX_FILE_CHARS  # you already have this from earlier step
+from .line_index import MAPPED_FILES
+from .read_cache import READ_CACHE
+from .registry import register, schema_getattr
 
 
-def get_file_content(working_directory: str, file_path: str) -> str:
+def resolve_file(working_directory: str, file_path: str) -> tuple[str, str | None]:
+    """
+    Guard-rails shared by the read tools: (absolute path, None) for a regular
+    file inside `working_directory`, else (absolute path, "Error: ...").
+    """
+    abs_workdir = os.path.abspath(working_directory)
+    abs_target = os.path.abspath(os.path.join(abs_workdir, file_path))
+
+    if not abs_target.startswith(abs_workdir):
+        return abs_target, f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+
+    if not os.path.isfile(abs_target):
+        return abs_target, f'Error: File not found or is not a regular file: "{file_path}"'
+
+    return abs_target, None
+
+
+def _header(file_path: str, mapped, showing: str) -> str:
+    return (
+        f'[File "{file_path}": {mapped.size} bytes, {mapped.index.line_count} lines; '
+        f"showing {showing}]\n"
+    )
+
+
+def _read_range(file_path, abs_target, offset, length, start_line, end_line) -> str:
+    """Serve a byte or line range through the shared mmap + line index."""
+    if (offset is not None or length is not None) and (start_line is not None or end_line is not None):
+        return "Error: Use either offset/length or start_line/end_line, not both"
+
+    mapped = MAPPED_FILES.get(abs_target)
+    if mapped.size == 0:
+        return _header(file_path, mapped, "everything (the file is empty)")
+
+    if start_line is not None or end_line is not None:
+        first = max(1, start_line or 1)
+        total_lines = mapped.index.line_count
+        if first > max(total_lines, 1):
+            return f'Error: start_line {first} is past the end of "{file_path}" ({total_lines} lines)'
+        last = min(end_line if end_line is not None else total_lines, total_lines)
+        if last < first:
+            return f"Error: end_line {end_line} is before start_line {first}"
+
+        data, begin, _ = mapped.read_lines(first - 1, last)
+        text = data.decode("utf-8", errors="replace")
+        if len(text) > MAX_FILE_CHARS:
+            # stop at the last whole line that fits
+            cut = text.rfind("\n", 0, MAX_FILE_CHARS) + 1
+            if cut == 0:
+                # a single line longer than the cap: page through it by bytes
+                shown = text[:MAX_FILE_CHARS]
+                resume = begin + len(shown.encode("utf-8"))
+                return (
+                    _header(file_path, mapped, f"part of line {first}")
+                    + shown
+                    + f"\n[...line {first} truncated at {MAX_FILE_CHARS} characters; "
+                    f"continue with offset={resume}]"
+                )
+            shown_last = first - 1 + text.count("\n", 0, cut)
+            return (
+                _header(file_path, mapped, f"lines {first}-{shown_last}")
+                + text[:cut]
+                + f"\n[...truncated at {MAX_FILE_CHARS} characters; "
+                f"continue with start_line={shown_last + 1}]"
+            )
+        return _header(file_path, mapped, f"lines {first}-{last}") + text
+
+    start = max(0, offset or 0)
+    if start >= mapped.size and mapped.size:
+        return f'Error: offset {start} is past the end of "{file_path}" ({mapped.size} bytes)'
+    count = min(length if length is not None else MAX_FILE_CHARS, MAX_FILE_CHARS)
+    if count <= 0:
+        return "Error: length must be positive"
+    data = mapped.read_bytes(start, count)
+    end = start + len(data)
+    text = _header(file_path, mapped, f"bytes {start}-{end}") + data.decode("utf-8", errors="replace")
+    if end < mapped.size:
+        text += f"\n[...{mapped.size - end} more bytes; continue with offset={end}]"
+    return text
+
+
+def get_file_content(
+    working_directory: str,
+    file_path: str,
+    offset: int | None = None,
+    length: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
     """
     Return the text of a file inside the working directory, with guard-rails.
+
+    Without a range the file is read from the start and truncated at
+    MAX_FILE_CHARS. `offset`/`length` (bytes) or `start_line`/`end_line`
+    (1-based, inclusive) select a slice of any size file instead; ranged
+    replies start with a header giving the file's total size and line count.
     Always returns a string (no exceptions propagate).
     """
     try:
-        abs_workdir = os.path.abspath(working_directory)
-        abs_target = os.path.abspath(os.path.join(abs_workdir, file_path))
-
-        if not abs_target.startswith(abs_workdir):
-            return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+        abs_target, error = resolve_file(working_directory, file_path)
+        if error:
+            return error
 
-        if not os.path.isfile(abs_target):
-            return f'Error: File not found or is not a regular file: "{file_path}"'
+        if any(v is not None for v in (offset, length, start_line, end_line)):
+            return _read_range(file_path, abs_target, offset, length, start_line, end_line)
 
-        with open(abs_target, "r", encoding="utf-8") as f:
-            content = f.read(MAX_FILE_CHARS + 1)
+        content = READ_CACHE.read_text(abs_target, limit=MAX_FILE_CHARS + 1, errors="replace")
 
         # Truncate if too long
         if len(content) > MAX_FILE_CHARS:
+            mapped = MAPPED_FILES.get(abs_target)
             content = (
                 content[:MAX_FILE_CHARS]
-                + f'\n[...File "{file_path}" truncated at {MAX_FILE_CHARS} characters]'
+                + f'\n[...File "{file_path}" truncated at {MAX_FILE_CHARS} characters; '
+                f"{mapped.size} bytes, {mapped.index.line_count} lines in total. "
+                "Use start_line/end_line or offset/length to read further]"
             )
 
         return content
@@ -35,18 +129,22 @@ def get_file_content(working_directory: str, file_path: str) -> str:
         return f"Error: {e}"
 
 
-# --- Function declaration schema for the LLM ---
-schema_get_file_content = types.FunctionDeclaration(
-    name="get_file_content",
-    description="Read the contents of a file within the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description="Path to the file, relative to the working directory.",
-            ),
-        },
-        required=["file_path"],
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    get_file_content,
+    description=(
+        "Read the contents of a file within the working directory. Large files "
+        "are truncated; pass start_line/end_line or offset/length to read any "
+        "part of them. Ranged reads report the file's total size and line count."
     ),
+    params={
+        "file_path": "Path to the file, relative to the working directory.",
+        "start_line": "First line to return (1-based). Use with end_line.",
+        "end_line": "Last line to return (inclusive). Defaults to the end of the file.",
+        "offset": "Byte offset to start reading at. Use instead of line numbers.",
+        "length": f"Number of bytes to read from offset (at most {MAX_FILE_CHARS}).",
+    },
+    read_only=True,
 )
+__getattr__ = schema_getattr(__name__, "get_file_content")
@@ -0,0 +1,207 @@
+# functions/get_files_content.py
+from __future__ import annotations
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import MAX_BATCH_CHARS, MAX_BATCH_FILES, MAX_FILE_CHARS
+from .get_file_content import resolve_file
+from .read_cache import READ_CACHE
+from .registry import register, schema_getattr
+from .workspace_index import _glob_to_regex, get_index
+
+# Files are read on this many threads at once.
+MAX_READ_WORKERS = 8
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def _outside_workdir(pattern: str) -> bool:
+    """Absolute patterns and any ".." segment could reach outside the working directory."""
+    pattern = pattern.strip()
+    return os.path.isabs(pattern) or pattern.startswith("/") or ".." in re.split(r"[\\/]", pattern)
+
+
+def _expand(abs_workdir: str, pattern: str) -> list[str]:
+    """
+    Files under the working directory matching a glob, with gitignore-style
+    semantics: a pattern containing "/" is anchored at the working
+    directory, one without matches file names at any depth. Callers reject
+    patterns that could leave the working directory first (see
+    _outside_workdir).
+    """
+    pattern = pattern.strip()
+    if pattern.startswith("./"):
+        pattern = pattern[2:]
+    anchored = "/" in pattern.strip("/")
+    body = _glob_to_regex(pattern.strip("/"))
+    regex = re.compile(f"^{body}$" if anchored else f"^(?:.*/)?{body}$")
+
+    # walk only below the pattern's literal leading directories
+    base_parts: list[str] = []
+    if anchored:
+        for part in pattern.strip("/").split("/")[:-1]:
+            if _GLOB_CHARS.search(part):
+                break
+            base_parts.append(part)
+    base = "/".join(base_parts)
+    if base and not os.path.isdir(os.path.join(abs_workdir, base)):
+        return []
+
+    return [
+        rel_path
+        for rel_path, is_dir, _ in get_index(abs_workdir).walk(base)
+        if is_dir is False and regex.match(rel_path)
+    ]
+
+
+def _allocate(sizes: list[int], budget: int) -> list[int]:
+    """
+    Split `budget` characters across files of the given byte sizes:
+    every file gets an equal share, and whatever small files leave unused
+    is handed on to the larger ones. No file gets more than MAX_FILE_CHARS.
+    """
+    alloc = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = remaining // (len(order) - n)
+        alloc[i] = max(0, min(sizes[i], share, MAX_FILE_CHARS))
+        remaining -= alloc[i]
+    return alloc
+
+
+def _read(abs_path: str, limit: int) -> str:
+    return READ_CACHE.read_text(abs_path, limit=limit + 1)
+
+
+def _section(rel_path: str, size: int, limit: int, result: str | Exception) -> str:
+    head = f"==> {rel_path} <==\n"
+    if isinstance(result, UnicodeDecodeError):
+        return head + "[binary or non-UTF-8 file; skipped]"
+    if isinstance(result, Exception):
+        return head + f"Error: {result}"
+    if len(result) <= limit:
+        return head + result
+    # stop at the last whole line that fits, like get_file_content's ranged reads
+    cut = result.rfind("\n", 0, limit) + 1 or limit
+    shown = result[:cut]
+    next_line = shown.count("\n") + 1
+    return (
+        head
+        + shown
+        + f"\n[...truncated at {len(shown)} characters (batch budget); {size} bytes in total. "
+        f'Use get_file_content with file_path="{rel_path}", start_line={next_line} to read further]'
+    )
+
+
+def get_files_content(working_directory: str, paths: list[str]) -> str:
+    """
+    Return the contents of several files inside `working_directory` in one reply.
+
+    `paths` may mix plain paths and glob patterns ("*.py", "pkg/**/*.py");
+    globs are expanded through the workspace index, so .gitignore'd files
+    are left out. Each plain path goes through the same guard-rails as
+    get_file_content. The files share one MAX_BATCH_CHARS budget (split
+    by _allocate, never more than MAX_FILE_CHARS per file) and are read
+    concurrently; truncated files end with a marker saying where to
+    continue. Always returns a string (no exceptions propagate).
+    """
+    try:
+        if isinstance(paths, str):
+            paths = [paths]
+        if not paths:
+            return "Error: paths must name at least one file or glob pattern"
+
+        abs_workdir = os.path.abspath(working_directory)
+        targets: list[tuple[str, str]] = []  # (rel_path, abs_path)
+        problems: list[str] = []
+        seen: set[str] = set()
+        for entry in paths:
+            entry = str(entry)
+            if _GLOB_CHARS.search(entry):
+                if _outside_workdir(entry):
+                    problems.append(
+                        f"==> {entry} <==\nError: Cannot read \"{entry}\" as it is outside "
+                        "the permitted working directory"
+                    )
+                    continue
+                matches = _expand(abs_workdir, entry)
+                if not matches:
+                    problems.append(f"==> {entry} <==\n[no files match this pattern]")
+                candidates = []
+                for m in matches:
+                    # every match gets the same guard-rails as a plain path
+                    abs_target, error = resolve_file(abs_workdir, m)
+                    if not error:
+                        candidates.append((m, abs_target))
+            else:
+                abs_target, error = resolve_file(abs_workdir, entry)
+                if error:
+                    problems.append(f"==> {entry} <==\n{error}")
+                    continue
+                candidates = [(entry, abs_target)]
+            for rel_path, abs_target in candidates:
+                if abs_target not in seen:
+                    seen.add(abs_target)
+                    targets.append((rel_path, abs_target))
+
+        skipped = targets[MAX_BATCH_FILES:]
+        targets = targets[:MAX_BATCH_FILES]
+
+        sizes = []
+        for _, abs_target in targets:
+            try:
+                sizes.append(os.path.getsize(abs_target))
+            except OSError:
+                sizes.append(0)
+        limits = _allocate(sizes, MAX_BATCH_CHARS)
+
+        def read_one(i: int) -> str | Exception:
+            try:
+                return _read(targets[i][1], limits[i])
+            except Exception as e:  # noqa: BLE001
+                return e
+
+        results: list[str | Exception] = []
+        if targets:
+            with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(targets))) as pool:
+                results = list(pool.map(read_one, range(len(targets))))
+
+        sections = [
+            _section(rel_path, sizes[i], limits[i], results[i])
+            for i, (rel_path, _) in enumerate(targets)
+        ]
+        sections += problems
+        header = f"[{len(targets)} files"
+        if skipped:
+            header += (
+                f"; {len(skipped)} more matched but were left out (at most "
+                f"{MAX_BATCH_FILES} per call), starting with \"{skipped[0][0]}\""
+            )
+        header += "]"
+        return "\n\n".join([header, *sections])
+
+    except Exception as e:  # noqa: BLE001
+        return f"Error: {e}"
+
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    get_files_content,
+    description=(
+        "Read several files within the working directory in one call. Accepts file "
+        "paths and glob patterns (e.g. '*.py', 'pkg/**/*.py'). The files share a "
+        "character budget; long files are truncated with a note saying where to "
+        "continue with get_file_content. Prefer this over several get_file_content "
+        "calls when you need more than one file."
+    ),
+    params={
+        "paths": "File paths and/or glob patterns, relative to the working directory.",
+    },
+    read_only=True,
+    cost="io",
+)
+__getattr__ = schema_getattr(__name__, "get_files_content")
@@ -1,12 +1,35 @@
 # functions/get_files_info.py
 import os
-from google.genai import types
 
+from .registry import register, schema_getattr
+from .workspace_index import STATE_DIR, get_index
 
-def get_files_info(working_directory: str, directory: str | None = None) -> str:
+# Default page size for recursive listings.
+DEFAULT_LIST_LIMIT = 200
+
+
+def _format_entry(name: str, is_dir, size) -> str:
+    if is_dir is None:
+        return f"- {name}: Error: {size}"
+    return f"- {name}: file_size={size} bytes, is_dir={is_dir}"
+
+
+def get_files_info(
+    working_directory: str,
+    directory: str | None = None,
+    recursive: bool = False,
+    max_depth: int | None = None,
+    offset: int = 0,
+    limit: int | None = None,
+) -> str:
     """
     List files in a directory under `working_directory`, returning a human-readable string.
 
+    Listings come from the persistent workspace index (functions/workspace_index.py),
+    so unchanged directories are not rescanned. With `recursive=True` the whole
+    subtree is listed (down to `max_depth` levels), skipping anything matched by
+    .gitignore files, and paged with `offset` / `limit`.
+
     Always returns a *string* (no exceptions propagate).
     """
     try:
@@ -28,17 +51,40 @@ def get_files_info(working_directory: str, directory: str | None = None) -> str:
         if not os.path.isdir(abs_target):
             return f'Error: "{directory}" is not a directory'
 
-        entries = []
-        for name in os.listdir(abs_target):
-            full_path = os.path.join(abs_target, name)
-            try:
-                is_dir = os.path.isdir(full_path)
-                size = os.path.getsize(full_path)
-                entries.append(
-                    f"- {name}: file_size={size} bytes, is_dir={is_dir}"
-                )
-            except OSError as e:
-                entries.append(f'- {name}: Error: {e}')
+        index = get_index(abs_workdir)
+        rel_dir = os.path.relpath(abs_target, abs_workdir)
+        rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+
+        # The model may send numbers as floats
+        offset = max(0, int(offset or 0))
+        max_depth = int(max_depth) if max_depth else None
+
+        if recursive:
+            limit = int(limit) if limit else DEFAULT_LIST_LIMIT
+            prefix = f"{rel_dir}/" if rel_dir else ""
+            # count the whole walk, but stat only the entries on this page
+            total = 0
+            paths = []
+            for path, _ in index.walk_names(rel_dir, max_depth=max_depth):
+                if offset <= total < offset + limit:
+                    paths.append(path)
+                total += 1
+            page = [(path[len(prefix):], *index.stat_entry(path)) for path in paths]
+        else:
+            limit = int(limit) if limit else None
+            # our own state directory is an implementation detail
+            rows = [row for row in index.entries(rel_dir) if row[0] != STATE_DIR]
+            total = len(rows)
+            page = rows[offset : offset + limit] if limit else rows[offset:]
+        index.save()
+
+        entries = [_format_entry(name, is_dir, size) for name, is_dir, size in page]
+
+        if offset + len(page) < total:
+            entries.append(
+                f"[... showing entries {offset + 1}-{offset + len(page)} of {total}; "
+                f"call again with offset={offset + len(page)} for more]"
+            )
 
         return "\n".join(entries) if entries else "(empty directory)"
 
@@ -46,25 +92,37 @@ def get_files_info(working_directory: str, directory: str | None = None) -> str:
         return f"Error: {e}"
 
 
-# ─── Function Declaration Schema for the LLM ─────────────────────────────
-
-schema_get_files_info = types.FunctionDeclaration(
-    name="get_files_info",
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    get_files_info,
     description=(
         "Lists files in the specified directory along with their sizes, "
-        "constrained to the working directory."
-    ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "directory": types.Schema(
-                type=types.Type.STRING,
-                description=(
-                    "The directory to list files from, relative to the working "
-                    'directory. Use "." for the root. If not provided, lists '
-                    "files in the working directory itself."
-                ),
-            ),
-        },
+        "constrained to the working directory. Set recursive=true to list a "
+        "whole subtree (honouring .gitignore) in one call instead of one "
+        "directory at a time."
     ),
+    params={
+        "directory": (
+            "The directory to list files from, relative to the working "
+            'directory. Use "." for the root. If not provided, lists '
+            "files in the working directory itself."
+        ),
+        "recursive": (
+            "List the whole subtree, with paths relative to `directory`. "
+            "Files ignored by .gitignore are skipped. Defaults to false."
+        ),
+        "max_depth": (
+            "With recursive=true, how many directory levels to descend "
+            "(1 = only `directory` itself). Unlimited if omitted."
+        ),
+        "offset": "Index of the first entry to return, for paging. Defaults to 0.",
+        "limit": (
+            "Maximum number of entries to return. Defaults to "
+            f"{DEFAULT_LIST_LIMIT} for recursive listings, all otherwise."
+        ),
+    },
+    read_only=True,
+    cost="io",
 )
+__getattr__ = schema_getattr(__name__, "get_files_info")
@@ -1,7 +1,9 @@
 # functions/get_kb_file.py
 import os
 from pathlib import Path
-from google.genai import types
+
+from .read_cache import READ_CACHE
+from .registry import register, schema_getattr
 
 
 def get_kb_file(working_directory: str, kb_path: str) -> str:
@@ -19,23 +21,20 @@ def get_kb_file(working_directory: str, kb_path: str) -> str:
         if not target.exists() or not target.is_file():
             return f'Error: KB file not found: "{kb_path}"'
 
-        text = target.read_text(encoding="utf-8")
         # optionally truncate to avoid token blowup
-        return text[:10000]
+        return READ_CACHE.read_text(target, limit=10000)
     except Exception as e:
         return f"Error: {e}"
 
-schema_get_kb_file = types.FunctionDeclaration(
-    name="get_kb_file",
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    get_kb_file,
     description="Reads a knowledge base file under the kb/ directory for additional context.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "kb_path": types.Schema(
-                type=types.Type.STRING,
-                description="Path under kb/, e.g. 'design.md' or 'lang/agent-architecture.md'",
-            ),
-        },
-        required=["kb_path"],
-    ),
-)
\ No newline at end of file
+    params={
+        "kb_path": "Path under kb/, e.g. 'design.md' or 'lang/agent-architecture.md'",
+    },
+    read_only=True,
+)
+__getattr__ = schema_getattr(__name__, "get_kb_file")
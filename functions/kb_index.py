@@ -0,0 +1,326 @@
+# functions/kb_index.py
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+from .code_index import MAX_INDEXED_FILE_BYTES
+from .config import KB_CHUNK_CHARS
+from .file_text import is_binary, read_text_uncached
+from .workspace_index import STATE_DIR
+
+KB_DIR = "kb"
+KB_INDEX_FILE = "kb_index.sqlite"
+KB_INDEX_VERSION = 1
+
+# Okapi BM25 parameters: term-frequency saturation and length normalisation.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+_HEADING = re.compile(r"^#{1,6}\s+(.*?)\s*#*\s*$")
+# Words too common to say anything about relevance.
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by can do does for from has have how i if in into is it its
+    not of on or so such that the their then there these this to was we what when where
+    which who why will with you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased words of `text`, without stopwords and single characters."""
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in STOPWORDS]
+
+
+def chunk_text(text: str, max_chars: int = KB_CHUNK_CHARS) -> list[tuple[int, int, str, str]]:
+    """
+    Split a document into (start_line, end_line, heading, text) chunks,
+    1-based and inclusive. A markdown heading always starts a new chunk; a
+    chunk that has reached `max_chars` ends at the next blank line, or
+    anywhere once it is twice that. `heading` is the nearest heading above
+    the chunk.
+    """
+    lines = [line.rstrip("\r") for line in text.split("\n")]
+    chunks: list[tuple[int, int, str, str]] = []
+    heading = ""
+    start = 0
+    size = 0
+
+    def flush(end: int) -> None:
+        first, last = start, end
+        while first < last and not lines[first].strip():
+            first += 1
+        while last > first and not lines[last - 1].strip():
+            last -= 1
+        if first < last:
+            chunks.append((first + 1, last, heading, "\n".join(lines[first:last])))
+
+    for i, line in enumerate(lines):
+        m = _HEADING.match(line)
+        if m or (size >= max_chars and not line.strip()) or size >= 2 * max_chars:
+            flush(i)
+            start, size = i, 0
+            if m:
+                heading = m.group(1)
+        size += len(line) + 1
+    flush(len(lines))
+    return chunks
+
+
+@dataclass
+class KBHit:
+    path: str  # relative to kb/
+    start_line: int
+    end_line: int
+    heading: str
+    text: str
+    score: float
+
+    def render(self, max_chars: int | None = None) -> str:
+        where = f"kb/{self.path}:{self.start_line}-{self.end_line}"
+        if self.heading:
+            where += f" ({self.heading})"
+        text = self.text
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars] + "\n[... chunk truncated]"
+        return f"--- {where} ---\n{text}"
+
+
+class KBIndex:
+    """
+    On-disk BM25 index of the knowledge base under `<root>/kb`.
+
+    Stored in `.claii/kb_index.sqlite` next to the code index. Documents
+    are split into chunks (see `chunk_text`). Each chunk's terms and term
+    counts go into a postings table keyed by term, so a query reads only
+    the postings of its own terms. Chunk texts are kept in the index, so
+    a search reads no documents.
+
+    `refresh` re-chunks only documents whose mtime or size moved, and drops
+    deleted ones; `search` calls it first, so results always match the
+    files on disk.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.kb_root = os.path.join(self.root, KB_DIR)
+        self.path = os.path.join(self.root, STATE_DIR, KB_INDEX_FILE)
+        self._db: sqlite3.Connection | None = None
+        self.lock = threading.RLock()
+
+    # ── storage ───────────────────────────────────────────────────────────────
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            if db.execute("PRAGMA user_version").fetchone()[0] != KB_INDEX_VERSION:
+                db.executescript(
+                    """
+                    DROP TABLE IF EXISTS docs;
+                    DROP TABLE IF EXISTS chunks;
+                    DROP TABLE IF EXISTS postings;
+                    CREATE TABLE docs (
+                        id INTEGER PRIMARY KEY,
+                        path TEXT UNIQUE NOT NULL,
+                        mtime_ns INTEGER NOT NULL,
+                        size INTEGER NOT NULL
+                    );
+                    CREATE TABLE chunks (
+                        id INTEGER PRIMARY KEY,
+                        doc_id INTEGER NOT NULL,
+                        start_line INTEGER NOT NULL,
+                        end_line INTEGER NOT NULL,
+                        heading TEXT NOT NULL,
+                        length INTEGER NOT NULL,
+                        text TEXT NOT NULL
+                    );
+                    CREATE INDEX chunks_by_doc ON chunks (doc_id);
+                    CREATE TABLE postings (
+                        term TEXT NOT NULL,
+                        chunk_id INTEGER NOT NULL,
+                        tf INTEGER NOT NULL,
+                        PRIMARY KEY (term, chunk_id)
+                    ) WITHOUT ROWID;
+                    CREATE INDEX postings_by_chunk ON postings (chunk_id);
+                    """
+                )
+                db.execute(f"PRAGMA user_version={KB_INDEX_VERSION}")
+            self._db = db
+        return self._db
+
+    def _drop_chunks(self, doc_id: int) -> None:
+        self.db.execute(
+            "DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE doc_id = ?)", (doc_id,)
+        )
+        self.db.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+
+    def _index_doc(self, rel_path: str, st: os.stat_result, doc_id: int | None) -> None:
+        if doc_id is None:
+            doc_id = self.db.execute(
+                "INSERT INTO docs (path, mtime_ns, size) VALUES (?, ?, ?)",
+                (rel_path, st.st_mtime_ns, st.st_size),
+            ).lastrowid
+        else:
+            self._drop_chunks(doc_id)
+            self.db.execute(
+                "UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?", (st.st_mtime_ns, st.st_size, doc_id)
+            )
+        abs_path = os.path.join(self.kb_root, rel_path)
+        if st.st_size > MAX_INDEXED_FILE_BYTES or is_binary(abs_path):
+            return  # remembered, so it is not re-read until it changes
+        try:
+            text = read_text_uncached(abs_path)
+        except (OSError, UnicodeDecodeError):
+            return
+        for start, end, heading, body in chunk_text(text):
+            # the heading belongs to the chunk even when it is further up
+            terms = Counter(tokenize(heading) + tokenize(body))
+            chunk_id = self.db.execute(
+                "INSERT INTO chunks (doc_id, start_line, end_line, heading, length, text) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, start, end, heading, sum(terms.values()), body),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                ((term, chunk_id, tf) for term, tf in terms.items()),
+            )
+
+    def _walk(self):
+        """
+        (relative path, stat) of every file under kb/, hidden entries
+        skipped. Symlinks count only if they resolve inside kb/, the same
+        rule get_kb_file applies, so a link cannot pull outside files into
+        the index.
+        """
+        real_root = os.path.realpath(self.kb_root)
+        for dirpath, dirnames, filenames in os.walk(self.kb_root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for name in sorted(filenames):
+                if name.startswith("."):
+                    continue
+                abs_path = os.path.join(dirpath, name)
+                if not os.path.realpath(abs_path).startswith(real_root + os.sep):
+                    continue
+                try:
+                    st = os.stat(abs_path)
+                except OSError:
+                    continue
+                yield os.path.relpath(abs_path, self.kb_root).replace(os.sep, "/"), st
+
+    # ── maintenance ───────────────────────────────────────────────────────────
+
+    def refresh(self) -> None:
+        """Bring the index in line with kb/."""
+        with self.lock:
+            known = {
+                path: (doc_id, mtime_ns, size)
+                for doc_id, path, mtime_ns, size in self.db.execute("SELECT id, path, mtime_ns, size FROM docs")
+            }
+            seen: set[str] = set()
+            self.db.execute("BEGIN")
+            try:
+                for rel_path, st in self._walk():
+                    seen.add(rel_path)
+                    row = known.get(rel_path)
+                    if row is None or row[1:] != (st.st_mtime_ns, st.st_size):
+                        self._index_doc(rel_path, st, row[0] if row else None)
+                for rel_path, (doc_id, _, _) in known.items():
+                    if rel_path not in seen:
+                        self._drop_chunks(doc_id)
+                        self.db.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    # ── queries ───────────────────────────────────────────────────────────────
+
+    def search(self, query: str, limit: int, prefix: str = "") -> tuple[list[KBHit], int]:
+        """
+        The `limit` best chunks for `query` by BM25, best first, and how many
+        chunks matched at all. `prefix` limits the search to documents
+        under that directory of kb/.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return [], 0
+        self.refresh()
+        with self.lock:
+            n_chunks, avg_length = self.db.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not n_chunks:
+                return [], 0
+            avg_length = avg_length or 1.0
+            scores: dict[int, float] = {}
+            for term in terms:
+                rows = self.db.execute(
+                    """
+                    SELECT p.chunk_id, p.tf, c.length, d.path
+                    FROM postings p JOIN chunks c ON c.id = p.chunk_id JOIN docs d ON d.id = c.doc_id
+                    WHERE p.term = ?
+                    """,
+                    (term,),
+                ).fetchall()
+                if not rows:
+                    continue
+                # document frequency counts every chunk, filtered or not
+                idf = math.log(1 + (n_chunks - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk_id, tf, length, path in rows:
+                    if prefix and path != prefix and not path.startswith(prefix + "/"):
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+            best = heapq.nlargest(limit, scores, key=lambda chunk_id: (scores[chunk_id], -chunk_id))
+            hits = []
+            for chunk_id in best:
+                path, start, end, heading, text = self.db.execute(
+                    """
+                    SELECT d.path, c.start_line, c.end_line, c.heading, c.text
+                    FROM chunks c JOIN docs d ON d.id = c.doc_id WHERE c.id = ?
+                    """,
+                    (chunk_id,),
+                ).fetchone()
+                hits.append(KBHit(path, start, end, heading, text, scores[chunk_id]))
+        return hits, len(scores)
+
+
+_INDEXES: dict[str, KBIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_kb_index(working_directory: str) -> KBIndex:
+    """Return the shared KB index for `working_directory`, creating it lazily."""
+    root = os.path.abspath(working_directory)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = KBIndex(root)
+        return index
+
+
+def render_hits(hits: list[KBHit], max_chars: int) -> tuple[str, int]:
+    """
+    (text, count): hits in rank order, as many as fit in `max_chars` (the
+    best one is always included, truncated if it alone is too long).
+    """
+    blocks: list[str] = []
+    used = 0
+    for hit in hits:
+        block = hit.render()
+        if used + len(block) > max_chars:
+            if blocks:
+                break
+            block = hit.render(max_chars=max(0, max_chars - len(hit.render(max_chars=0))))
+        blocks.append(block)
+        used += len(block) + 1
+    return "\n".join(blocks), len(blocks)
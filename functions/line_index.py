@@ -0,0 +1,125 @@
+# functions/line_index.py
+from __future__ import annotations
+
+import mmap
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+# Newlines are counted per block; a line lookup scans at most one block.
+BLOCK_BYTES = 64 * 1024
+MAX_INDEXES = 32
+
+
+class LineIndex:
+    """
+    Sparse line-offset index over a memory-mapped file.
+
+    Building it counts newlines block by block (one C-speed pass, done once
+    per file version); afterwards finding the start of any line costs a
+    binary search plus a scan of at most BLOCK_BYTES, so reading a line
+    range is O(range) rather than O(file).
+    """
+
+    def __init__(self, mm: mmap.mmap | bytes, size: int) -> None:
+        self.size = size
+        # newlines_before[b] = number of b"\n" in mm[: b * BLOCK_BYTES]
+        self.newlines_before = array("Q", [0])
+        total = 0
+        for start in range(0, size, BLOCK_BYTES):
+            total += mm[start : start + BLOCK_BYTES].count(b"\n")
+            self.newlines_before.append(total)
+        self.newlines = total
+        ends_with_newline = size > 0 and mm[size - 1 : size] == b"\n"
+        self.line_count = total + (1 if size and not ends_with_newline else 0)
+
+    def line_offset(self, mm: mmap.mmap | bytes, line: int) -> int:
+        """Byte offset where 0-based `line` starts (`size` past the end)."""
+        if line <= 0:
+            return 0
+        if line > self.newlines:
+            return self.size
+        # the block holding the line-th newline
+        block = bisect_left(self.newlines_before, line) - 1
+        pos = block * BLOCK_BYTES
+        for _ in range(line - self.newlines_before[block]):
+            pos = mm.find(b"\n", pos) + 1
+        return pos
+
+
+class MappedFile:
+    """A read-only mapping of one file version plus its (lazy) line index."""
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = size
+        self._index: LineIndex | None = None
+        self._lock = threading.Lock()
+        if size:
+            with open(path, "rb") as f:
+                self.mm: mmap.mmap | bytes = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.mm = b""  # empty files cannot be mapped
+
+    @property
+    def index(self) -> LineIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = LineIndex(self.mm, self.size)
+            return self._index
+
+    def read_bytes(self, offset: int, length: int) -> bytes:
+        offset = max(0, min(offset, self.size))
+        return self.mm[offset : min(offset + length, self.size)]
+
+    def read_lines(self, start: int, end: int) -> tuple[bytes, int, int]:
+        """
+        Bytes of 0-based lines [start, end), plus the byte range they span.
+        """
+        index = self.index
+        begin = index.line_offset(self.mm, start)
+        finish = index.line_offset(self.mm, end)
+        return self.mm[begin:finish], begin, finish
+
+
+class MappedFiles:
+    """
+    Small LRU of MappedFile objects keyed by (realpath, mtime_ns, size),
+    so an edited file gets a fresh mapping and index automatically.
+    """
+
+    def __init__(self, max_entries: int = MAX_INDEXES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, int, int], MappedFile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str | os.PathLike) -> MappedFile:
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        key = (real, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            mapped = self._entries.get(key)
+            if mapped is not None:
+                self._entries.move_to_end(key)
+                return mapped
+        mapped = MappedFile(real, st.st_size)
+        with self._lock:
+            for old in [k for k in self._entries if k[0] == real]:
+                # unmapping is left to GC: a reader may still hold the old one
+                del self._entries[old]
+            self._entries[key] = mapped
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return mapped
+
+    def invalidate(self, path: str | os.PathLike) -> None:
+        real = os.path.realpath(path)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == real]:
+                del self._entries[key]
+
+
+# Shared by get_file_content's ranged reads; write_file invalidates it.
+MAPPED_FILES = MappedFiles()
@@ -0,0 +1,171 @@
+# functions/output_capture.py
+from __future__ import annotations
+
+import itertools
+import os
+import selectors
+import time
+from pathlib import Path
+from typing import Callable
+
+from .config import MAX_SPOOL_FILES, RUN_OUTPUT_HEAD_BYTES, RUN_OUTPUT_SPOOL, RUN_OUTPUT_TAIL_BYTES
+
+SPOOL_DIR = Path(".claii") / "spool"
+
+_run_ids = itertools.count(1)
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_run_ids)}"
+
+
+class BoundedCapture:
+    """
+    Incremental capture of one output stream in bounded memory.
+
+    The first `head_bytes` and the last `tail_bytes` are kept; anything in
+    between is counted and dropped. If `spool_path` is given, the complete
+    stream is also written there, starting the moment output first
+    overflows the buffers, so short runs never touch the disk.
+    """
+
+    def __init__(
+        self,
+        head_bytes: int = RUN_OUTPUT_HEAD_BYTES,
+        tail_bytes: int = RUN_OUTPUT_TAIL_BYTES,
+        spool_path: Path | None = None,
+        spool_label: str | None = None,
+    ) -> None:
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.spool_path = spool_path
+        # how the spool file is referred to in the output, e.g. a relative path
+        self.spool_label = spool_label or (str(spool_path) if spool_path else None)
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+        self._spool = None
+
+    @property
+    def dropped(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    @property
+    def spooled(self) -> bool:
+        return self._spool is not None
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.total += len(chunk)
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+            if not chunk:
+                return
+
+        overflowing = len(self.tail) + len(chunk) > self.tail_bytes
+        if overflowing and self._spool is None and self.spool_path is not None:
+            self._start_spool()
+        if self._spool is not None:
+            self._spool.write(chunk)
+
+        self.tail += chunk
+        if len(self.tail) > self.tail_bytes:
+            del self.tail[: len(self.tail) - self.tail_bytes]
+
+    def _start_spool(self) -> None:
+        try:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spool = open(self.spool_path, "wb")
+            # nothing has been dropped yet, so head + tail is everything so far
+            self._spool.write(self.head)
+            self._spool.write(self.tail)
+        except OSError:
+            self._spool = None
+            self.spool_path = None
+
+    def close(self) -> None:
+        if self._spool is not None:
+            self._spool.close()
+
+    def text(self) -> str:
+        """Decoded output, with a marker where bytes were dropped."""
+        if not self.dropped:
+            return (self.head + self.tail).decode("utf-8", errors="replace").replace("\r\n", "\n")
+        # cut at line boundaries so the model never sees half a line
+        head, tail = bytes(self.head), bytes(self.tail)
+        cut = head.rfind(b"\n")
+        if cut > 0:
+            head = head[: cut + 1]
+        cut = tail.find(b"\n")
+        if 0 <= cut < len(tail) - 1:
+            tail = tail[cut + 1 :]
+        omitted = self.total - len(head) - len(tail)
+        marker = f"[... {omitted} bytes omitted ({self.total} total)"
+        if self.spooled:
+            marker += f"; full output in {self.spool_label}"
+        marker += " ...]\n"
+        text = head.decode("utf-8", errors="replace") + marker + tail.decode("utf-8", errors="replace")
+        return text.replace("\r\n", "\n")
+
+
+def spool_captures(working_directory: str | os.PathLike) -> tuple[BoundedCapture, BoundedCapture]:
+    """
+    A (stdout, stderr) capture pair for one run, spooling to
+    `.claii/spool/` under the working directory when RUN_OUTPUT_SPOOL is on.
+    """
+    if not RUN_OUTPUT_SPOOL:
+        return BoundedCapture(), BoundedCapture()
+    spool_dir = Path(working_directory) / SPOOL_DIR
+    _prune_spool(spool_dir)
+    run_id = new_run_id()
+    return tuple(
+        BoundedCapture(
+            spool_path=spool_dir / f"run-{run_id}.{stream}.log",
+            spool_label=(SPOOL_DIR / f"run-{run_id}.{stream}.log").as_posix(),
+        )
+        for stream in ("stdout", "stderr")
+    )
+
+
+def _prune_spool(spool_dir: Path) -> None:
+    """Keep only the newest MAX_SPOOL_FILES spool files."""
+    try:
+        files = sorted(spool_dir.glob("run-*.log"), key=lambda p: p.stat().st_mtime)
+    except OSError:
+        return
+    for p in files[: max(0, len(files) - MAX_SPOOL_FILES + 2)]:
+        p.unlink(missing_ok=True)
+
+
+def drain(
+    sinks: dict[int, Callable[[bytes], None]],
+    timeout: float | None,
+    on_timeout: Callable[[], None],
+) -> bool:
+    """
+    Read every fd in `sinks` until EOF, passing each chunk to its sink.
+    When `timeout` expires, `on_timeout` is called (e.g. to kill the
+    process) and reading continues until EOF. Returns True on timeout.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    timed_out = False
+    with selectors.DefaultSelector() as sel:
+        for fd in sinks:
+            sel.register(fd, selectors.EVENT_READ)
+        while sel.get_map():
+            wait = None
+            if deadline is not None and not timed_out:
+                wait = deadline - time.monotonic()
+                if wait <= 0:
+                    timed_out = True
+                    on_timeout()
+                    wait = None
+            for key, _ in sel.select(wait):
+                chunk = os.read(key.fd, 65536)
+                sinks[key.fd](chunk)
+                if not chunk:
+                    sel.unregister(key.fd)
+    return timed_out
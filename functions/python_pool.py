@@ -0,0 +1,231 @@
+# functions/python_pool.py
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Sequence
+
+from .config import PYTHON_POOL_ENABLED, PYTHON_PRELOAD_MODULES
+from .output_capture import BoundedCapture, drain
+
+ZYGOTE_SCRIPT = Path(__file__).with_name("_zygote.py")
+ZYGOTE_START_TIMEOUT_S = 10
+
+
+class PoolUnavailable(Exception):
+    """The warm pool cannot serve this run; use a plain subprocess instead."""
+
+
+def _stdin_fd() -> int:
+    """Our real stdin for the script to inherit, as subprocess would, else /dev/null."""
+    try:
+        os.fstat(0)
+        return 0
+    except OSError:
+        return _devnull()
+
+
+_DEVNULL: int | None = None
+
+
+def _devnull() -> int:
+    global _DEVNULL
+    if _DEVNULL is None:
+        _DEVNULL = os.open(os.devnull, os.O_RDONLY)
+    return _DEVNULL
+
+
+class PooledRun:
+    """
+    One script execution forked from the zygote.
+
+    `start` hands the zygote our pipes and returns at once; `collect`
+    blocks until the script exits (or the deadline passes).
+    """
+
+    def __init__(self, conn: socket.socket, stdout_r: int, stderr_r: int, pid: int) -> None:
+        self.conn = conn
+        self.pid = pid
+        self._stdout_r = stdout_r
+        self._stderr_r = stderr_r
+
+    def kill(self) -> None:
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def collect(self, timeout: float, stdout: BoundedCapture, stderr: BoundedCapture) -> int:
+        """
+        Stream the script's output into `stdout` / `stderr` and return its
+        exit code. Raises subprocess.TimeoutExpired (after killing the
+        script) on timeout.
+        """
+        status = bytearray()
+        try:
+            timed_out = drain(
+                {
+                    self._stdout_r: stdout.feed,
+                    self._stderr_r: stderr.feed,
+                    self.conn.fileno(): status.extend,
+                },
+                timeout,
+                self.kill,
+            )
+        finally:
+            self.close()
+
+        if timed_out:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+        try:
+            return int(status.decode().strip())
+        except ValueError:
+            raise RuntimeError("worker pool lost track of the script") from None
+
+    def close(self) -> None:
+        for fd in (self._stdout_r, self._stderr_r):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.conn.close()
+
+
+class PythonWorkerPool:
+    """
+    Runs Python scripts by forking them from a warm interpreter.
+
+    A single long-lived zygote (functions/_zygote.py) is started on first
+    use with `preload` modules already imported. Each run is forked from
+    it, so the script skips interpreter startup and those imports, while
+    still getting its own process with the caller's cwd, argv, environment
+    and stdio: exit codes, timeouts and output look just like
+    `python3 script.py args...`. One zygote serves any number of concurrent
+    runs, since it only forks and goes back to listening.
+
+    Modules loaded from inside the working directory are dropped in the
+    child before the script runs, so edited workspace code is never stale.
+    Where fork or fd passing is unavailable (e.g. Windows), or the zygote
+    fails to start, `start` raises PoolUnavailable and callers fall back
+    to a plain subprocess.
+    """
+
+    def __init__(self, python: str = "python3", preload: Sequence[str] = PYTHON_PRELOAD_MODULES,
+                 enabled: bool = PYTHON_POOL_ENABLED) -> None:
+        self.python = python
+        self.preload = list(preload)
+        self.enabled = enabled and hasattr(os, "fork") and hasattr(socket, "send_fds")
+        self.runs = 0
+        self._proc: subprocess.Popen | None = None
+        self._sock_dir: str | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def _sock_path(self) -> str:
+        return os.path.join(self._sock_dir, "zygote.sock")
+
+    def _ensure_zygote(self) -> None:
+        if self._proc is not None and self._proc.poll() is None:
+            return
+        self.shutdown()
+        self._sock_dir = tempfile.mkdtemp(prefix="claii-pool-")
+        proc = subprocess.Popen(
+            [self.python, str(ZYGOTE_SCRIPT), self._sock_path, ",".join(self.preload)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+        )
+        # wait for "ready" so the first run does not race the bind
+        sel = selectors.DefaultSelector()
+        sel.register(proc.stdout, selectors.EVENT_READ)
+        ready = sel.select(ZYGOTE_START_TIMEOUT_S)
+        sel.close()
+        if not ready or proc.stdout.readline().strip() != b"ready":
+            proc.kill()
+            proc.wait()
+            raise PoolUnavailable("zygote did not start")
+        proc.stdout.close()
+        self._proc = proc
+
+    def start(self, script: str, args: Sequence[str], cwd: str | os.PathLike) -> PooledRun:
+        if not self.enabled:
+            raise PoolUnavailable("worker pool disabled")
+        with self._lock:
+            try:
+                self._ensure_zygote()
+            except (OSError, PoolUnavailable) as e:
+                # do not pay a failed startup on every run
+                self.enabled = False
+                raise PoolUnavailable(str(e)) from e
+            sock_path = self._sock_path
+
+        payload = json.dumps({
+            "script": str(script),
+            "args": list(args),
+            "cwd": str(cwd),
+            "env": dict(os.environ),
+        }).encode("utf-8")
+
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(sock_path)
+            socket.send_fds(conn, [len(payload).to_bytes(4, "big")], [_stdin_fd(), stdout_w, stderr_w])
+            conn.sendall(payload)
+            pid_line = b""
+            while not pid_line.endswith(b"\n"):
+                chunk = conn.recv(1)
+                if not chunk:
+                    raise PoolUnavailable("zygote closed the connection")
+                pid_line += chunk
+        except (OSError, ValueError, PoolUnavailable) as e:
+            conn.close()
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            raise PoolUnavailable(str(e)) from e
+        finally:
+            # the script holds the write ends now
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+        self.runs += 1
+        return PooledRun(conn, stdout_r, stderr_r, int(pid_line))
+
+    def run(self, script: str, args: Sequence[str], cwd: str | os.PathLike, timeout: float,
+            stdout: BoundedCapture, stderr: BoundedCapture) -> int:
+        return self.start(script, args, cwd).collect(timeout, stdout, stderr)
+
+    def shutdown(self) -> None:
+        if self._proc is not None:
+            # closing stdin tells the zygote to exit; running scripts finish on their own
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self._proc.kill()
+            self._proc = None
+        if self._sock_dir is not None:
+            try:
+                os.unlink(self._sock_path)
+            except OSError:
+                pass
+            try:
+                os.rmdir(self._sock_dir)
+            except OSError:
+                pass
+            self._sock_dir = None
+
+
+# Shared pool used by run_python_file
+PYTHON_POOL = PythonWorkerPool()
+atexit.register(PYTHON_POOL.shutdown)
@@ -0,0 +1,135 @@
+# functions/read_cache.py
+from __future__ import annotations
+
+import codecs
+import os
+import threading
+from collections import OrderedDict
+
+from .config import READ_CACHE_MAX_BYTES
+
+
+class ReadCache:
+    """
+    Process-wide cache of decoded file contents.
+
+    Entries are keyed by (resolved path, mtime_ns, size), so an edit made
+    behind our back simply misses; `invalidate` covers writes that land
+    within the same mtime tick. Eviction is least-recently-used against a
+    byte budget (file sizes on disk). Files too large to share the budget,
+    and files longer than the `limit` a miss asked for, are read straight
+    from disk and never cached.
+    """
+
+    def __init__(self, max_bytes: int = READ_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        # a single entry may take at most a quarter of the budget
+        self.max_entry_bytes = max_bytes // 4
+        self._entries: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+        self._key_by_path: dict[str, tuple[str, int, int]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def read_text(
+        self,
+        path: str | os.PathLike,
+        limit: int | None = None,
+        errors: str = "strict",
+    ) -> str:
+        """
+        Return the UTF-8 text of `path`, at most `limit` characters.
+
+        On a miss with a `limit` only that many characters are read and
+        decoded, so a bad byte further on does not matter and a large file
+        is not read whole; the text is cached only if it turned out to be
+        the whole file. Decoding errors propagate like a plain
+        `open().read()` would, unless `errors="replace"` (text with
+        replacement characters is never cached).
+        """
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        key = (real, st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return text if limit is None else text[:limit]
+            self.misses += 1
+
+        try:
+            text, whole = _read(real, limit, "strict")
+        except UnicodeDecodeError:
+            if errors == "strict":
+                raise
+            text, whole = _read(real, limit, errors)[0], False
+
+        if whole and st.st_size <= self.max_entry_bytes:
+            with self._lock:
+                self._drop_path(real)
+                self._entries[key] = text
+                self._key_by_path[real] = key
+                self._bytes += st.st_size
+                while self._bytes > self.max_bytes and self._entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    del self._key_by_path[old_key[0]]
+                    self._bytes -= old_key[2]
+                    self.evictions += 1
+
+        return text if limit is None else text[:limit]
+
+    def _drop_path(self, real: str) -> None:
+        key = self._key_by_path.pop(real, None)
+        if key is not None:
+            del self._entries[key]
+            self._bytes -= key[2]
+
+    def invalidate(self, path: str | os.PathLike) -> None:
+        """Forget any cached version of `path` (call after writing it)."""
+        with self._lock:
+            self._drop_path(os.path.realpath(path))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._key_by_path.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+def _read(real: str, limit: int | None, errors: str) -> tuple[str, bool]:
+    """(text, whole): `real` decoded, at least its first `limit` characters, and whether that is all of it."""
+    if limit is None:
+        with open(real, "r", encoding="utf-8", errors=errors) as f:
+            return f.read(), True
+    # no character takes more than 4 bytes in UTF-8
+    with open(real, "rb") as f:
+        data = f.read(limit * 4)
+        whole = len(data) < limit * 4 or not f.read(1)
+    try:
+        text = codecs.getincrementaldecoder("utf-8")(errors).decode(data, final=whole)
+    except UnicodeDecodeError as e:
+        # fine as long as the bad byte lies past the characters asked for
+        text = data[: e.start].decode("utf-8")
+        if len(text) < limit:
+            raise
+        whole = False
+    # universal newlines, as text mode would have given us
+    return text.replace("\r\n", "\n").replace("\r", "\n"), whole
+
+
+# Shared by get_file_content, get_kb_file and write_file.
+READ_CACHE = ReadCache()
@@ -0,0 +1,272 @@
+# functions/registry.py
+"""
+The agent's tools, declared in one place.
+
+Each tool module ends with a `register(...)` call: the function, a
+description for the model, one description per parameter, and how the
+agent may run it (read-only or mutating, cost class, timeout, result
+size cap). The rest is derived:
+
+- the FunctionDeclaration the model sees is generated from the
+  function's type hints on first use and cached (google.genai is only
+  imported then);
+- arguments from the model are checked against the same hints before
+  the tool runs, so a bad call gets a precise error instead of a
+  TypeError from deep inside the tool;
+- dispatch is one dict lookup in TOOLS.
+
+Supported annotations: str, int, float, bool, lists/sequences of those,
+TypedDicts (as objects) and `X | None` for optional parameters.
+`working_directory` is injected by the agent and never shown to the model.
+"""
+from __future__ import annotations
+
+import asyncio
+import collections.abc
+import functools
+import importlib
+import inspect
+import sys
+import types as pytypes
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from .config import MAX_TOOL_RESULT_CHARS, TOOL_TIMEOUT_S
+
+# Modules whose import registers a tool, in the order the model sees them.
+TOOL_MODULES = (
+    "functions.get_files_info",
+    "functions.get_file_content",
+    "functions.get_files_content",
+    "functions.run_python",
+    "functions.write_file",
+    "functions.apply_edit",
+    "functions.get_kb_file",
+    "functions.search_kb",
+    "functions.search_code",
+)
+
+# Cost classes, cheapest first: "cheap" (a lookup or one bounded read),
+# "io" (many files, a walk or an index query) and "exec" (runs user code).
+COSTS = ("cheap", "io", "exec")
+
+# Arguments the agent supplies itself; the model never controls them.
+INJECTED_ARGS = frozenset({"working_directory"})
+
+
+class ToolArgumentError(ValueError):
+    """The model called a tool with arguments that don't fit its signature."""
+
+
+@dataclass(frozen=True)
+class _Type:
+    """A parameter's JSON shape, as derived from its annotation."""
+
+    kind: str  # "string" | "integer" | "number" | "boolean" | "array" | "object"
+    items: _Type | None = None
+    fields: dict[str, tuple[_Type, bool]] | None = None  # objects: name -> (type, required)
+
+
+_SCALARS = {str: "string", bool: "boolean", int: "integer", float: "number"}
+
+
+def _parse_hint(hint: Any, where: str) -> tuple[_Type, bool]:
+    """(type, optional) for one annotation."""
+    origin = typing.get_origin(hint)
+    if origin in (typing.Union, pytypes.UnionType):
+        args = [a for a in typing.get_args(hint) if a is not type(None)]
+        if len(args) != 1:
+            raise TypeError(f"{where}: unions other than `X | None` are not supported")
+        return _parse_hint(args[0], where)[0], True
+    if hint in _SCALARS:
+        return _Type(_SCALARS[hint]), False
+    if origin in (list, tuple, collections.abc.Sequence):
+        (item,) = typing.get_args(hint)[:1] or (str,)
+        return _Type("array", items=_parse_hint(item, where)[0]), False
+    if typing.is_typeddict(hint):
+        hints = typing.get_type_hints(hint)
+        fields = {
+            name: (_parse_hint(h, f"{where}.{name}")[0], name in hint.__required_keys__)
+            for name, h in hints.items()
+        }
+        return _Type("object", fields=fields), False
+    raise TypeError(f"{where}: unsupported annotation {hint!r}")
+
+
+def _check(value: Any, t: _Type, where: str) -> Any:
+    """`value` if it fits `t` (ints sent as 3.0 become 3); else ToolArgumentError."""
+    if t.kind == "string":
+        if isinstance(value, str):
+            return value
+    elif t.kind == "boolean":
+        if isinstance(value, bool):
+            return value
+    elif t.kind == "integer":
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)  # JSON numbers often arrive as floats
+    elif t.kind == "number":
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+    elif t.kind == "array":
+        if isinstance(value, (list, tuple)):
+            return [_check(v, t.items, f"{where}[{i}]") for i, v in enumerate(value)]
+    elif t.kind == "object":
+        if isinstance(value, dict):
+            unknown = sorted(set(value) - set(t.fields))
+            if unknown:
+                raise ToolArgumentError(f"{where} has unexpected key(s): {', '.join(unknown)}")
+            out = {}
+            for name, (ft, required) in t.fields.items():
+                if value.get(name) is None:
+                    if required:
+                        raise ToolArgumentError(f"{where} is missing {name!r}")
+                    continue
+                out[name] = _check(value[name], ft, f"{where}.{name}")
+            return out
+    article = "an" if t.kind[0] in "aeiou" else "a"
+    raise ToolArgumentError(f"{where} must be {article} {t.kind}, got {type(value).__name__}")
+
+
+@dataclass
+class ToolSpec:
+    """One registered tool and how the agent may run it."""
+
+    fn: Callable[..., str]
+    description: str
+    params: dict[str, str]  # model-visible parameter -> description ("a.b" for object fields)
+    read_only: bool = False  # read-only tools may run side by side
+    cost: str = "cheap"  # one of COSTS
+    # Wall-clock limit per call. None means TOOL_TIMEOUT_S for read-only
+    # tools and no limit for mutating ones: a write that is given up on
+    # keeps running on its thread, so later calls must still wait for it.
+    timeout_s: float | None = None
+    max_result_chars: int | None = MAX_TOOL_RESULT_CHARS
+    async_fn: Callable[..., Awaitable[str]] | None = None  # native coroutine version
+    name: str = field(init=False)
+    fields: dict[str, tuple[_Type, bool]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.name = self.fn.__name__
+        if self.cost not in COSTS:
+            raise ValueError(f"tool {self.name}: cost must be one of {COSTS}, not {self.cost!r}")
+        hints = typing.get_type_hints(self.fn)
+        self.fields = {}
+        for p in inspect.signature(self.fn).parameters.values():
+            if p.name in INJECTED_ARGS:
+                continue
+            t, optional = _parse_hint(hints.get(p.name, str), f"{self.name}({p.name})")
+            self.fields[p.name] = (t, p.default is inspect.Parameter.empty and not optional)
+        undocumented = [n for n in self.fields if n not in self.params]
+        unknown = [n for n in self.params if n.split(".")[0] not in self.fields]
+        if undocumented or unknown:
+            raise ValueError(
+                f"tool {self.name}: params must describe exactly its parameters "
+                f"(undocumented: {undocumented}, unknown: {unknown})"
+            )
+
+    @property
+    def deadline_s(self) -> float | None:
+        if self.timeout_s is not None:
+            return self.timeout_s
+        return TOOL_TIMEOUT_S if self.read_only else None
+
+    @functools.cached_property
+    def declaration(self):
+        """The types.FunctionDeclaration for the model, built once."""
+        from google.genai import types
+
+        def schema(t: _Type, path: str, describe: bool = True) -> types.Schema:
+            s = types.Schema(type=types.Type(t.kind.upper()), description=self.params.get(path) if describe else None)
+            if t.items is not None:
+                s.items = schema(t.items, path, describe=False)  # fields of items are "path.field"
+            if t.fields is not None:
+                s.properties = {n: schema(ft, f"{path}.{n}") for n, (ft, _) in t.fields.items()}
+                s.required = [n for n, (_, req) in t.fields.items() if req] or None
+            return s
+
+        top = [n for n in self.params if "." not in n]  # params order, not signature order
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={n: schema(self.fields[n][0], n) for n in top},
+                required=[n for n in top if self.fields[n][1]] or None,
+            ),
+        )
+
+    def bind(self, args: dict[str, Any]) -> dict[str, Any]:
+        """Check model-supplied arguments; returns them normalised, or raises ToolArgumentError."""
+        unknown = sorted(set(args) - set(self.fields) - INJECTED_ARGS)
+        if unknown:
+            raise ToolArgumentError(f"{self.name} got unexpected argument(s): {', '.join(unknown)}")
+        bound = {n: v for n, v in args.items() if n in INJECTED_ARGS}
+        for name, (t, required) in self.fields.items():
+            if args.get(name) is None:
+                if required:
+                    raise ToolArgumentError(f"{self.name} is missing required argument {name!r}")
+                continue
+            bound[name] = _check(args[name], t, name)
+        return bound
+
+    async def run(self, args: dict[str, Any]) -> str:
+        """
+        Validate `args` and run the tool (on a worker thread unless it has a
+        native coroutine), within its deadline and result cap. Raises
+        ToolArgumentError and TimeoutError.
+        """
+        kwargs = self.bind(args)
+        if self.async_fn is not None:
+            call = self.async_fn(**kwargs)
+        else:
+            call = asyncio.to_thread(self.fn, **kwargs)
+        try:
+            result = await asyncio.wait_for(call, self.deadline_s)
+        except TimeoutError:
+            raise TimeoutError(f"{self.name} timed out after {self.deadline_s:g} seconds") from None
+        return self.cap(result)
+
+    def cap(self, result: Any) -> Any:
+        limit = self.max_result_chars
+        if not isinstance(result, str) or limit is None or len(result) <= limit:
+            return result
+        return result[:limit] + f"\n[tool reply truncated: {len(result) - limit} more characters]"
+
+
+TOOLS: dict[str, ToolSpec] = {}
+
+
+def register(fn: Callable[..., str], **metadata: Any) -> ToolSpec:
+    """Register `fn` as a tool; see ToolSpec for the metadata."""
+    spec = ToolSpec(fn, **metadata)
+    TOOLS[spec.name] = spec  # a reloaded module replaces its entry
+    return spec
+
+
+@functools.cache
+def load_tools() -> dict[str, ToolSpec]:
+    """Import every tool module (registering its tool) and return TOOLS."""
+    for module in TOOL_MODULES:
+        importlib.import_module(module)
+    return TOOLS
+
+
+def schema_getattr(module_name: str, tool_name: str) -> Callable[[str], Any]:
+    """
+    A module-level __getattr__ (PEP 562) serving `schema_<tool_name>`, the
+    tool's declaration, for code that imports it by that name (main.py).
+    Built on first access, so importing the module stays cheap.
+    """
+    attr_name = f"schema_{tool_name}"
+
+    def __getattr__(attr: str) -> Any:
+        if attr != attr_name:
+            raise AttributeError(f"module {module_name!r} has no attribute {attr!r}")
+        value = TOOLS[tool_name].declaration
+        setattr(sys.modules[module_name], attr_name, value)
+        return value
+
+    return __getattr__
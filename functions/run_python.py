@@ -1,100 +1,211 @@
-# functions/run_python.py
-from __future__ import annotations
-
-import subprocess
-from pathlib import Path
-from typing import Sequence
-
-from google.genai import types
-
-
-def run_python_file(
-    working_directory: str,
-    file_path: str,
-    args: Sequence[str] | None = None,
-) -> str:
-    """
-    Execute a Python file inside `working_directory` with safety guard-rails.
-
-    Always returns a string formatted for the LLM:
-    - Includes STDOUT / STDERR
-    - Notes non-zero exit codes
-    - Handles timeouts and unexpected exceptions
-    """
-    try:
-        abs_workdir = Path(working_directory).resolve()
-        abs_target = (abs_workdir / file_path).resolve()
-
-        # guard-rails: keep execution inside working_directory
-        if not str(abs_target).startswith(str(abs_workdir)):
-            return (
-                f'Error: Cannot execute "{file_path}" as it is outside the permitted '
-                "working directory"
-            )
-
-        if not abs_target.exists():
-            return f'Error: File "{file_path}" not found.'
-
-        if abs_target.suffix != ".py":
-            return f'Error: "{file_path}" is not a Python file.'
-
-        # build command: python file [args...]
-        cmd = ["python3", str(abs_target)]
-        if args:
-            cmd.extend(args)
-
-        proc = subprocess.run(
-            cmd,
-            cwd=abs_workdir,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
-
-        stdout = proc.stdout.strip()
-        stderr = proc.stderr.strip()
-
-        parts: list[str] = []
-        if stdout:
-            parts.append(f"STDOUT:\n{stdout}")
-        if stderr:
-            parts.append(f"STDERR:\n{stderr}")
-        if proc.returncode != 0:
-            parts.append(f"Process exited with code {proc.returncode}")
-
-        return "\n".join(parts) if parts else "No output produced."
-
-    except subprocess.TimeoutExpired:
-        return "Error: executing Python file: timed out after 30 seconds"
-    except Exception as e:  # noqa: BLE001
-        return f"Error: executing Python file: {e}"
-
-
-# Tool / function declaration for the LLM
-schema_run_python_file = types.FunctionDeclaration(
-    name="run_python_file",
-    description=(
-        "Executes a Python file inside the working directory and returns its "
-        "stdout/stderr and exit code information."
-    ),
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description=(
-                    "Path to the Python file to execute, relative to the working "
-                    "directory (e.g. 'main.py' or 'tests.py')."
-                ),
-            ),
-            "args": types.Schema(
-                type=types.Type.ARRAY,
-                description=(
-                    "Optional list of additional command-line arguments to pass to "
-                    "the Python script."
-                ),
-                items=types.Schema(type=types.Type.STRING),
-            ),
-        },
-    ),
-)
+# functions/run_python.py
+from __future__ import annotations
+
+import asyncio
+import subprocess
+from pathlib import Path
+from typing import Sequence
+
+from .output_capture import BoundedCapture, drain, spool_captures
+from .python_pool import PYTHON_POOL, PoolUnavailable
+from .registry import register, schema_getattr
+
+RUN_TIMEOUT_S = 30
+
+
+def _build_command(
+    working_directory: str,
+    file_path: str,
+    args: Sequence[str] | None,
+) -> tuple[list[str], Path] | str:
+    """
+    Validate the target script and build the `python3 file [args...]`
+    command. Returns (cmd, cwd), or an error string for the LLM.
+    """
+    abs_workdir = Path(working_directory).resolve()
+    abs_target = (abs_workdir / file_path).resolve()
+
+    # guard-rails: keep execution inside working_directory
+    if not str(abs_target).startswith(str(abs_workdir)):
+        return (
+            f'Error: Cannot execute "{file_path}" as it is outside the permitted '
+            "working directory"
+        )
+
+    if not abs_target.exists():
+        return f'Error: File "{file_path}" not found.'
+
+    if abs_target.suffix != ".py":
+        return f'Error: "{file_path}" is not a Python file.'
+
+    # build command: python file [args...]
+    cmd = ["python3", str(abs_target)]
+    if args:
+        cmd.extend(args)
+    return cmd, abs_workdir
+
+
+def _format_result(stdout: str, stderr: str, returncode: int) -> str:
+    stdout = stdout.strip()
+    stderr = stderr.strip()
+
+    parts: list[str] = []
+    if stdout:
+        parts.append(f"STDOUT:\n{stdout}")
+    if stderr:
+        parts.append(f"STDERR:\n{stderr}")
+    if returncode != 0:
+        parts.append(f"Process exited with code {returncode}")
+
+    return "\n".join(parts) if parts else "No output produced."
+
+
+def _finish(stdout: BoundedCapture, stderr: BoundedCapture, returncode: int) -> str:
+    stdout.close()
+    stderr.close()
+    return _format_result(stdout.text(), stderr.text(), returncode)
+
+
+def run_python_file(
+    working_directory: str,
+    file_path: str,
+    args: Sequence[str] | None = None,
+) -> str:
+    """
+    Execute a Python file inside `working_directory` with safety guard-rails.
+
+    The script is forked from the warm worker pool (functions/python_pool.py)
+    when possible, and started as a fresh `python3` process otherwise.
+
+    Always returns a string formatted for the LLM:
+    - Includes STDOUT / STDERR, each read incrementally and capped to its
+      first and last few KB (see functions/output_capture.py); the full
+      stream is spooled under .claii/spool/ when anything is dropped
+    - Notes non-zero exit codes
+    - Handles timeouts and unexpected exceptions
+    """
+    try:
+        built = _build_command(working_directory, file_path, args)
+        if isinstance(built, str):
+            return built
+        cmd, cwd = built
+        stdout, stderr = spool_captures(cwd)
+
+        try:
+            returncode = PYTHON_POOL.run(cmd[1], cmd[2:], cwd, RUN_TIMEOUT_S, stdout, stderr)
+            return _finish(stdout, stderr, returncode)
+        except PoolUnavailable:
+            pass  # cold start below
+
+        proc = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        with proc:
+            timed_out = drain(
+                {proc.stdout.fileno(): stdout.feed, proc.stderr.fileno(): stderr.feed},
+                RUN_TIMEOUT_S,
+                proc.kill,
+            )
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, RUN_TIMEOUT_S)
+        return _finish(stdout, stderr, proc.returncode)
+
+    except subprocess.TimeoutExpired:
+        return f"Error: executing Python file: timed out after {RUN_TIMEOUT_S} seconds"
+    except Exception as e:  # noqa: BLE001
+        return f"Error: executing Python file: {e}"
+
+
+async def _pipe_into(stream: asyncio.StreamReader, capture: BoundedCapture) -> None:
+    while chunk := await stream.read(65536):
+        capture.feed(chunk)
+
+
+async def run_python_file_async(
+    working_directory: str,
+    file_path: str,
+    args: Sequence[str] | None = None,
+) -> str:
+    """
+    Coroutine version of `run_python_file`: pooled runs are awaited on a
+    worker thread, cold starts use `asyncio.create_subprocess_exec`. Same
+    guard-rails, timeout, output capture and format.
+
+    If the awaiting task is cancelled, the child process is killed before
+    the cancellation propagates.
+    """
+    try:
+        built = _build_command(working_directory, file_path, args)
+        if isinstance(built, str):
+            return built
+        cmd, cwd = built
+        stdout, stderr = spool_captures(cwd)
+
+        try:
+            run = await asyncio.to_thread(PYTHON_POOL.start, cmd[1], cmd[2:], cwd)
+        except PoolUnavailable:
+            run = None
+        if run is not None:
+            try:
+                returncode = await asyncio.to_thread(run.collect, RUN_TIMEOUT_S, stdout, stderr)
+            except BaseException:
+                # timeout or cancellation: never leave the script running
+                run.kill()
+                raise
+            return _finish(stdout, stderr, returncode)
+
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=cwd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(
+                    _pipe_into(proc.stdout, stdout),
+                    _pipe_into(proc.stderr, stderr),
+                    proc.wait(),
+                ),
+                RUN_TIMEOUT_S,
+            )
+        except BaseException:
+            # timeout or cancellation: never leave the child running
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+        return _finish(stdout, stderr, proc.returncode)
+
+    except (TimeoutError, subprocess.TimeoutExpired):
+        return f"Error: executing Python file: timed out after {RUN_TIMEOUT_S} seconds"
+    except Exception as e:  # noqa: BLE001
+        return f"Error: executing Python file: {e}"
+
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    run_python_file,
+    description=(
+        "Executes a Python file inside the working directory and returns its "
+        "stdout/stderr and exit code information."
+    ),
+    params={
+        "file_path": (
+            "Path to the Python file to execute, relative to the working "
+            "directory (e.g. 'main.py' or 'tests.py')."
+        ),
+        "args": (
+            "Optional list of additional command-line arguments to pass to "
+            "the Python script."
+        ),
+    },
+    cost="exec",
+    async_fn=run_python_file_async,
+)
+__getattr__ = schema_getattr(__name__, "run_python_file")
@@ -0,0 +1,215 @@
+# functions/search_code.py
+from __future__ import annotations
+
+import fnmatch
+import os
+import re
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+from .code_index import get_code_index, trigrams
+from .config import MAX_FILE_CHARS
+from .file_text import read_text_uncached
+from .registry import register, schema_getattr
+
+# Default page size, in matching lines.
+DEFAULT_SEARCH_LIMIT = 50
+MAX_CONTEXT_LINES = 10
+MAX_LINE_CHARS = 300
+
+
+def _required_literals(parsed) -> list[str]:
+    """
+    Literal strings every match of a parsed regex must contain. Anything
+    optional or alternative ends a run, so this only ever under-approximates.
+    """
+    runs: list[str] = []
+    current = ""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            current += chr(av)
+            continue
+        if op is sre_parse.AT:
+            continue  # anchors and \b take no space
+        if current:
+            runs.append(current)
+            current = ""
+        if op is sre_parse.SUBPATTERN:
+            runs += _required_literals(av[-1])
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            runs += _required_literals(av[2])
+    if current:
+        runs.append(current)
+    return runs
+
+
+def _required_trigrams(query: str, regex: bool) -> set[int]:
+    """Trigrams any matching line must contain (empty = no filter possible)."""
+    if not regex:
+        return trigrams(query)
+    try:
+        literals = _required_literals(sre_parse.parse(query))
+    except Exception:  # noqa: BLE001
+        return set()
+    out: set[int] = set()
+    for lit in literals:
+        out |= trigrams(lit)
+    return out
+
+
+def _clip(line: str) -> str:
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "…"
+
+
+def _lines(text: str) -> list[str]:
+    # split on "\n" only, so numbers agree with get_file_content's start_line
+    lines = [line.rstrip("\r") for line in text.split("\n")]
+    if lines and not lines[-1]:
+        lines.pop()  # the file's final newline does not start a line
+    return lines
+
+
+def _file_hits(lines: list[str], pattern: re.Pattern) -> list[int]:
+    """0-based numbers of the lines that match."""
+    return [i for i, line in enumerate(lines) if pattern.search(line)]
+
+
+def _render(path: str, lines: list[str], hits: list[int], context: int) -> list[str]:
+    """grep-style block(s): `path:N:` for matches, `path-N-` for context."""
+    out: list[str] = []
+    hit_set = set(hits)
+    last = -2
+    for h in hits:
+        lo, hi = max(0, h - context), min(len(lines) - 1, h + context)
+        if last >= 0 and lo > last + 1:
+            out.append("--")
+        for i in range(max(lo, last + 1), hi + 1):
+            sep = ":" if i in hit_set else "-"
+            out.append(f"{path}{sep}{i + 1}{sep}{_clip(lines[i])}")
+        last = max(last, hi)
+    return out
+
+
+def search_code(
+    working_directory: str,
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    path: str | None = None,
+    glob: str | None = None,
+    context: int = 2,
+    offset: int = 0,
+    limit: int | None = None,
+) -> str:
+    """
+    Search the text files under `working_directory` for `query`, line by line.
+
+    Candidate files come from the on-disk trigram index
+    (functions/code_index.py), refreshed incrementally before every search;
+    .gitignore'd files are skipped. Results are grep-style with
+    `context` lines around each match and are paged over matching lines
+    with `offset` / `limit`.
+
+    Always returns a string (no exceptions propagate).
+    """
+    try:
+        abs_workdir = os.path.abspath(working_directory)
+        if not query:
+            return "Error: query must not be empty"
+
+        prefix = ""
+        if path not in (None, "", "."):
+            abs_target = os.path.abspath(os.path.join(abs_workdir, path))
+            if not abs_target.startswith(abs_workdir):
+                return (
+                    f'Error: Cannot search "{path}" as it is outside the permitted '
+                    "working directory"
+                )
+            prefix = os.path.relpath(abs_target, abs_workdir).replace(os.sep, "/")
+
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            pattern = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            return f"Error: invalid regex {query!r}: {e}"
+
+        # The model may send numbers as floats
+        context = max(0, min(int(context or 0), MAX_CONTEXT_LINES))
+        offset = max(0, int(offset or 0))
+        limit = int(limit) if limit else DEFAULT_SEARCH_LIMIT
+
+        index = get_code_index(abs_workdir)
+        index.refresh()
+
+        total = 0
+        files_matched = 0
+        blocks: list[str] = []
+        for rel_path in index.candidates(_required_trigrams(query, regex), prefix):
+            if glob and not (
+                fnmatch.fnmatch(rel_path, glob) or fnmatch.fnmatch(os.path.basename(rel_path), glob)
+            ):
+                continue
+            try:
+                text = read_text_uncached(os.path.join(abs_workdir, rel_path))
+            except (OSError, UnicodeDecodeError):
+                continue
+            if not regex and not pattern.search(text):
+                continue  # cheap whole-file check before splitting into lines
+            lines = _lines(text)
+            hits = _file_hits(lines, pattern)
+            if not hits:
+                continue
+            files_matched += 1
+            # only the hits that fall on the requested page are rendered
+            page = hits[max(0, offset - total) : max(0, offset + limit - total)]
+            total += len(hits)
+            if page:
+                if blocks:
+                    blocks.append("--")
+                blocks += _render(rel_path, lines, page, context)
+
+        if not total:
+            return f"No matches for {query!r}."
+
+        shown = min(limit, max(0, total - offset))
+        header = f"[{total} matching lines in {files_matched} files"
+        header += f"; showing {offset + 1}-{offset + shown}]" if shown else f"; offset {offset} is past the end]"
+        body = "\n".join(blocks)
+        if len(body) > MAX_FILE_CHARS:
+            body = body[:MAX_FILE_CHARS] + "\n[... output truncated; use a smaller limit or context]"
+        out = header + ("\n" + body if body else "")
+        if offset + shown < total:
+            out += f"\n[call again with offset={offset + shown} for more]"
+        return out
+
+    except Exception as e:  # noqa: BLE001
+        return f"Error: {e}"
+
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    search_code,
+    description=(
+        "Searches all text files in the working directory for a literal string or "
+        "regex, using a persistent index. Returns matching lines with file paths, "
+        "line numbers and surrounding context. Prefer this over listing and reading "
+        "files when looking for where something is defined or used."
+    ),
+    params={
+        "query": "Text to find (or a Python regex when regex=true). Matched per line.",
+        "regex": "Treat query as a regular expression. Defaults to false.",
+        "case_sensitive": "Match case exactly. Defaults to false.",
+        "path": "Only search under this directory (relative to the working directory).",
+        "glob": "Only search files whose path or name matches this glob, e.g. '*.py'.",
+        "context": f"Lines of context around each match (0-{MAX_CONTEXT_LINES}). Defaults to 2.",
+        "offset": "Number of matching lines to skip, for paging. Defaults to 0.",
+        "limit": f"Maximum matching lines to return. Defaults to {DEFAULT_SEARCH_LIMIT}.",
+    },
+    read_only=True,
+    cost="io",
+)
+__getattr__ = schema_getattr(__name__, "search_code")
@@ -0,0 +1,96 @@
+# functions/search_kb.py
+from __future__ import annotations
+
+import os
+
+from .config import KB_INLINE_CHARS, KB_TOP_K, MAX_FILE_CHARS
+from .kb_index import KB_DIR, get_kb_index, render_hits
+from .registry import register, schema_getattr
+
+MAX_KB_RESULTS = 20
+
+
+def _kb_prefix(working_directory: str, path: str | None) -> str:
+    """`path` as a directory relative to kb/ ("" for all of it); ValueError if outside."""
+    if path in (None, "", "."):
+        return ""
+    kb_root = os.path.join(os.path.abspath(working_directory), KB_DIR)
+    target = os.path.abspath(os.path.join(kb_root, path))
+    if target != kb_root and not target.startswith(kb_root + os.sep):
+        raise ValueError(f'Cannot search "{path}" as it is outside the KB directory')
+    rel = os.path.relpath(target, kb_root).replace(os.sep, "/")
+    return "" if rel == "." else rel
+
+
+def retrieve_kb(
+    working_directory: str,
+    query: str,
+    limit: int = KB_TOP_K,
+    max_chars: int = KB_INLINE_CHARS,
+) -> str:
+    """
+    The chunks of kb/ most relevant to `query`, best first, as many as fit
+    in `max_chars`; "" if nothing matches. Used for @kb?query mentions.
+    """
+    if not os.path.isdir(os.path.join(working_directory, KB_DIR)):
+        return ""
+    hits, _ = get_kb_index(working_directory).search(query, limit)
+    return render_hits(hits, max_chars)[0]
+
+
+def search_kb(
+    working_directory: str,
+    query: str,
+    limit: int | None = None,
+    path: str | None = None,
+) -> str:
+    """
+    Rank the chunks of the knowledge base under working_directory/kb
+    against `query` with BM25 and return the best `limit` of them, each
+    with its file, line range and section heading.
+
+    The index (functions/kb_index.py) lives in .claii/ and is refreshed
+    incrementally before every search.
+
+    Always returns a string (no exceptions propagate).
+    """
+    try:
+        if not query or not query.strip():
+            return "Error: query must not be empty"
+        if not os.path.isdir(os.path.join(working_directory, KB_DIR)):
+            return f"Error: there is no {KB_DIR}/ directory in the working directory"
+        try:
+            prefix = _kb_prefix(working_directory, path)
+        except ValueError as e:
+            return f"Error: {e}"
+        # The model may send numbers as floats
+        limit = max(1, min(int(limit or KB_TOP_K), MAX_KB_RESULTS))
+
+        hits, total = get_kb_index(working_directory).search(query, limit, prefix)
+        if not hits:
+            return f"No KB passages match {query!r}."
+        body, shown = render_hits(hits, MAX_FILE_CHARS)
+        return f"[{total} KB chunks match; showing the best {shown}]\n{body}"
+    except Exception as e:  # noqa: BLE001
+        return f"Error: {e}"
+
+
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    search_kb,
+    description=(
+        "Searches the knowledge base under kb/ for passages relevant to a question or "
+        "keywords, ranked by relevance (BM25). Returns the best matching chunks with "
+        "their file, line range and section. Use this to find KB content instead of "
+        "reading whole KB files."
+    ),
+    params={
+        "query": "Keywords or a question describing what to look for.",
+        "limit": f"Maximum number of passages to return (1-{MAX_KB_RESULTS}). Defaults to {KB_TOP_K}.",
+        "path": "Only search KB files under this directory of kb/, e.g. 'lang'.",
+    },
+    read_only=True,
+    cost="io",
+)
+__getattr__ = schema_getattr(__name__, "search_kb")
@@ -0,0 +1,282 @@
+# functions/workspace_index.py
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import re
+import stat
+import threading
+from typing import Iterator
+
+# Per-project state lives here, under the working directory.
+STATE_DIR = ".claii"
+INDEX_FILE = "workspace_index.json"
+INDEX_VERSION = 2
+
+# Never listed in recursive mode, .gitignore or not.
+ALWAYS_SKIP = frozenset({".git", STATE_DIR})
+
+
+# ─── .gitignore matching ──────────────────────────────────────────────────────
+
+def _glob_to_regex(glob: str) -> str:
+    """Translate one gitignore glob into a regex over '/'-separated paths."""
+    out: list[str] = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == len(glob):
+            out.append("/.*")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = glob.find("]", i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                out.append(fnmatch.translate(glob[i : j + 1])[4:-3])
+                i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class _IgnoreRules:
+    """
+    The rules of one .gitignore file, relative to the directory it lives in.
+
+    Supports the common subset of gitignore syntax: comments, `!` negation,
+    trailing `/` for directories only, leading or embedded `/` anchoring,
+    and `*`, `?`, `[...]` and `**` globs.
+    """
+
+    def __init__(self, base: str, text: str) -> None:
+        self.base = base  # "" for the root, else "pkg/sub"
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []
+        for raw in text.splitlines():
+            line = raw.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            anchored = "/" in line.lstrip("/") or line.startswith("/")
+            line = line.lstrip("/")
+            if not line:
+                continue
+            body = _glob_to_regex(line)
+            regex = f"^{body}$" if anchored else f"^(?:.*/)?{body}$"
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    def match(self, rel_path: str, is_dir: bool) -> bool | None:
+        """True = ignored, False = re-included, None = no opinion."""
+        if self.base:
+            rel_path = rel_path[len(self.base) + 1 :]
+        verdict = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                verdict = not negate
+        return verdict
+
+
+# ─── Index ────────────────────────────────────────────────────────────────────
+
+class WorkspaceIndex:
+    """
+    A persistent, incrementally refreshed listing of one working directory.
+
+    Only the structure is cached: each directory's entry names, and which
+    of them are real (non-symlink) subdirectories, stamped with the
+    directory's `mtime_ns`. A directory is only rescanned when its mtime
+    has moved, i.e. when something in it was created, removed or renamed.
+    Sizes are never cached: every listing stats its entries, so files
+    edited in place (which leave the directory's mtime alone) are always
+    shown as they are. Walks only descend into real directories, so
+    symlink loops cannot recurse.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        self.path = os.path.join(self.root, STATE_DIR, INDEX_FILE)
+        # rel_dir -> {"mtime_ns": int, "entries": [[name, is_real_dir], ...]}
+        self._dirs: dict[str, dict] = {}
+        self._dirty = False
+        self._loaded = False
+        self.lock = threading.RLock()
+
+    def _load(self) -> None:
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self._dirs = data.get("dirs", {})
+        except (OSError, ValueError):
+            self._dirs = {}
+
+    def save(self) -> None:
+        """Write the index back to disk if anything changed (best effort)."""
+        with self.lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"version": INDEX_VERSION, "dirs": self._dirs}, f, separators=(",", ":"))
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError:
+                pass
+
+    def _abs(self, rel_dir: str) -> str:
+        return os.path.join(self.root, rel_dir) if rel_dir else self.root
+
+    def _structure(self, rel_dir: str) -> list[list]:
+        """[name, is_real_dir] rows for `rel_dir`, rescanning if stale."""
+        with self.lock:
+            if not self._loaded:
+                self._load()
+            mtime_ns = os.stat(self._abs(rel_dir)).st_mtime_ns
+            cached = self._dirs.get(rel_dir)
+            if cached is not None and cached["mtime_ns"] == mtime_ns:
+                return cached["entries"]
+
+            rows: list[list] = []
+            with os.scandir(self._abs(rel_dir)) as it:
+                for entry in it:
+                    try:
+                        rows.append([entry.name, entry.is_dir(follow_symlinks=False)])
+                    except OSError:
+                        rows.append([entry.name, False])
+            self._dirs[rel_dir] = {"mtime_ns": mtime_ns, "entries": rows}
+            self._dirty = True
+            return rows
+
+    def stat_entry(self, rel_path: str) -> tuple[bool | None, int | str]:
+        """(is_dir, size) of one entry, freshly stat'ed; (None, error) if that fails."""
+        try:
+            st = os.stat(self._abs(rel_path))  # follows symlinks, like the listing always did
+            return stat.S_ISDIR(st.st_mode), st.st_size
+        except OSError as e:
+            return None, str(e)
+
+    def entries(self, rel_dir: str) -> list[list]:
+        """Return [name, is_dir, size] rows for `rel_dir`, with current sizes."""
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        return [[name, *self.stat_entry(prefix + name)] for name, _ in self._structure(rel_dir)]
+
+    def invalidate(self, abs_path: str) -> None:
+        """Drop the cached listing of the directory that holds `abs_path`."""
+        rel = os.path.relpath(os.path.dirname(os.path.abspath(abs_path)), self.root)
+        rel = "" if rel == "." else rel.replace(os.sep, "/")
+        with self.lock:
+            if self._dirs.pop(rel, None) is not None:
+                self._dirty = True
+
+    def walk(
+        self,
+        rel_dir: str = "",
+        max_depth: int | None = None,
+    ) -> Iterator[tuple[str, bool | None, int | str]]:
+        """
+        Depth-first, sorted, .gitignore-aware walk below `rel_dir`.
+        Yields (relative path, is_dir, size-or-error).
+        """
+        for rel_path, _ in self.walk_names(rel_dir, max_depth):
+            yield rel_path, *self.stat_entry(rel_path)
+
+    def walk_names(self, rel_dir: str = "", max_depth: int | None = None) -> Iterator[tuple[str, bool]]:
+        """
+        The same walk as `walk`, from the cached structure alone: yields
+        (relative path, is_real_dir) and stats nothing, so a caller that
+        pages through a big tree only pays for the entries it shows.
+        """
+        rules: list[_IgnoreRules] = []
+        # .gitignore files from the root down to rel_dir also apply
+        parts = rel_dir.split("/") if rel_dir else []
+        for i in range(len(parts)):
+            self._push_rules("/".join(parts[:i]), rules)
+        yield from self._walk(rel_dir, 1, max_depth, rules)
+
+    def _push_rules(self, rel_dir: str, rules: list[_IgnoreRules]) -> bool:
+        gitignore = os.path.join(self._abs(rel_dir), ".gitignore")
+        try:
+            with open(gitignore, "r", encoding="utf-8") as f:
+                rules.append(_IgnoreRules(rel_dir, f.read()))
+            return True
+        except (OSError, UnicodeDecodeError):
+            return False
+
+    @staticmethod
+    def _ignored(rel_path: str, is_dir: bool, rules: list[_IgnoreRules]) -> bool:
+        verdict = False
+        for r in rules:
+            v = r.match(rel_path, is_dir)
+            if v is not None:
+                verdict = v
+        return verdict
+
+    def _walk(self, rel_dir, depth, max_depth, rules):
+        rows = self._structure(rel_dir)
+        pushed = any(row[0] == ".gitignore" for row in rows) and self._push_rules(rel_dir, rules)
+        try:
+            for name, real_dir in sorted(rows, key=lambda r: r[0]):
+                if name in ALWAYS_SKIP:
+                    continue
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                # like git, a symlink is never a directory to the ignore rules
+                if self._ignored(rel_path, real_dir, rules):
+                    continue
+                yield rel_path, real_dir
+                # symlinked directories are listed but not entered (loops)
+                if real_dir and (max_depth is None or depth < max_depth):
+                    try:
+                        yield from self._walk(rel_path, depth + 1, max_depth, rules)
+                    except OSError:
+                        continue
+        finally:
+            if pushed:
+                rules.pop()
+
+
+_INDEXES: dict[str, WorkspaceIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_index(working_directory: str) -> WorkspaceIndex:
+    """Return the shared index for `working_directory`, creating it lazily."""
+    root = os.path.abspath(working_directory)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(root)
+        if index is None:
+            index = _INDEXES[root] = WorkspaceIndex(root)
+        return index
+
+
+def invalidate(abs_path: str) -> None:
+    """Tell every loaded index that `abs_path` was just written."""
+    abs_path = os.path.abspath(abs_path)
+    with _INDEXES_LOCK:
+        indexes = list(_INDEXES.values())
+    for index in indexes:
+        if abs_path.startswith(index.root + os.sep):
+            index.invalidate(abs_path)
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 from pathlib import Path
-from google.genai import types
+
+from .atomic_write import atomic_write, content_hash
+from .registry import register, schema_getattr
 
 
 def write_file(working_directory: str, file_path: str, content: str) -> str:
     """
     Write or overwrite a text file inside `working_directory` with guard-rails.
+    For changes to part of an existing file, apply_edit is much cheaper.
 
     Always returns a string describing success or error.
     """
@@ -22,40 +25,34 @@ def write_file(working_directory: str, file_path: str, content: str) -> str:
                 "working directory"
             )
 
-        # ensure parent directory exists if needed
-        parent = abs_target.parent
-        if not parent.exists():
-            parent.mkdir(parents=True, exist_ok=True)
-
-        # overwrite file contents
+        # overwrite file contents (temp file + os.replace; creates parent dirs)
         text = str(content)
-        with abs_target.open("w", encoding="utf-8") as f:
-            f.write(text)
+        data = text.encode("utf-8")
+        atomic_write(abs_target, data)
 
-        return f'Successfully wrote to "{file_path}" ({len(text)} characters written)'
+        return (
+            f'Successfully wrote to "{file_path}" ({len(text)} characters written; '
+            f"content_hash={content_hash(data)})"
+        )
 
     except Exception as e:  # noqa: BLE001
         return f"Error: {e}"
 
 
-# Tool / function declaration for the LLM
-schema_write_file = types.FunctionDeclaration(
-    name="write_file",
-    description="Writes or overwrites a text file in the working directory.",
-    parameters=types.Schema(
-        type=types.Type.OBJECT,
-        properties={
-            "file_path": types.Schema(
-                type=types.Type.STRING,
-                description=(
-                    "Relative path of the file to write. "
-                    "Examples: 'main.txt', 'pkg/morelorem.txt'."
-                ),
-            ),
-            "content": types.Schema(
-                type=types.Type.STRING,
-                description="The text content to write into the file.",
-            ),
-        },
+# Registered as a tool (see functions/registry.py); the declaration the
+# model sees is generated from the signature and these descriptions.
+register(
+    write_file,
+    description=(
+        "Writes or overwrites a whole text file in the working directory. To change "
+        "part of an existing file, use apply_edit instead."
     ),
+    params={
+        "file_path": (
+            "Relative path of the file to write. "
+            "Examples: 'main.txt', 'pkg/morelorem.txt'."
+        ),
+        "content": "The text content to write into the file.",
+    },
 )
+__getattr__ = schema_getattr(__name__, "write_file")
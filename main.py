@@ -5,31 +5,20 @@ from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
-from functions.get_files_info import get_files_info, schema_get_files_info
-from functions.get_file_content import get_file_content, schema_get_file_content
-from functions.run_python import run_python_file, schema_run_python_file
-from functions.write_file import write_file, schema_write_file
+from functions.registry import load_tools
 
 # ─── env & client ─────────────────────────────────────────
 load_dotenv()
 client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 # ─── function name → callable ────────────────────────────
-FUNCTION_MAP = {
-    "get_files_info": get_files_info,
-    "get_file_content": get_file_content,
-    "run_python_file": run_python_file,
-    "write_file": write_file,
-}
+# The original four tools, from the shared registry (functions/registry.py)
+TOOL_NAMES = ("get_files_info", "get_file_content", "run_python_file", "write_file")
+FUNCTION_MAP = {name: load_tools()[name].fn for name in TOOL_NAMES}
 
 # ─── tool declarations ───────────────────────────────────
 available_functions = types.Tool(
-    function_declarations=[
-        schema_get_files_info,
-        schema_get_file_content,
-        schema_run_python_file,
-        schema_write_file,
-    ]
+    function_declarations=[load_tools()[name].declaration for name in TOOL_NAMES]
 )
 
 # ─── system prompt ───────────────────────────────────────
@@ -0,0 +1,79 @@
+# tests/test_agent_steps.py
+import asyncio
+import os
+import tempfile
+import unittest
+
+from claii import agent
+from claii.memory import load_memory
+from claii.providers.replay import ReplayProvider
+
+# Sleeps past the step timeout, then leaves a mark if it was not stopped
+SLOW_SCRIPT = "import pathlib, time\ntime.sleep(0.6)\npathlib.Path('marker.txt').write_text('late')\n"
+
+
+class TestStepTimeout(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.workdir = self._tmp.name
+        with open(os.path.join(self.workdir, "slow.py"), "w") as f:
+            f.write(SLOW_SCRIPT)
+
+    def _timed_out_session(self, stream, use_memory=False, slow_stream=True):
+        steps = [
+            {
+                "parts": [
+                    {"function_call": {"name": "run_python_file", "args": {"file_path": "slow.py"}}},
+                    {"text": "still talking"},
+                ]
+            }
+        ]
+        # with slow_stream, the stream is still open when the step times out
+        provider = ReplayProvider(steps, chunk_latency_s=1.0 if slow_stream else 0.0)
+        args = agent.AgentArgs("run it", stream=stream, use_memory=use_memory)
+
+        async def main():
+            await agent.run_session(
+                args,
+                provider=provider,
+                project_root=self.workdir,
+                working_directory=self.workdir,
+                step_timeout=0.3,
+            )
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            await asyncio.sleep(1.0)  # long enough for a straggler to finish the script
+            return pending
+
+        return asyncio.run(main())
+
+    def _assert_nothing_left(self, stream):
+        self.assertEqual(self._timed_out_session(stream), [])
+        self.assertFalse(os.path.exists(os.path.join(self.workdir, "marker.txt")))
+
+    def test_streamed_step_stops_its_tools(self):
+        self._assert_nothing_left(stream=True)
+
+    def test_step_stops_its_tools(self):
+        self._assert_nothing_left(stream=False)
+
+    def _assert_saved_history_is_paired(self, stream):
+        # the model turn is complete; the timeout hits while its tool runs
+        self._timed_out_session(stream, use_memory=True, slow_stream=False)
+        saved = load_memory(self.workdir, None)
+        calls = [p.function_call.name for m in saved for p in m.parts if p.function_call]
+        replies = [p.function_response for m in saved for p in m.parts if p.function_response]
+        self.assertEqual(calls, ["run_python_file"])
+        self.assertEqual([r.name for r in replies], calls)
+        self.assertIn("cancelled", str(replies[0].response))
+        self.assertEqual(saved[-1].role, "user")  # the reply follows the call
+
+    def test_timed_out_streamed_step_saves_paired_history(self):
+        self._assert_saved_history_is_paired(stream=True)
+
+    def test_timed_out_step_saves_paired_history(self):
+        self._assert_saved_history_is_paired(stream=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# tests/test_apply_edit.py
+import os
+import tempfile
+import unittest
+
+from functions.apply_edit import EditError, _apply_diff, _parse_hunks, apply_edit
+from functions.atomic_write import content_hash
+
+SOURCE = "def add(a, b):\n    return a + b\n\n\ndef sub(a, b):\n    return a - b\n"
+
+
+class TestParseHunks(unittest.TestCase):
+    def test_headers_and_hunks(self):
+        diff = (
+            "--- a/calc.py\n"
+            "+++ b/calc.py\n"
+            "@@ -1,2 +1,2 @@\n"
+            " def add(a, b):\n"
+            "-    return a + b\n"
+            "+    return b + a\n"
+            "@@ -5 +5,2 @@\n"
+            " def sub(a, b):\n"
+            "+    # subtract\n"
+        )
+        self.assertEqual(
+            _parse_hunks(diff),
+            [
+                (1, ["def add(a, b):", "    return a + b"], ["def add(a, b):", "    return b + a"]),
+                (5, ["def sub(a, b):"], ["def sub(a, b):", "    # subtract"]),
+            ],
+        )
+
+    def test_removed_line_that_looks_like_a_header(self):
+        # "--- x" inside a hunk is a removed "-- x" line unless "+++ " follows
+        hunks = _parse_hunks("@@ -1,2 +1 @@\n--- x\n keep\n")
+        self.assertEqual(hunks, [(1, ["-- x", "keep"], ["keep"])])
+
+    def test_no_newline_marker_is_ignored(self):
+        hunks = _parse_hunks("@@ -1 +1 @@\n-old\n\\ No newline at end of file\n+new\n")
+        self.assertEqual(hunks, [(1, ["old"], ["new"])])
+
+    def test_pure_insertion_starts_after_its_line(self):
+        self.assertEqual(_parse_hunks("@@ -1,0 +2 @@\n+x\n"), [(2, [], ["x"])])
+        self.assertEqual(_parse_hunks("@@ -0,0 +1 @@\n+x\n"), [(1, [], ["x"])])
+
+    def test_rejects_a_diff_without_hunks(self):
+        with self.assertRaisesRegex(EditError, "no @@ hunks"):
+            _parse_hunks("--- a/x\n+++ b/x\n")
+
+    def test_rejects_unexpected_lines(self):
+        with self.assertRaisesRegex(EditError, "unexpected line"):
+            _parse_hunks("@@ -1 +1 @@\n*stray\n")
+
+
+class TestApplyDiff(unittest.TestCase):
+    def test_line_numbers_are_only_a_hint(self):
+        diff = "@@ -2,2 +2,2 @@\n def sub(a, b):\n-    return a - b\n+    return b - a\n"
+        self.assertEqual(_apply_diff(SOURCE, diff), SOURCE.replace("a - b", "b - a"))
+
+    def test_later_hunks_follow_the_shift_of_earlier_ones(self):
+        text = "x\n" * 3 + "a\n" + "x\n" * 3 + "b\n"
+        # both hunks are stated 2 lines early
+        diff = "@@ -2 +2 @@\n-a\n+A\n@@ -6 +6 @@\n-b\n+B\n"
+        self.assertEqual(_apply_diff(text, diff), "x\n" * 3 + "A\n" + "x\n" * 3 + "B\n")
+
+    def test_pure_insertion(self):
+        self.assertEqual(_apply_diff("a\nb\nc\n", "@@ -1,0 +2 @@\n+x\n"), "a\nx\nb\nc\n")
+        self.assertEqual(_apply_diff("a\nb\nc\n", "@@ -0,0 +1 @@\n+x\n"), "x\na\nb\nc\n")
+        self.assertEqual(_apply_diff("a\nb\nc\n", "@@ -3,0 +4 @@\n+x\n"), "a\nb\nc\nx\n")
+
+    def test_keeps_a_missing_final_newline(self):
+        self.assertEqual(_apply_diff("a\nb", "@@ -2 +2 @@\n-b\n+c\n"), "a\nc")
+
+    def test_rejects_a_hunk_that_does_not_match(self):
+        with self.assertRaisesRegex(EditError, "hunk 1 .* does not match"):
+            _apply_diff(SOURCE, "@@ -1 +1 @@\n-def mul(a, b):\n+def mul(b, a):\n")
+
+
+class TestApplyEdit(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.workdir = self._tmp.name
+        self.path = os.path.join(self.workdir, "calc.py")
+        self._put(SOURCE.encode())
+
+    def _put(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def _get(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_search_replace(self):
+        out = apply_edit(self.workdir, "calc.py", edits=[{"search": "a + b", "replace": "b + a"}])
+        self.assertIn("Successfully applied 1 edit(s)", out)
+        self.assertEqual(self._get().decode(), SOURCE.replace("a + b", "b + a"))
+
+    def test_ambiguous_search_is_rejected(self):
+        out = apply_edit(self.workdir, "calc.py", edits=[{"search": "(a, b)", "replace": "(x, y)"}])
+        self.assertIn("occurs 2 times", out)
+        self.assertEqual(self._get(), SOURCE.encode())
+        out = apply_edit(
+            self.workdir, "calc.py", edits=[{"search": "(a, b)", "replace": "(x, y)", "replace_all": True}]
+        )
+        self.assertIn("Successfully", out)
+        self.assertEqual(self._get().decode().count("(x, y)"), 2)
+
+    def test_whitespace_mismatch_gets_a_hint(self):
+        out = apply_edit(self.workdir, "calc.py", edits=[{"search": "return  a + b", "replace": ""}])
+        self.assertIn("different whitespace", out)
+
+    def test_failing_edit_writes_nothing(self):
+        edits = [{"search": "a + b", "replace": "b + a"}, {"search": "missing", "replace": ""}]
+        out = apply_edit(self.workdir, "calc.py", edits=edits)
+        self.assertIn("edit 2: search text not found", out)
+        self.assertIn("Nothing was written", out)
+        self.assertEqual(self._get(), SOURCE.encode())
+
+    def test_bad_diff_writes_nothing(self):
+        out = apply_edit(self.workdir, "calc.py", diff="@@ -1 +1 @@\n-nope\n+yes\n")
+        self.assertIn("does not match the file", out)
+        self.assertEqual(self._get(), SOURCE.encode())
+
+    def test_exactly_one_of_edits_or_diff(self):
+        self.assertIn("exactly one", apply_edit(self.workdir, "calc.py"))
+        both = apply_edit(self.workdir, "calc.py", edits=[], diff="@@ -1 +1 @@\n")
+        self.assertIn("exactly one", both)
+
+    def test_stale_hash_is_rejected(self):
+        out = apply_edit(
+            self.workdir, "calc.py", edits=[{"search": "a + b", "replace": "b + a"}], expected_hash="0" * 12
+        )
+        self.assertIn("changed since you last saw it", out)
+        self.assertEqual(self._get(), SOURCE.encode())
+        out = apply_edit(
+            self.workdir,
+            "calc.py",
+            edits=[{"search": "a + b", "replace": "b + a"}],
+            expected_hash=content_hash(SOURCE.encode()),
+        )
+        self.assertIn("Successfully", out)
+
+    def test_crlf_is_kept(self):
+        self._put(SOURCE.replace("\n", "\r\n").encode())
+        out = apply_edit(self.workdir, "calc.py", diff="@@ -2 +2 @@\n-    return a + b\n+    return b + a\n")
+        self.assertIn("Successfully applied diff", out)
+        self.assertEqual(self._get(), SOURCE.replace("a + b", "b + a").replace("\n", "\r\n").encode())
+
+    def test_outside_the_working_directory(self):
+        out = apply_edit(self.workdir, "../calc.py", edits=[{"search": "a", "replace": "b"}])
+        self.assertIn("outside the permitted working directory", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# tests/test_get_files_content.py
+import os
+import tempfile
+import unittest
+
+from functions.get_files_content import get_files_content
+
+
+class TestGlobConfinement(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        root = self._tmp.name
+        self.workdir = os.path.join(root, "ws")
+        os.makedirs(os.path.join(self.workdir, "pkg"))
+        with open(os.path.join(root, "secret.py"), "w") as f:
+            f.write("SECRET=1\n")
+        with open(os.path.join(self.workdir, "main.py"), "w") as f:
+            f.write("print('main')\n")
+        with open(os.path.join(self.workdir, "pkg", "mod.py"), "w") as f:
+            f.write("VALUE = 2\n")
+
+    def test_parent_glob_is_rejected(self):
+        out = get_files_content(self.workdir, ["../*.py"])
+        self.assertNotIn("SECRET", out)
+        self.assertIn("outside the permitted working directory", out)
+
+    def test_nested_parent_glob_is_rejected(self):
+        out = get_files_content(self.workdir, ["pkg/../../*.py"])
+        self.assertNotIn("SECRET", out)
+        self.assertIn("outside the permitted working directory", out)
+
+    def test_absolute_glob_is_rejected(self):
+        out = get_files_content(self.workdir, ["/etc/*"])
+        self.assertIn("outside the permitted working directory", out)
+        self.assertIn("[0 files]", out)
+
+    def test_globs_inside_still_match(self):
+        out = get_files_content(self.workdir, ["*.py"])
+        self.assertIn("==> main.py <==", out)
+        self.assertIn("==> pkg/mod.py <==", out)
+        out = get_files_content(self.workdir, ["pkg/*.py"])
+        self.assertIn("VALUE = 2", out)
+
+    def test_plain_parent_path_is_rejected(self):
+        out = get_files_content(self.workdir, ["../secret.py"])
+        self.assertNotIn("SECRET", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+# tests/test_get_files_info.py
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from functions.get_files_info import get_files_info
+from functions.workspace_index import WorkspaceIndex
+
+
+class TestWorkspaceListing(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.workdir = self._tmp.name
+        os.makedirs(os.path.join(self.workdir, "pkg"))
+        self.main = os.path.join(self.workdir, "main.py")
+        with open(self.main, "w") as f:
+            f.write("x = 1\n")
+
+    def test_in_place_edit_shows_new_size(self):
+        # the first listing creates .claii/ (and so moves the mtime); cache the next one
+        get_files_info(self.workdir)
+        self.assertIn("- main.py: file_size=6 bytes", get_files_info(self.workdir))
+        # rewriting an existing file leaves the directory's mtime alone
+        mtime_ns = os.stat(self.workdir).st_mtime_ns
+        with open(self.main, "w") as f:
+            f.write("x = 100000\n")
+        self.assertEqual(os.stat(self.workdir).st_mtime_ns, mtime_ns)
+        self.assertIn("- main.py: file_size=11 bytes", get_files_info(self.workdir))
+        self.assertIn("- main.py: file_size=11 bytes", get_files_info(self.workdir, recursive=True))
+
+    def test_recursive_page_stats_only_its_entries(self):
+        for i in range(30):
+            with open(os.path.join(self.workdir, "pkg", f"m{i:02}.py"), "w") as f:
+                f.write("#\n")
+        get_files_info(self.workdir, recursive=True)  # warm the index
+        stat_entry = WorkspaceIndex.stat_entry
+        with mock.patch.object(WorkspaceIndex, "stat_entry", autospec=True, side_effect=stat_entry) as st:
+            out = get_files_info(self.workdir, recursive=True, offset=5, limit=3)
+        self.assertEqual(st.call_count, 3)
+        lines = out.splitlines()
+        names = [line.split(":")[0] for line in lines[:3]]
+        self.assertEqual(names, ["- pkg/m03.py", "- pkg/m04.py", "- pkg/m05.py"])
+        self.assertIn("showing entries 6-8 of 32", lines[3])
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_symlink_loop_is_not_followed(self):
+        os.symlink(self.workdir, os.path.join(self.workdir, "pkg", "loop"))
+        out = get_files_info(self.workdir, recursive=True)
+        self.assertIn("- pkg/loop:", out)
+        self.assertNotIn("pkg/loop/", out)
+        self.assertNotIn("Error", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+# tests/test_kb_index.py
+import os
+import tempfile
+import unittest
+
+from functions.kb_index import KBIndex
+
+
+class TestKBIndex(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.workdir = os.path.join(self._tmp.name, "project")
+        self.kb = os.path.join(self.workdir, "kb")
+        os.makedirs(os.path.join(self.kb, "notes"))
+        self._put(os.path.join(self.kb, "notes", "guide.md"), "# Guide\n\nThe inside document.\n")
+        self.outside = os.path.join(self._tmp.name, "secret.txt")
+        self._put(self.outside, "The zanzibar passphrase.\n")
+
+    def _put(self, path, text):
+        with open(path, "w") as f:
+            f.write(text)
+
+    def _indexed(self):
+        index = KBIndex(self.workdir)
+        self.addCleanup(lambda: index._db and index._db.close())
+        return [rel_path for rel_path, _ in index._walk()]
+
+    def test_walk_lists_kb_files(self):
+        self.assertEqual(self._indexed(), ["notes/guide.md"])
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_links_out_of_kb_are_skipped(self):
+        os.symlink(self.outside, os.path.join(self.kb, "secret.txt"))
+        os.symlink(self._tmp.name, os.path.join(self.kb, "up"))
+        self.assertEqual(self._indexed(), ["notes/guide.md"])
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_links_within_kb_are_kept(self):
+        os.symlink(os.path.join(self.kb, "notes", "guide.md"), os.path.join(self.kb, "alias.md"))
+        self.assertEqual(self._indexed(), ["alias.md", "notes/guide.md"])
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "needs symlinks")
+    def test_search_does_not_see_linked_files(self):
+        os.symlink(self.outside, os.path.join(self.kb, "secret.txt"))
+        index = KBIndex(self.workdir)
+        self.addCleanup(lambda: index._db and index._db.close())
+        self.assertEqual(index.search("zanzibar", limit=5), ([], 0))
+        hits, _ = index.search("inside document", limit=5)
+        self.assertEqual([hit.path for hit in hits], ["notes/guide.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+# tests/test_memory.py
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from google.genai import types
+
+from claii import memory
+from claii.memory import compact_memory, load_memory, save_memory
+
+
+def _prompt(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def _answer(text):
+    return types.Content(role="model", parts=[types.Part(text=text)])
+
+
+def _calls(*names):
+    return types.Content(
+        role="model",
+        parts=[types.Part.from_function_call(name=n, args={"file_path": "main.py"}) for n in names],
+    )
+
+
+def _reply(name, result):
+    return types.Content(
+        role="user", parts=[types.Part.from_function_response(name=name, response={"result": result})]
+    )
+
+
+def _shape(messages):
+    """(role, kinds) per message, where kinds lists call/response/text per part."""
+    out = []
+    for m in messages:
+        kinds = tuple(
+            "call" if p.function_call else "response" if p.function_response else "text" for p in m.parts
+        )
+        out.append((m.role, kinds))
+    return out
+
+
+class MemoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.root = Path(self._tmp.name)
+        memory._WINDOWS.clear()
+
+    def _compact(self, retain=memory.RETAIN_RECORDS):
+        compact_memory(self.root, retain=retain)
+        memory._WINDOWS.clear()
+
+
+class TestSegmentedLog(MemoryTestCase):
+    def test_round_trip(self):
+        session = [
+            _prompt("run the tests"),
+            _calls("run_python_file"),
+            _reply("run_python_file", "OK"),
+            _answer("All tests pass."),
+        ]
+        save_memory(self.root, session)
+        loaded = load_memory(self.root)
+        self.assertEqual(_shape(loaded), _shape(session))
+        self.assertEqual(loaded[0].parts[0].text, "run the tests")
+        self.assertEqual(loaded[1].parts[0].function_call.args, {"file_path": "main.py"})
+        self.assertEqual(loaded[2].parts[0].function_response.response, {"result": "OK"})
+
+    def test_appends_only_new_messages(self):
+        first = [_prompt("one"), _answer("1")]
+        save_memory(self.root, first)
+        loaded = load_memory(self.root)
+        loaded += [_prompt("two"), _answer("2")]
+        save_memory(self.root, loaded, start=len(first))
+        texts = [m.parts[0].text for m in load_memory(self.root)]
+        self.assertEqual(texts, ["one", "1", "two", "2"])
+
+    def test_rolls_over_and_compacts_segments(self):
+        old = memory.SEGMENT_MAX_BYTES
+        memory.SEGMENT_MAX_BYTES = 200
+        self.addCleanup(setattr, memory, "SEGMENT_MAX_BYTES", old)
+        for i in range(3 * memory.MAX_SEGMENTS):
+            save_memory(self.root, [_prompt(f"prompt {i} " + "x" * 100), _answer(f"answer {i}")])
+        segments = memory._segments(memory._memory_dir(self.root))
+        self.assertLessEqual(len(segments), memory.MAX_SEGMENTS + 1)
+        memory._WINDOWS.clear()
+        texts = [m.parts[0].text for m in load_memory(self.root)]
+        self.assertEqual(len(texts), 2 * 3 * memory.MAX_SEGMENTS)
+        self.assertEqual(texts[-1], f"answer {3 * memory.MAX_SEGMENTS - 1}")
+
+    def test_torn_last_line_is_skipped(self):
+        save_memory(self.root, [_prompt("kept"), _answer("yes")])
+        segment = memory._segments(memory._memory_dir(self.root))[-1]
+        with segment.open("a", encoding="utf-8") as f:
+            f.write('{"role": "user", "parts": [{"te')
+        memory._WINDOWS.clear()
+        self.assertEqual([m.parts[0].text for m in load_memory(self.root)], ["kept", "yes"])
+        save_memory(self.root, [_prompt("after")])
+        memory._WINDOWS.clear()
+        self.assertEqual([m.parts[0].text for m in load_memory(self.root)], ["kept", "yes", "after"])
+
+
+class TestCompactionPairing(MemoryTestCase):
+    def test_identical_tool_replies_survive_compaction(self):
+        session = [
+            _prompt("run both scripts"),
+            _calls("run_python_file", "run_python_file"),
+            _reply("run_python_file", "No output produced."),
+            _reply("run_python_file", "No output produced."),
+            _answer("Both ran."),
+        ]
+        save_memory(self.root, session)
+        self._compact()
+        loaded = load_memory(self.root)
+        self.assertEqual(_shape(loaded), _shape(session))
+        calls = sum(1 for m in loaded for p in m.parts if p.function_call)
+        replies = sum(1 for m in loaded for p in m.parts if p.function_response)
+        self.assertEqual(calls, replies)
+
+    def test_identical_call_records_are_kept(self):
+        session = [
+            _prompt("read it twice"),
+            _calls("get_file_content"),
+            _reply("get_file_content", "same"),
+            _calls("get_file_content"),
+            _reply("get_file_content", "same"),
+            _answer("Done."),
+        ]
+        save_memory(self.root, session)
+        self._compact()
+        self.assertEqual(_shape(load_memory(self.root)), _shape(session))
+
+    def test_repeated_plain_text_is_deduplicated(self):
+        save_memory(self.root, [_prompt("hi"), _prompt("hi"), _answer("hello")])
+        self._compact()
+        self.assertEqual([m.parts[0].text for m in load_memory(self.root)], ["hi", "hello"])
+
+    def test_retain_cut_starts_at_a_prompt(self):
+        save_memory(self.root, [
+            _prompt("first"),
+            _calls("get_files_info"),
+            _reply("get_files_info", "a.py"),
+            _answer("one file"),
+            _prompt("second"),
+            _answer("ok"),
+        ])
+        # the last 5 records would open with the call of the first turn
+        self._compact(retain=5)
+        segment = memory._segments(memory._memory_dir(self.root))[-1]
+        records = [json.loads(line) for line in segment.read_text(encoding="utf-8").splitlines()[1:]]
+        self.assertTrue(memory._is_prompt(records[0]))
+        self.assertEqual([m.parts[0].text for m in load_memory(self.root)], ["second", "ok"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+# tests/test_provider_cache.py
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+from google.genai import types
+
+from claii.providers.base import rooted_at
+from claii.providers.cache import CachingProvider
+from claii.providers.context_cache import (
+    ContextCacheRegistry,
+    ContextCachingProvider,
+    default_registry,
+    prefix_keys,
+    prefix_session,
+)
+from claii.providers.replay import RecordingProvider, ReplayProvider
+
+
+class _Echo:
+    model_name = "echo"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, *, messages, tools, system_prompt):
+        self.calls += 1
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text="hi")]))]
+        )
+
+
+class TestProjectRootedState(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.a = Path(tmp.name) / "a"
+        self.b = Path(tmp.name) / "b"
+        self.a.mkdir()
+        self.b.mkdir()
+
+    def _ask(self, provider):
+        messages = [types.Content(role="user", parts=[types.Part(text="hello")])]
+        provider.generate(messages=messages, tools=None, system_prompt="sys")
+
+    def test_response_cache_lives_in_each_project(self):
+        inner = _Echo()
+        provider = CachingProvider(inner)
+        with rooted_at(self.a):
+            self._ask(provider)
+            self._ask(provider)
+        with rooted_at(self.b):
+            self._ask(provider)
+        self.assertEqual(inner.calls, 2)  # one miss per project
+        self.assertEqual(len(list((self.a / ".claii" / "response_cache").glob("*/*.json"))), 1)
+        self.assertEqual(len(list((self.b / ".claii" / "response_cache").glob("*/*.json"))), 1)
+
+    def test_context_cache_registry_per_project(self):
+        with rooted_at(self.a):
+            a = default_registry()
+        with rooted_at(self.b):
+            b = default_registry()
+        self.assertIsNot(a, b)
+        self.assertEqual(a.path, self.a.resolve() / ".claii" / "context_caches.json")
+        self.assertEqual(b.path, self.b.resolve() / ".claii" / "context_caches.json")
+
+
+def _text(role, text):
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+
+class TestContextCacheSessions(unittest.TestCase):
+    def test_interleaved_sessions_keep_their_own_stable_prefix(self):
+        inner = ReplayProvider([{"parts": [{"text": "ok"}]}] * 4, context_cache=True)
+        provider = ContextCachingProvider(inner, min_tokens=1, registry=ContextCacheRegistry(None))
+        a_first = [_text("user", "session a")]
+        a_second = a_first + [_text("model", "ok"), _text("user", "and more")]
+        b_first = [_text("user", "session b")]
+        a_asked, b_asked = asyncio.Event(), asyncio.Event()
+
+        async def ask(messages):
+            await provider.agenerate(messages=messages, tools=None, system_prompt="sys")
+
+        async def session_a():
+            with prefix_session():
+                await ask(a_first)
+                a_asked.set()
+                await b_asked.wait()
+                await ask(a_second)
+
+        async def session_b():
+            with prefix_session():
+                await a_asked.wait()
+                await ask(b_first)
+                b_asked.set()
+
+        async def main():
+            await asyncio.gather(session_a(), session_b())
+
+        asyncio.run(main())
+        # b's request in between does not hide that a's first message is stable
+        keys, _ = prefix_keys("replay", "sys", None, a_second)
+        self.assertIsNotNone(provider.registry.get(keys[1]))
+
+
+class TestRecordingProvider(unittest.TestCase):
+    STEPS = [
+        {"parts": [{"function_call": {"name": "get_files_info", "args": {"directory": "."}}}]},
+        {"parts": [{"text": "All done here."}]},
+    ]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "transcript.json"
+
+    def test_streamed_replies_are_recorded(self):
+        recorder = RecordingProvider(ReplayProvider(self.STEPS), self.path)
+        kwargs = dict(messages=[_text("user", "hi")], tools=None, system_prompt="sys")
+
+        async def collect():
+            return [part async for part in recorder.agenerate_stream(**kwargs)]
+
+        self.assertEqual(asyncio.run(collect())[0].function_call.name, "get_files_info")
+        texts = [part.text for part in recorder.generate_stream(**kwargs)]
+        self.assertEqual(texts, ["All ", "done ", "here."])  # passed on as it streams
+
+        replay = ReplayProvider.from_file(self.path)
+        first = replay.generate(**kwargs).candidates[0].content.parts[0]
+        self.assertEqual(first.function_call.name, "get_files_info")
+        self.assertEqual(replay.generate(**kwargs).text, "All done here.")
+
+
+if __name__ == "__main__":
+    unittest.main()
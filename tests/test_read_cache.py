@@ -0,0 +1,44 @@
+# tests/test_read_cache.py
+import os
+import tempfile
+import unittest
+
+from functions.read_cache import ReadCache
+
+
+class TestReadCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.cache = ReadCache(max_bytes=1024 * 1024)
+
+    def _file(self, name, data):
+        path = os.path.join(self._tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_small_file_is_cached_whole(self):
+        path = self._file("small.txt", b"hello\n")
+        self.assertEqual(self.cache.read_text(path, limit=3), "hel")
+        self.assertEqual(self.cache.read_text(path), "hello\n")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_limited_miss_reads_only_a_prefix(self):
+        # the bad byte lies past the limit, so it is never decoded
+        path = self._file("long.txt", b"a" * 100 + b"\xff")
+        self.assertEqual(self.cache.read_text(path, limit=10), "a" * 10)
+        self.assertEqual(self.cache.stats()["entries"], 0)  # a prefix is not the file
+        with self.assertRaises(UnicodeDecodeError):
+            self.cache.read_text(path)
+
+    def test_replace_errors(self):
+        path = self._file("bad.txt", b"ok\xff")
+        with self.assertRaises(UnicodeDecodeError):
+            self.cache.read_text(path, limit=10)
+        self.assertEqual(self.cache.read_text(path, limit=10, errors="replace"), "ok�")
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# tests/test_search_code.py
+import os
+import tempfile
+import unittest
+
+from functions.code_index import get_code_index
+from functions.read_cache import READ_CACHE
+from functions.search_code import search_code
+from functions.write_file import write_file
+
+
+class TestTrigramSearch(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.workdir = self._tmp.name
+        self._put("a.py", "def needle_one():\n    return 1\n")
+        self._put("b.py", "def haystack():\n    return 2\n")
+
+    def _put(self, name, text):
+        with open(os.path.join(self.workdir, name), "w") as f:
+            f.write(text)
+
+    def test_finds_matches(self):
+        out = search_code(self.workdir, "needle_one")
+        self.assertIn("a.py:1:", out)
+        self.assertNotIn("b.py", out)
+
+    def test_results_follow_write_file(self):
+        self.assertIn("a.py:1:", search_code(self.workdir, "needle"))
+        write_file(self.workdir, "a.py", "def renamed():\n    return 1\n")
+        write_file(self.workdir, "b.py", "x = 0\n\ndef needle_two():\n    return 2\n")
+        out = search_code(self.workdir, "needle")
+        self.assertNotIn("a.py", out)
+        self.assertIn("b.py:3:", out)
+
+    def test_results_follow_edits_behind_our_back(self):
+        self.assertIn("No matches", search_code(self.workdir, "fresh_token"))
+        self._put("b.py", "def haystack():\n    return fresh_token\n")
+        self._put("c.py", "fresh_token = 3\n")
+        out = search_code(self.workdir, "fresh_token")
+        self.assertIn("b.py:2:", out)
+        self.assertIn("c.py:1:", out)
+
+    def test_indexing_bypasses_the_read_cache(self):
+        before = READ_CACHE.stats()
+        get_code_index(self.workdir).refresh()
+        after = READ_CACHE.stats()
+        self.assertEqual((after["hits"], after["misses"]), (before["hits"], before["misses"]))
+
+    def test_searching_bypasses_the_read_cache(self):
+        get_code_index(self.workdir).refresh()
+        before = READ_CACHE.stats()
+        self.assertIn("a.py:1:", search_code(self.workdir, "needle_one"))
+        after = READ_CACHE.stats()
+        self.assertEqual((after["hits"], after["misses"]), (before["hits"], before["misses"]))
+
+
+if __name__ == "__main__":
+    unittest.main()